@@ -1,4 +1,5 @@
 import asyncio
+from contextlib import asynccontextmanager
 
 import uvicorn
 from fastapi import FastAPI
@@ -6,11 +7,27 @@ from fastapi import FastAPI
 from src.auth.auth import auth_backend, fastapi_users
 from src.auth.schemas import UserCreate, UserRead
 from src.db.db import create_db_and_tables
+from src.jobs.router import router as jobs_router
+from src.jobs.workers import job_workers
+from src.logic.trash import trash_reaper
+from src.stats.router import router as stats_router
 from src.store.router import router as store_router
 
-app = FastAPI()
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    await trash_reaper.start()
+    await job_workers.start()
+    yield
+    await job_workers.stop()
+    await trash_reaper.stop()
+
+
+app = FastAPI(lifespan=lifespan)
 
 app.include_router(store_router)
+app.include_router(jobs_router)
+app.include_router(stats_router)
 
 app.include_router(
     fastapi_users.get_auth_router(auth_backend),
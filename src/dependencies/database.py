@@ -0,0 +1,15 @@
+from collections.abc import AsyncGenerator
+
+from fastapi import Depends
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from src.db.db import get_async_session
+from src.utils.unitofwork import UnitOfWork
+
+
+async def unit_of_work_dependency(
+    session: AsyncSession = Depends(get_async_session),
+) -> AsyncGenerator[UnitOfWork, None]:
+    # The request's session is shared with the user lookup of fastapi-users.
+    async with UnitOfWork(session) as unit_of_work:
+        yield unit_of_work
@@ -0,0 +1,6 @@
+from src.repositories.jobs import JobRepository
+from src.services.jobs import JobService
+
+
+def job_service_dependency():
+    return JobService(JobRepository)  # type: ignore
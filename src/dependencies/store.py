@@ -1,10 +1,32 @@
-from src.repositories.stores import PackageRepository, StoreRepository
+from functools import partial
+from typing import Annotated
+
+from fastapi import Depends
+
+from src.dependencies.database import unit_of_work_dependency
+from src.repositories.stores import (
+    ClosureRepository,
+    PackageRepository,
+    ResolutionRepository,
+    StoreRepository,
+)
 from src.services.stores import PackageService, StoreService
+from src.utils.unitofwork import UnitOfWork
+
+# Services created outside a request get no unit of work unless given one,
+# like those of the job workers, and then open a session per repository call.
+RequestUnitOfWork = Annotated[UnitOfWork | None, Depends(unit_of_work_dependency)]
 
 
-def store_service_dependency():
-    return StoreService(StoreRepository)  # type: ignore
+def store_service_dependency(unit_of_work: RequestUnitOfWork = None):
+    return StoreService(partial(StoreRepository, unit_of_work))  # type: ignore
 
 
-def package_service_dependency():
-    return PackageService(PackageRepository)  # type: ignore
+def package_service_dependency(unit_of_work: RequestUnitOfWork = None):
+    return PackageService(
+        partial(PackageRepository, unit_of_work),  # type: ignore
+        # Resolutions are a host-wide cache whose inserts may race with other
+        # requests, so they are saved apart from the request's transaction.
+        ResolutionRepository,  # type: ignore
+        partial(ClosureRepository, unit_of_work),  # type: ignore
+    )
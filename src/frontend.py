@@ -32,6 +32,21 @@ def main_page():
         else:
             st.error("Failed to create store")
 
+    st.header("Clone store")
+    store_name = st.text_input("Enter store name", key="clone_store_name_input")
+    new_store_name = st.text_input("New store name", key="clone_new_store_name_input")
+    if st.button("Clone store"):
+        cookies = st.session_state["Set_cookies"]
+        response = requests.post(
+            f"{base_url}/store/{store_name}/clone/{new_store_name}",
+            cookies=cookies,
+            timeout=TIMEOUT,
+        )
+        if response.status_code == 200:
+            st.success("Store cloned successfully!")
+        else:
+            st.error("Failed to clone store")
+
     st.header("Get store")
     get_store_name_input_key = "get_store_name_input"
     store_name = st.text_input("Enter store name", key=get_store_name_input_key)
@@ -67,18 +82,38 @@ def main_page():
     if st.button("Add package"):
         if store_name and package_name:
             cookies = st.session_state["Set_cookies"]
-            response = requests.post(  # nosec request_without_timeout
+            response = requests.post(
                 f"{base_url}/store/{store_name}/package/{package_name}",
                 cookies=cookies,
-                timeout=None,
+                timeout=TIMEOUT,
             )
-            if response.status_code == 200:
-                st.success("Package added successfully!")
+            if response.status_code == 202:
+                job = response.json()
+                st.success(f"Package installation queued as job {job['id']}!")
             else:
                 st.error("Failed to add package")
         else:
             st.warning("Please enter both store name and package name")
 
+    st.header("Get job")
+    job_id = st.text_input("Job ID", key="get_job_id_input")
+    if st.button("Get job"):
+        if job_id:
+            cookies = st.session_state["Set_cookies"]
+            response = requests.get(
+                f"{base_url}/jobs/{job_id}", cookies=cookies, timeout=TIMEOUT
+            )
+            if response.status_code == 200:
+                job = response.json()
+                st.write(f"Job {job['id']}: {job['state']}")
+                st.write(f"Package: {job['package_name']} in {job['store_name']}")
+                if job["error"] is not None:
+                    st.error(job["error"])
+            else:
+                st.error("Job not found")
+        else:
+            st.warning("Please enter a job ID")
+
     st.header("Delete package")
     delete_package_store_name_input_key = "delete_package_store_name_input"
     store_name = st.text_input(
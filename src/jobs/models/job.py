@@ -0,0 +1,38 @@
+from datetime import datetime
+
+from sqlalchemy import JSON, DateTime, Integer, String
+from sqlalchemy.orm import Mapped, mapped_column
+
+from src.db.db import Base
+from src.jobs.schemas.job import Job as JobSchema
+
+
+class Job(Base):
+    __tablename__ = "job"
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    kind: Mapped[str] = mapped_column(String(length=32), nullable=False)
+    owner_id: Mapped[int] = mapped_column(Integer, nullable=False)
+    store_name: Mapped[str] = mapped_column(String(length=320), nullable=False)
+    package_name: Mapped[str] = mapped_column(String(length=320), nullable=False)
+    state: Mapped[str] = mapped_column(String(length=32), nullable=False, index=True)
+    created_at: Mapped[datetime] = mapped_column(DateTime, nullable=False)
+    started_at: Mapped[datetime | None] = mapped_column(DateTime, nullable=True)
+    finished_at: Mapped[datetime | None] = mapped_column(DateTime, nullable=True)
+    result: Mapped[dict | None] = mapped_column(JSON, nullable=True)
+    error: Mapped[str | None] = mapped_column(String, nullable=True)
+
+    def to_read_model(self):
+        return JobSchema(
+            id=self.id,
+            kind=self.kind,
+            owner_id=self.owner_id,
+            store_name=self.store_name,
+            package_name=self.package_name,
+            state=self.state,  # type: ignore
+            created_at=self.created_at,
+            started_at=self.started_at,
+            finished_at=self.finished_at,
+            result=self.result,  # type: ignore
+            error=self.error,
+        )
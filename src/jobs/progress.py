@@ -0,0 +1,32 @@
+import asyncio
+from contextlib import suppress
+
+
+class JobProgress:
+    def __init__(self):
+        self._latest: dict[int, dict] = {}
+        self._events: dict[int, asyncio.Event] = {}
+
+    def _notify(self, job_id: int):
+        event = self._events.pop(job_id, None)
+        if event is not None:
+            event.set()
+
+    def publish(self, job_id: int, progress: dict):
+        self._latest[job_id] = progress
+        self._notify(job_id)
+
+    def finish(self, job_id: int):
+        self._latest.pop(job_id, None)
+        self._notify(job_id)
+
+    def latest(self, job_id: int) -> dict | None:
+        return self._latest.get(job_id)
+
+    async def wait(self, job_id: int, timeout: float):
+        event = self._events.setdefault(job_id, asyncio.Event())
+        with suppress(TimeoutError):
+            await asyncio.wait_for(event.wait(), timeout)
+
+
+job_progress = JobProgress()
@@ -0,0 +1,37 @@
+from typing import Annotated
+
+from fastapi import APIRouter, Depends
+from fastapi.responses import StreamingResponse
+
+from src.auth.auth import fastapi_users
+from src.auth.schemas import User
+from src.dependencies.jobs import job_service_dependency
+from src.jobs.schemas.job import Job
+from src.services.jobs import JobService
+
+router = APIRouter(prefix="/jobs")
+current_user = fastapi_users.current_user()
+
+
+@router.get("/{job_id}", response_model=Job)
+async def get_job(
+    job_id: int,
+    job_service: Annotated[JobService, Depends(job_service_dependency)],
+    user: User = Depends(current_user),
+):
+    job = await job_service.get_job(job_id, user)
+    return job
+
+
+@router.get("/{job_id}/events")
+async def get_job_events(
+    job_id: int,
+    job_service: Annotated[JobService, Depends(job_service_dependency)],
+    user: User = Depends(current_user),
+):
+    """
+    Server-Sent Events with the build progress of the job, ending with its
+    final state
+    """
+    events = await job_service.stream_job_events(job_id, user)
+    return StreamingResponse(events, media_type="text/event-stream")
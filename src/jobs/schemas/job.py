@@ -0,0 +1,35 @@
+from datetime import datetime
+from enum import StrEnum
+
+from pydantic import BaseModel
+
+
+class JobState(StrEnum):
+    PENDING = "pending"
+    RUNNING = "running"
+    SUCCEEDED = "succeeded"
+    FAILED = "failed"
+
+
+class InstallResult(BaseModel):
+    """
+    The installed package, whose closure is read from its store.
+    """
+
+    package_id: int
+    path: str | None = None
+    closure_size: int | None = None
+
+
+class Job(BaseModel):
+    id: int
+    kind: str
+    owner_id: int
+    store_name: str
+    package_name: str
+    state: JobState
+    created_at: datetime
+    started_at: datetime | None = None
+    finished_at: datetime | None = None
+    result: InstallResult | None = None
+    error: str | None = None
@@ -0,0 +1,74 @@
+import asyncio
+import logging
+import os
+from contextlib import suppress
+
+from src.dependencies.jobs import job_service_dependency
+from src.dependencies.store import package_service_dependency, store_service_dependency
+
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", "2"))
+JOB_POLL_INTERVAL = float(os.getenv("JOB_POLL_INTERVAL", "5"))
+
+logger = logging.getLogger(__name__)
+
+
+class JobWorkerPool:
+    def __init__(self, workers: int = JOB_WORKERS):
+        self.workers = workers
+        self._tasks: list[asyncio.Task] = []
+        self._wakeup: asyncio.Event | None = None
+        self._loop: asyncio.AbstractEventLoop | None = None
+
+    async def start(self):
+        self._loop = asyncio.get_running_loop()
+        self._wakeup = asyncio.Event()
+
+        await job_service_dependency().requeue_running_jobs()
+
+        self._tasks = [
+            asyncio.create_task(self._work(self._wakeup)) for _ in range(self.workers)
+        ]
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        for task in self._tasks:
+            with suppress(asyncio.CancelledError):
+                await task
+        self._tasks = []
+
+    def notify(self):
+        if self._loop is not None and self._wakeup is not None:
+            self._loop.call_soon_threadsafe(self._wakeup.set)
+
+    @staticmethod
+    async def _wait(wakeup: asyncio.Event):
+        with suppress(TimeoutError):
+            await asyncio.wait_for(wakeup.wait(), JOB_POLL_INTERVAL)
+
+    async def _work(self, wakeup: asyncio.Event):
+        job_service = job_service_dependency()
+
+        while True:
+            wakeup.clear()
+            try:
+                job = await job_service.claim_next_job()
+            except Exception:
+                await self._wait(wakeup)
+                continue
+
+            if job is None:
+                await self._wait(wakeup)
+                continue
+
+            try:
+                await job_service.run_job(
+                    job, store_service_dependency, package_service_dependency
+                )
+            except Exception:
+                logger.exception("Job %s failed unexpectedly", job.id)
+                with suppress(Exception):
+                    await job_service.fail_job(job.id, "Unexpected error")
+
+
+job_workers = JobWorkerPool()
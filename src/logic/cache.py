@@ -0,0 +1,149 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+from array import array
+from collections import OrderedDict
+from contextlib import closing
+from dataclasses import dataclass
+from pathlib import Path
+
+from src.logic.interning import path_interner
+
+CLOSURE_CACHE = os.getenv("CLOSURE_CACHE", "stores/.cache/closures.sqlite")
+CLOSURE_CACHE_ENTRIES = int(os.getenv("CLOSURE_CACHE_ENTRIES", "10000"))
+CLOSURE_CACHE_MEMORY_ENTRIES = int(os.getenv("CLOSURE_CACHE_MEMORY_ENTRIES", "256"))
+
+
+@dataclass(frozen=True)
+class CachedClosure:
+    """
+    A closure as sorted interned path ids with the `narSize` of each, so
+    cached closures share one copy of every path string.
+    """
+
+    path: str
+    ids: array
+    nar_sizes: array
+    closure_size: int
+
+    @classmethod
+    def from_sizes(cls, path: str, sizes: dict[str, int]) -> "CachedClosure":
+        entries = sorted(zip(path_interner.intern(sizes), sizes.values()))
+        return cls(
+            path,
+            array("I", [path_id for path_id, _ in entries]),
+            array("Q", [size for _, size in entries]),
+            sum(sizes.values()),
+        )
+
+    @property
+    def sizes(self) -> dict[str, int]:
+        return dict(zip(path_interner.lookup(self.ids), self.nar_sizes))
+
+
+class ClosureCache:
+    """
+    Host-wide cache of closures keyed by the root store path.
+
+    A valid store path never changes its closure, so entries are never
+    invalidated; they are only evicted least-recently-used first once the
+    cache holds more than `max_entries` closures.
+    """
+
+    def __init__(
+        self,
+        database: Path,
+        max_entries: int = CLOSURE_CACHE_ENTRIES,
+        memory_entries: int = CLOSURE_CACHE_MEMORY_ENTRIES,
+    ):
+        self.database = database
+        self.max_entries = max_entries
+        self.memory_entries = memory_entries
+        self._memory: OrderedDict[str, CachedClosure] = OrderedDict()
+        self._touched: dict[str, float] = {}
+        self._lock = threading.Lock()
+        self._initialized = False
+
+    def _connect(self) -> sqlite3.Connection:
+        if not self._initialized:
+            self.database.parent.mkdir(parents=True, exist_ok=True)
+
+        connection = sqlite3.connect(self.database, timeout=30)
+        if not self._initialized:
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute(
+                """
+                CREATE TABLE IF NOT EXISTS closure (
+                    path TEXT PRIMARY KEY,
+                    sizes TEXT NOT NULL,
+                    closure_size INTEGER NOT NULL,
+                    last_used REAL NOT NULL
+                )
+                """
+            )
+            connection.execute(
+                "CREATE INDEX IF NOT EXISTS closure_last_used ON closure (last_used)"
+            )
+            self._initialized = True
+        return connection
+
+    def _remember(self, closure: CachedClosure):
+        with self._lock:
+            self._memory[closure.path] = closure
+            self._memory.move_to_end(closure.path)
+            while len(self._memory) > self.memory_entries:
+                self._memory.popitem(last=False)
+
+    def get(self, path: str) -> CachedClosure | None:
+        with self._lock:
+            closure = self._memory.get(path)
+            if closure is not None:
+                self._memory.move_to_end(path)
+                self._touched[path] = time.time()
+                return closure
+
+        with closing(self._connect()) as connection, connection:
+            row = connection.execute(
+                "SELECT sizes, closure_size FROM closure WHERE path = ?", (path,)
+            ).fetchone()
+            if row is None:
+                return None
+            connection.execute(
+                "UPDATE closure SET last_used = ? WHERE path = ?", (time.time(), path)
+            )
+
+        closure = CachedClosure.from_sizes(path, json.loads(row[0]))
+        self._remember(closure)
+        return closure
+
+    def put(self, path: str, sizes: dict[str, int]) -> CachedClosure:
+        closure = CachedClosure.from_sizes(path, sizes)
+
+        with self._lock:
+            touched = [(used, path) for path, used in self._touched.items()]
+            self._touched.clear()
+
+        with closing(self._connect()) as connection, connection:
+            connection.executemany(
+                "UPDATE closure SET last_used = ? WHERE path = ?", touched
+            )
+            connection.execute(
+                "INSERT OR REPLACE INTO closure VALUES (?, ?, ?, ?)",
+                (path, json.dumps(sizes), closure.closure_size, time.time()),
+            )
+            connection.execute(
+                """
+                DELETE FROM closure WHERE path IN (
+                    SELECT path FROM closure ORDER BY last_used DESC LIMIT -1 OFFSET ?
+                )
+                """,
+                (self.max_entries,),
+            )
+
+        self._remember(closure)
+        return closure
+
+
+closure_cache = ClosureCache(Path(CLOSURE_CACHE))
@@ -0,0 +1,77 @@
+import re
+from collections import defaultdict
+from dataclasses import dataclass
+from functools import lru_cache
+
+# Changes smaller than this are reported only along with a version change,
+# as `nix store diff-closures` does.
+SIZE_DELTA_THRESHOLD = 8 * 1024
+
+_OUTPUT_SUFFIX = re.compile(r"(.*)-([a-z]+|lib32|lib64)")
+
+
+@dataclass(frozen=True)
+class ClosureChange:
+    name: str
+    old_versions: tuple[str, ...]
+    new_versions: tuple[str, ...]
+    size_delta: int
+
+
+def _split_name(name: str) -> tuple[str, str]:
+    # Nix's DrvName: the version starts after the first dash followed by a
+    # character that is not a letter.
+    for index, character in enumerate(name[:-1]):
+        if character == "-" and not name[index + 1].isalpha():
+            return name[:index], name[index + 1 :]
+    return name, ""
+
+
+@lru_cache(maxsize=65536)
+def parse_store_path(path: str) -> tuple[str, str]:
+    """
+    Split a store path such as `/nix/store/<hash>-glibc-2.39-52-bin` into its
+    package name and version, dropping the output name: `("glibc", "2.39-52")`.
+    """
+    # The hash part is base32 and never contains a dash.
+    name = path.rsplit("/", 1)[-1].partition("-")[2]
+
+    match = _OUTPUT_SUFFIX.fullmatch(name)
+    if match is not None:
+        package_name, version = _split_name(match[1])
+        if version:
+            return package_name, version
+    return _split_name(name)
+
+
+def _group(sizes: dict[str, int]) -> dict[str, dict[str, int]]:
+    packages: dict[str, dict[str, int]] = defaultdict(lambda: defaultdict(int))
+    for path, size in sizes.items():
+        name, version = parse_store_path(path)
+        packages[name][version] += size
+    return packages
+
+
+def diff_closures(
+    sizes_1: dict[str, int], sizes_2: dict[str, int]
+) -> list[ClosureChange]:
+    """
+    Per-package changes between two closures given as `{path: narSize}`:
+    versions removed and added, and the change of the package's total size,
+    largest changes first.
+    """
+    packages_1, packages_2 = _group(sizes_1), _group(sizes_2)
+
+    changes = []
+    for name in packages_1.keys() | packages_2.keys():
+        versions_1 = packages_1.get(name, {})
+        versions_2 = packages_2.get(name, {})
+        old_versions = tuple(sorted(versions_1.keys() - versions_2.keys()))
+        new_versions = tuple(sorted(versions_2.keys() - versions_1.keys()))
+        size_delta = sum(versions_2.values()) - sum(versions_1.values())
+
+        if old_versions or new_versions or abs(size_delta) >= SIZE_DELTA_THRESHOLD:
+            changes.append(ClosureChange(name, old_versions, new_versions, size_delta))
+
+    changes.sort(key=lambda change: (-abs(change.size_delta), change.name))
+    return changes
@@ -0,0 +1,150 @@
+import sqlite3
+from collections.abc import Iterable, Iterator
+from pathlib import Path
+
+from src.logic.exceptions import NotValidPathException, UnknownStoreSchemaException
+
+STORE_DATABASE = "nix/var/nix/db/db.sqlite"
+
+_REQUIRED_COLUMNS = {
+    "ValidPaths": {"id", "path", "narSize"},
+    "Refs": {"referrer", "reference"},
+}
+
+_CLOSURE_QUERY = """
+WITH RECURSIVE closure(id) AS (
+    SELECT id FROM ValidPaths WHERE path IN ({roots})
+    UNION
+    SELECT Refs.reference FROM Refs JOIN closure ON Refs.referrer = closure.id
+)
+SELECT ValidPaths.path, ValidPaths.narSize
+FROM ValidPaths JOIN closure ON ValidPaths.id = closure.id
+"""
+
+
+def get_database_path(store: Path) -> Path:
+    return store / STORE_DATABASE
+
+
+def _connect(store: Path, check_same_thread: bool = True) -> sqlite3.Connection:
+    database = get_database_path(store)
+    if not database.exists():
+        raise NotValidPathException()
+
+    connection = sqlite3.connect(
+        f"{database.resolve().as_uri()}?mode=ro",
+        uri=True,
+        check_same_thread=check_same_thread,
+    )
+    try:
+        _check_schema(connection)
+    except Exception:
+        connection.close()
+        raise
+    return connection
+
+
+def _check_schema(connection: sqlite3.Connection):
+    for table, required_columns in _REQUIRED_COLUMNS.items():
+        columns = {row[1] for row in connection.execute(f"PRAGMA table_info({table})")}
+        if not required_columns <= columns:
+            raise UnknownStoreSchemaException()
+
+
+def get_closure(store: Path, paths: Iterable[str]) -> dict[str, int]:
+    """
+    Map every path in the closure of `paths` to its `narSize`.
+    """
+    roots = list(set(paths))
+
+    connection = _connect(store)
+    try:
+        placeholders = ", ".join("?" * len(roots))
+        valid_roots = connection.execute(
+            f"SELECT COUNT(*) FROM ValidPaths WHERE path IN ({placeholders})",  # nosec hardcoded_sql_expressions
+            roots,
+        ).fetchone()[0]
+        if valid_roots != len(roots):
+            raise NotValidPathException()
+
+        rows = connection.execute(
+            _CLOSURE_QUERY.format(roots=placeholders),  # nosec hardcoded_sql_expressions
+            roots,
+        ).fetchall()
+    finally:
+        connection.close()
+
+    return {path: nar_size or 0 for path, nar_size in rows}
+
+
+def get_closure_size(store: Path, paths: Iterable[str]) -> int:
+    return sum(get_closure(store, paths).values())
+
+
+def get_valid_paths(store: Path, after_id: int = 0) -> tuple[dict[int, str], int]:
+    """
+    Valid paths registered with an id above `after_id`, and the number of
+    valid paths in the store. Ids are never reused, so this reads only the
+    paths added since a previous call.
+    """
+    connection = _connect(store)
+    try:
+        rows = connection.execute(
+            "SELECT id, path FROM ValidPaths WHERE id > ?", (after_id,)
+        ).fetchall()
+        count = connection.execute("SELECT COUNT(*) FROM ValidPaths").fetchone()[0]
+    finally:
+        connection.close()
+
+    return dict(rows), count
+
+
+def iter_valid_paths(
+    store: Path, after: str | None = None
+) -> Iterator[tuple[str, int]]:
+    """
+    Stream `(path, narSize)` of the valid paths sorted by path, starting after
+    `after`. Rows are read lazily off the path index, and the iterator may be
+    advanced from different threads.
+    """
+    connection = _connect(store, check_same_thread=False)
+    return _iter_valid_paths(connection, after)
+
+
+def _iter_valid_paths(
+    connection: sqlite3.Connection, after: str | None
+) -> Iterator[tuple[str, int]]:
+    try:
+        rows = connection.execute(
+            "SELECT path, narSize FROM ValidPaths WHERE path > ? ORDER BY path",
+            (after or "",),
+        )
+        for path, nar_size in rows:
+            yield path, nar_size or 0
+    finally:
+        connection.close()
+
+
+def get_reference_graph(
+    store: Path, after_id: int = 0
+) -> tuple[list[tuple[int, str, int]], list[tuple[int, int]], int]:
+    """
+    The part of the store's reference graph registered with an id above
+    `after_id`: `(id, path, narSize)` of the valid paths, `(referrer,
+    reference)` ids of their references, and the number of valid paths in
+    the store.
+    """
+    connection = _connect(store)
+    try:
+        rows = connection.execute(
+            "SELECT id, path, narSize FROM ValidPaths WHERE id > ? ORDER BY id",
+            (after_id,),
+        ).fetchall()
+        refs = connection.execute(
+            "SELECT referrer, reference FROM Refs WHERE referrer > ?", (after_id,)
+        ).fetchall()
+        count = connection.execute("SELECT COUNT(*) FROM ValidPaths").fetchone()[0]
+    finally:
+        connection.close()
+
+    return [(id, path, size or 0) for id, path, size in rows], refs, count
@@ -1,9 +1,19 @@
+import asyncio
 import json
 import os
+import sqlite3
+from array import array
+from asyncio.subprocess import PIPE, create_subprocess_exec
+from collections.abc import Callable, Iterable
+from contextlib import closing
 from pathlib import Path
-from shutil import rmtree
-from subprocess import CalledProcessError, run  # nosec import_subprocess
+from shutil import copy2, copytree, ignore_patterns, rmtree
+from subprocess import CalledProcessError, CompletedProcess  # nosec import_subprocess
+from urllib.parse import urlencode
+from uuid import uuid4
 
+from src.logic import closure as closure_engine
+from src.logic.cache import CachedClosure, closure_cache
 from src.logic.exceptions import (
     AttributeNotProvidedException,
     BrokenPackageException,
@@ -14,21 +24,215 @@ from src.logic.exceptions import (
     StillAliveException,
     StoreFolderDoesNotExistException,
     UnfreeLicenceException,
+    UnknownStoreSchemaException,
 )
+from src.logic.progress import BuildProgress, ProgressTracker
+from src.logic.singleflight import SingleFlight
 
+NIX_CONCURRENCY = int(os.getenv("NIX_CONCURRENCY", "4"))
+NIXPKGS_REVISION = os.getenv("NIXPKGS_REVISION")
+NIX_LOG_LINE_LIMIT = 2**20
+# Host-wide binary cache shared by every store; empty to disable it.
+NIX_BINARY_CACHE = os.getenv("NIX_BINARY_CACHE", "stores/.cache/binary")
 
-def _run_nix(*args: str):
-    return run(  # nosec subprocess_without_shell_equals_true
-        ["nix"] + list(args),
-        capture_output=True,
-        text=True,
+_nix_semaphore = asyncio.Semaphore(NIX_CONCURRENCY)
+
+# Identical concurrent read-only Nix queries share one subprocess and its result.
+nix_flight = SingleFlight()
+closure_flight = SingleFlight()
+
+
+async def _query_nix(*args: str) -> CompletedProcess[str]:
+    """
+    Runs a read-only Nix command. Commands that change a store must use
+    `_run_nix`, as each caller expects its own invocation.
+    """
+    return await nix_flight.do(args, _run_nix, *args)
+
+
+async def _run_nix(*args: str) -> CompletedProcess[str]:
+    command = ["nix"] + list(args)
+
+    async with _nix_semaphore:
+        process = await create_subprocess_exec(  # nosec start_process_with_no_shell
+            *command,
+            stdout=PIPE,
+            stderr=PIPE,
+        )
+        try:
+            stdout, stderr = await process.communicate()
+        except asyncio.CancelledError:
+            process.kill()
+            await process.wait()
+            raise
+
+    return CompletedProcess(
+        command,
+        process.returncode,  # type: ignore
+        stdout.decode(),
+        stderr.decode(),
     )
 
 
+async def _stream_nix(
+    *args: str, on_stderr_line: Callable[[str], None]
+) -> CompletedProcess[str]:
+    command = ["nix"] + list(args)
+
+    async with _nix_semaphore:
+        process = await create_subprocess_exec(  # nosec start_process_with_no_shell
+            *command,
+            stdout=PIPE,
+            stderr=PIPE,
+            limit=NIX_LOG_LINE_LIMIT,
+        )
+        stdout_reader = asyncio.ensure_future(process.stdout.read())  # type: ignore
+        try:
+            async for line in process.stderr:  # type: ignore
+                on_stderr_line(line.decode(errors="replace").rstrip("\n"))
+            stdout = await stdout_reader
+            await process.wait()
+        except BaseException:
+            stdout_reader.cancel()
+            if process.returncode is None:
+                process.kill()
+                await process.wait()
+            raise
+
+    return CompletedProcess(
+        command,
+        process.returncode,  # type: ignore
+        stdout.decode(),
+        "",
+    )
+
+
+_nixpkgs_revision: str | None = NIXPKGS_REVISION
+
+
+async def get_nixpkgs_revision() -> str:
+    global _nixpkgs_revision
+
+    revision = _nixpkgs_revision
+    if revision is None:
+        process = await _query_nix("flake", "metadata", "--json", "nixpkgs")
+        process.check_returncode()
+        revision = _nixpkgs_revision = json.loads(process.stdout)["locked"]["rev"]
+
+    return revision
+
+
+def _nixpkgs(revision: str | None) -> str:
+    return "nixpkgs" if revision is None else f"nixpkgs/{revision}"
+
+
+def _binary_cache_url(**parameters: str) -> str | None:
+    if not NIX_BINARY_CACHE:
+        return None
+
+    url = f"file://{Path(NIX_BINARY_CACHE).resolve()}"
+    if parameters:
+        url += f"?{urlencode(parameters)}"
+    return url
+
+
+def _substituter_options() -> list[str]:
+    # Paths in the cache were built or verified by us, so they need no
+    # signatures, and the cache is queried before any remote substituter.
+    url = _binary_cache_url(trusted="true", priority="10")
+    if url is None:
+        return []
+    return ["--option", "extra-substituters", url]
+
+
+def _check_evaluation(process: CompletedProcess[str]):
+    try:
+        process.check_returncode()
+    except CalledProcessError as exception:
+        if "is marked as insecure, refusing to evaluate." in process.stderr:
+            raise InsecurePackageException()
+        elif "is marked as broken, refusing to evaluate." in process.stderr:
+            raise BrokenPackageException()
+        elif "is not available on the requested hostPlatform" in process.stderr:
+            raise NotAvailableOnHostPlatformException()
+        elif "does not provide attribute" in process.stderr:
+            raise AttributeNotProvidedException()
+        elif (
+            "has an unfree license (‘unfree’), refusing to evaluate." in process.stderr
+        ):
+            raise UnfreeLicenceException()
+        else:
+            raise exception
+
+
 def create_store(store: Path):
     store.mkdir(parents=True)
 
 
+def _link_or_copy(source: str, target: str):
+    try:
+        os.link(source, target)
+    except OSError:
+        # Another filesystem: copy2 still reflinks where the filesystem can.
+        copy2(source, target)
+
+
+def clone_store(source: Path, target: Path):
+    """
+    Creates `target` as a copy of the store `source`. The immutable
+    `nix/store` contents are hardlinked and only the Nix database and state
+    are copied, so a clone takes almost no extra disk.
+    """
+    if not source.exists():
+        raise StoreFolderDoesNotExistException()
+    target.mkdir(parents=True)
+
+    try:
+        if (source / "nix/store").exists():
+            copytree(
+                source / "nix/store",
+                target / "nix/store",
+                symlinks=True,
+                ignore=ignore_patterns(".links"),
+                copy_function=_link_or_copy,
+            )
+
+        state = source / "nix/var"
+        if state.exists():
+            copytree(
+                state,
+                target / "nix/var",
+                symlinks=True,
+                ignore=ignore_patterns("db.sqlite*", "big-lock", "temproots"),
+            )
+
+        database = closure_engine.get_database_path(source)
+        if database.exists():
+            # The backup API gives a consistent copy even during an install.
+            source_uri = f"{database.resolve().as_uri()}?mode=ro"
+            with (
+                closing(sqlite3.connect(source_uri, uri=True)) as source_db,
+                closing(
+                    sqlite3.connect(closure_engine.get_database_path(target))
+                ) as target_db,
+            ):
+                source_db.backup(target_db)
+    except BaseException:
+        remove_store(target)
+        raise
+
+
+def trash_store(store: Path, trash: Path) -> Path:
+    """
+    Atomically moves `store` into `trash`, from where it is deleted in the
+    background. `trash` must be on the same filesystem as the store.
+    """
+    trash.mkdir(parents=True, exist_ok=True)
+    trashed = trash / uuid4().hex
+    store.rename(trashed)
+    return trashed
+
+
 def remove_store(store: Path):
     def handle_permission_error(function, path, excinfo):
         exception_type, error, _ = excinfo
@@ -55,46 +259,59 @@ def get_paths(store: Path):
             raise StoreFolderDoesNotExistException()
 
 
-def install_package(store: Path, package_name: str):
-    process = _run_nix(
+async def resolve_package(package_name: str, revision: str | None = None) -> str:
+    process = await _query_nix(
+        "eval",
+        "--raw",
+        f"{_nixpkgs(revision)}#{package_name}.outPath",
+    )
+    _check_evaluation(process)
+
+    return process.stdout.strip()
+
+
+async def install_package(
+    store: Path,
+    package_name: str,
+    revision: str | None = None,
+    on_progress: Callable[[BuildProgress], None] | None = None,
+) -> dict[str, str]:
+    tracker = ProgressTracker()
+
+    def on_stderr_line(line: str):
+        if tracker.feed(line) and on_progress is not None:
+            on_progress(tracker.snapshot())
+
+    process = await _stream_nix(
         "build",
         "--json",
         "--no-link",
+        "--log-format",
+        "internal-json",
+        *_substituter_options(),
         "--store",
         str(store),
-        f"nixpkgs#{package_name}",
+        f"{_nixpkgs(revision)}#{package_name}",
+        on_stderr_line=on_stderr_line,
     )
-    try:
-        process.check_returncode()
-    except CalledProcessError as exception:
-        if "is marked as insecure, refusing to evaluate." in process.stderr:
-            raise InsecurePackageException()
-        elif "is marked as broken, refusing to evaluate." in process.stderr:
-            raise BrokenPackageException()
-        elif "is not available on the requested hostPlatform" in process.stderr:
-            raise NotAvailableOnHostPlatformException()
-        elif "does not provide attribute" in process.stderr:
-            raise AttributeNotProvidedException()
-        elif (
-            "has an unfree license (‘unfree’), refusing to evaluate." in process.stderr
-        ):
-            raise UnfreeLicenceException()
-        else:
-            raise exception
+    process.stderr = tracker.error_text()
+    _check_evaluation(process)
 
     output = json.loads(process.stdout)
-    path = output[0]["outputs"]["out"]
-    return path
+    return output[0]["outputs"]
 
 
-def remove_package(store: Path, package_name: str):
-    process = _run_nix(
-        "store",
-        "delete",
-        "--store",
-        str(store),
-        f"nixpkgs#{package_name}",
-    )
+async def copy_to_binary_cache(store: Path, paths: list[str]) -> bool:
+    url = _binary_cache_url(compression="zstd")
+    if url is None or not paths:
+        return False
+
+    process = await _run_nix("copy", "--to", url, "--store", str(store), *paths)
+    return process.returncode == 0
+
+
+async def remove_package(store: Path, paths: list[str]):
+    process = await _run_nix("store", "delete", "--store", str(store), *paths)
     try:
         process.check_returncode()
     except CalledProcessError:
@@ -108,32 +325,14 @@ def _check_paths_are_valid(output):
         raise PackageNotInstalledException()
 
 
-def get_closure_size(store: Path, package_name: str):
-    process = _run_nix(
-        "path-info",
-        "--json",
-        "--store",
-        str(store),
-        "--closure-size",
-        f"nixpkgs#{package_name}",
-    )
-    process.check_returncode()
-
-    output = json.loads(process.stdout)
-    _check_paths_are_valid(output)
-
-    closure_size = sum(path["closureSize"] for path in output)
-    return closure_size
-
-
-def get_closure(store: Path, package_name: str) -> list[str]:
-    process = _run_nix(
+async def _query_closure(store: Path, installable: str) -> list[dict]:
+    process = await _query_nix(
         "path-info",
         "--json",
         "--store",
         str(store),
         "--recursive",
-        f"nixpkgs#{package_name}",
+        installable,
     )
     try:
         process.check_returncode()
@@ -145,4 +344,61 @@ def get_closure(store: Path, package_name: str) -> list[str]:
     output = json.loads(process.stdout)
     _check_paths_are_valid(output)
 
-    return list(set(path["path"] for path in output))
+    return output
+
+
+async def get_cached_closure(store: Path, path: str) -> CachedClosure:
+    return await closure_flight.do((str(store), path), _get_closure, store, path)
+
+
+async def get_closure_sizes(store: Path, path: str) -> dict[str, int]:
+    closure = await get_cached_closure(store, path)
+    return closure.sizes
+
+
+async def get_outputs_closure_sizes(
+    store: Path, outputs: Iterable[str]
+) -> dict[str, int]:
+    """
+    Union of the closures of all outputs of a package.
+    """
+    sizes: dict[str, int] = {}
+    for path in outputs:
+        sizes.update(await get_closure_sizes(store, path))
+    return sizes
+
+
+async def _get_closure(store: Path, path: str) -> CachedClosure:
+    cached = await asyncio.to_thread(closure_cache.get, path)
+    if cached is not None:
+        if not (store / path.lstrip("/")).exists():
+            raise NotValidPathException()
+        return cached
+
+    try:
+        sizes = await asyncio.to_thread(closure_engine.get_closure, store, [path])
+    except UnknownStoreSchemaException:
+        output = await _query_closure(store, path)
+        sizes = {entry["path"]: entry["narSize"] for entry in output}
+
+    return await asyncio.to_thread(closure_cache.put, path, sizes)
+
+
+async def get_closure_size(store: Path, path: str) -> int:
+    try:
+        closure = await get_cached_closure(store, path)
+    except NotValidPathException:
+        raise PackageNotInstalledException()
+    return closure.closure_size
+
+
+async def get_closure(store: Path, path: str) -> list[str]:
+    return list(await get_closure_sizes(store, path))
+
+
+async def get_closure_ids(store: Path, path: str) -> array:
+    """
+    Sorted interned ids of the closure, see `get_closure`.
+    """
+    closure = await get_cached_closure(store, path)
+    return closure.ids
@@ -0,0 +1,56 @@
+from collections.abc import Iterable, Iterator
+from dataclasses import dataclass
+from pathlib import Path
+
+from src.logic import closure as closure_engine
+from src.logic import core as core_logic
+from src.logic.exceptions import UnknownStoreSchemaException
+
+ABSENT_IN_STORE_1 = "absent_in_store_1"
+ABSENT_IN_STORE_2 = "absent_in_store_2"
+
+
+@dataclass(frozen=True)
+class DifferenceEntry:
+    side: str
+    path: str
+    nar_size: int
+
+
+def iter_store_paths(
+    store: Path, after: str | None = None
+) -> Iterator[tuple[str, int]]:
+    """
+    `(path, narSize)` of the paths of `store` in sorted order, starting after
+    `after`. Stores without a readable Nix database are listed from the
+    directory, with unknown sizes reported as 0.
+    """
+    if closure_engine.get_database_path(store).exists():
+        try:
+            return closure_engine.iter_valid_paths(store, after)
+        except UnknownStoreSchemaException:
+            pass
+
+    paths = sorted(core_logic.get_paths(store))
+    return ((path, 0) for path in paths if after is None or path > after)
+
+
+def merge_difference(
+    paths_1: Iterable[tuple[str, int]], paths_2: Iterable[tuple[str, int]]
+) -> Iterator[DifferenceEntry]:
+    """
+    Merge join of two sorted path streams, yielding the paths present in only
+    one of them in sorted order. Memory use does not grow with the stores.
+    """
+    iterator_1, iterator_2 = iter(paths_1), iter(paths_2)
+    entry_1, entry_2 = next(iterator_1, None), next(iterator_2, None)
+
+    while entry_1 is not None or entry_2 is not None:
+        if entry_1 is not None and (entry_2 is None or entry_1[0] < entry_2[0]):
+            yield DifferenceEntry(ABSENT_IN_STORE_2, *entry_1)
+            entry_1 = next(iterator_1, None)
+        elif entry_2 is not None and (entry_1 is None or entry_2[0] < entry_1[0]):
+            yield DifferenceEntry(ABSENT_IN_STORE_1, *entry_2)
+            entry_2 = next(iterator_2, None)
+        else:
+            entry_1, entry_2 = next(iterator_1, None), next(iterator_2, None)
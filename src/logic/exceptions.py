@@ -32,3 +32,7 @@ class StoreFolderDoesNotExistException(Exception):
 
 class NotValidPathException(Exception):
     pass
+
+
+class UnknownStoreSchemaException(Exception):
+    pass
@@ -0,0 +1,283 @@
+import asyncio
+import heapq
+import os
+from collections import OrderedDict, deque
+from collections.abc import Iterable
+from pathlib import Path
+
+from src.logic import closure as closure_engine
+from src.logic.exceptions import NotValidPathException
+from src.logic.paths import store_stamp
+from src.logic.singleflight import SingleFlight
+
+REFERENCE_GRAPH_STORES = int(os.getenv("REFERENCE_GRAPH_STORES", "16"))
+
+
+class ReferenceGraph:
+    """
+    Reference graph of a store with paths numbered by position, along with
+    the reverse edges. Nix references never form cycles apart from
+    self-references, which are dropped.
+    """
+
+    def __init__(
+        self,
+        paths: Iterable[str] = (),
+        sizes: Iterable[int] = (),
+        references: Iterable[Iterable[int]] = (),
+    ):
+        self.paths: list[str] = []
+        self.sizes: list[int] = []
+        self.references: list[list[int]] = []
+        self.referrers: list[list[int]] = []
+        self.ids: dict[str, int] = {}
+        # Highest ValidPaths id loaded, and positions by ValidPaths id.
+        self.last_id = 0
+        self._positions: dict[int, int] = {}
+
+        for path, size in zip(paths, sizes):
+            self._append(path, size)
+        for referrer, node_references in enumerate(references):
+            for reference in node_references:
+                self._link(referrer, reference)
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def _append(self, path: str, size: int) -> int:
+        position = len(self.paths)
+        self.paths.append(path)
+        self.sizes.append(size)
+        self.references.append([])
+        self.referrers.append([])
+        self.ids[path] = position
+        return position
+
+    def _link(self, referrer: int, reference: int):
+        if referrer != reference:
+            self.references[referrer].append(reference)
+            self.referrers[reference].append(referrer)
+
+    def add(
+        self, rows: Iterable[tuple[int, str, int]], refs: Iterable[tuple[int, int]]
+    ):
+        """
+        Adds ValidPaths rows and the Refs rows of their references. Store
+        paths are immutable, so existing paths never gain references.
+        """
+        for path_id, path, size in rows:
+            self._positions[path_id] = self._append(path, size)
+            self.last_id = max(self.last_id, path_id)
+        for referrer, reference in refs:
+            self._link(self._positions[referrer], self._positions[reference])
+
+    def remove(self, path: str):
+        position = self.ids.pop(path, None)
+        if position is None:
+            return
+
+        for reference in self.references[position]:
+            self.referrers[reference].remove(position)
+        for referrer in self.referrers[position]:
+            self.references[referrer].remove(position)
+        self.references[position] = []
+        self.referrers[position] = []
+
+    def id(self, path: str) -> int:
+        try:
+            return self.ids[path]
+        except KeyError:
+            raise NotValidPathException()
+
+    def ancestors(self, node: int) -> set[int]:
+        """
+        `node` and every path that references it, directly or not.
+        """
+        seen = {node}
+        queue = deque([node])
+        while queue:
+            for referrer in self.referrers[queue.popleft()]:
+                if referrer not in seen:
+                    seen.add(referrer)
+                    queue.append(referrer)
+        return seen
+
+    def closure(self, root: int) -> list[int]:
+        seen = {root}
+        queue = deque([root])
+        while queue:
+            for reference in self.references[queue.popleft()]:
+                if reference not in seen:
+                    seen.add(reference)
+                    queue.append(reference)
+        return list(seen)
+
+    def spanning_tree(self, root: int) -> tuple[list[int], dict[int, int | None]]:
+        """
+        Closure of `root` in breadth-first order, with the path each one was
+        first reached from.
+        """
+        order = [root]
+        parents: dict[int, int | None] = {root: None}
+        for node in order:
+            for reference in self.references[node]:
+                if reference not in parents:
+                    parents[reference] = node
+                    order.append(reference)
+        return order, parents
+
+    def subtree_sizes(
+        self, order: list[int], parents: dict[int, int | None]
+    ) -> dict[int, int]:
+        """
+        Summed size of each subtree of a spanning tree. Every path belongs to
+        exactly one subtree, so the root's sum is the closure size.
+        """
+        sizes: dict[int, int] = {}
+        for node in reversed(order):
+            sizes[node] = sizes.get(node, 0) + self.sizes[node]
+            parent = parents[node]
+            if parent is not None:
+                sizes[parent] = sizes.get(parent, 0) + sizes[node]
+        return sizes
+
+    def distances_to(
+        self, targets: Iterable[int], within: Iterable[int]
+    ) -> dict[int, int]:
+        """
+        Number of references on the shortest chain from each path in `within`
+        to any of `targets`; paths that reach no target are left out.
+        """
+        within = set(within)
+        referrers: dict[int, list[int]] = {}
+        for node in within:
+            for reference in self.references[node]:
+                referrers.setdefault(reference, []).append(node)
+
+        distances = {target: 0 for target in targets if target in within}
+        queue = deque(distances)
+        while queue:
+            node = queue.popleft()
+            for referrer in referrers.get(node, ()):
+                if referrer not in distances:
+                    distances[referrer] = distances[node] + 1
+                    queue.append(referrer)
+        return distances
+
+    def chains(self, root: int, targets: Iterable[int], limit: int) -> list[list[int]]:
+        """
+        The `limit` shortest chains of references from `root` to any of
+        `targets`, shortest first.
+        """
+        targets = set(targets)
+        distances = self.distances_to(targets, self.closure(root))
+        if root not in distances:
+            return []
+
+        # Best-first search keyed by the exact length of the shortest
+        # completion. Each queued chain completes into at least one result,
+        # so only the best `limit` of them are ever kept.
+        chains: list[list[int]] = []
+        heap = [(distances[root], [root])]
+        while heap and len(chains) < limit:
+            length, chain = heapq.heappop(heap)
+            node = chain[-1]
+            if node in targets:
+                chains.append(chain)
+                continue
+
+            for reference in self.references[node]:
+                if reference in distances:
+                    heapq.heappush(
+                        heap, (len(chain) + distances[reference], [*chain, reference])
+                    )
+            if len(heap) > limit - len(chains):
+                heap = heapq.nsmallest(limit - len(chains), heap)
+        return chains
+
+
+class ReferenceGraphCache:
+    """
+    Reference graphs of the most recently used stores.
+
+    A graph read for a store whose paths changed is reloaded into a new
+    object, so graphs handed out are never modified behind a reader. Only
+    `update` and `discard`, called while the store is scheduled for writing,
+    change a cached graph in place.
+    """
+
+    def __init__(self, max_stores: int = REFERENCE_GRAPH_STORES):
+        self.max_stores = max_stores
+        self._graphs: OrderedDict[str, tuple[int | None, ReferenceGraph]] = (
+            OrderedDict()
+        )
+        self._flight = SingleFlight()
+
+    def _remember(self, store: Path, stamp: int | None, graph: ReferenceGraph):
+        key = str(store)
+        self._graphs[key] = (stamp, graph)
+        self._graphs.move_to_end(key)
+        while len(self._graphs) > self.max_stores:
+            self._graphs.popitem(last=False)
+
+    async def get(self, store: Path) -> ReferenceGraph:
+        key = str(store)
+        cached = self._graphs.get(key)
+        stamp = store_stamp(store)
+        if cached is not None and stamp is not None and cached[0] == stamp:
+            self._graphs.move_to_end(key)
+            return cached[1]
+
+        return await self._flight.do(key, self._load, store)
+
+    @staticmethod
+    def _read(store: Path) -> tuple[int | None, ReferenceGraph]:
+        stamp = store_stamp(store)
+        rows, refs, _ = closure_engine.get_reference_graph(store)
+        graph = ReferenceGraph()
+        graph.add(rows, refs)
+        return stamp, graph
+
+    async def _load(self, store: Path) -> ReferenceGraph:
+        stamp, graph = await asyncio.to_thread(self._read, store)
+        self._remember(store, stamp, graph)
+        return graph
+
+    async def update(self, store: Path):
+        """
+        Adds the paths registered since the cached graph was read.
+        """
+        cached = self._graphs.get(str(store))
+        if cached is None:
+            return
+
+        graph = cached[1]
+
+        def read_added() -> tuple[int | None, bool]:
+            stamp = store_stamp(store)
+            rows, refs, count = closure_engine.get_reference_graph(store, graph.last_id)
+            graph.add(rows, refs)
+            return stamp, len(graph) == count
+
+        stamp, complete = await asyncio.to_thread(read_added)
+        if complete:
+            self._remember(store, stamp, graph)
+        else:
+            # Paths were removed outside the service.
+            self.forget(store)
+
+    def discard(self, store: Path, paths: Iterable[str]):
+        cached = self._graphs.get(str(store))
+        if cached is None:
+            return
+
+        graph = cached[1]
+        for path in paths:
+            graph.remove(path)
+        self._remember(store, store_stamp(store), graph)
+
+    def forget(self, store: Path):
+        self._graphs.pop(str(store), None)
+
+
+reference_graphs = ReferenceGraphCache()
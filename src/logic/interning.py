@@ -0,0 +1,67 @@
+import threading
+from array import array
+from collections.abc import Iterable
+
+
+class PathInterner:
+    """
+    Host-wide table giving every store path a small integer id, so a set of
+    paths can be held as a bitmap with one bit per id.
+    """
+
+    def __init__(self):
+        self._ids: dict[str, int] = {}
+        self._paths: list[str] = []
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._paths)
+
+    def intern(self, paths: Iterable[str]) -> list[int]:
+        with self._lock:
+            ids = []
+            for path in paths:
+                path_id = self._ids.get(path)
+                if path_id is None:
+                    path_id = self._ids[path] = len(self._paths)
+                    self._paths.append(path)
+                ids.append(path_id)
+            return ids
+
+    def bitmap(self, paths: Iterable[str]) -> int:
+        ids = self.intern(paths)
+        if not ids:
+            return 0
+
+        bits = bytearray((max(ids) >> 3) + 1)
+        for path_id in ids:
+            bits[path_id >> 3] |= 1 << (path_id & 7)
+        return int.from_bytes(bits, "little")
+
+    def sorted_ids(self, paths: Iterable[str]) -> array:
+        return array("I", sorted(self.intern(paths)))
+
+    def lookup(self, ids: Iterable[int]) -> list[str]:
+        # Ids are only ever appended, so reading needs no lock.
+        return [self._paths[path_id] for path_id in ids]
+
+    def paths(self, bitmap: int) -> list[str]:
+        data = bitmap.to_bytes((bitmap.bit_length() + 7) >> 3, "little")
+        paths = []
+        for index, byte in enumerate(data):
+            while byte:
+                low_bit = byte & -byte
+                paths.append(self._paths[(index << 3) + low_bit.bit_length() - 1])
+                byte ^= low_bit
+        return sorted(paths)
+
+
+def difference(ids: array, other: array) -> array:
+    """
+    Ids of the sorted `ids` missing from `other`, still sorted.
+    """
+    other_ids = set(other)
+    return array("I", [path_id for path_id in ids if path_id not in other_ids])
+
+
+path_interner = PathInterner()
@@ -0,0 +1,68 @@
+import threading
+from collections import OrderedDict
+
+from src.logic.interning import PathInterner, path_interner
+from src.logic.paths import PATH_INDEX_STORES
+
+
+class MembershipIndex:
+    """
+    Bitmaps of the paths of the most recently used stores over a shared
+    `PathInterner`, rebuilt only when the store's path set changes.
+    """
+
+    def __init__(
+        self,
+        interner: PathInterner | None = None,
+        max_stores: int = PATH_INDEX_STORES,
+    ):
+        self.interner = interner or path_interner
+        self.max_stores = max_stores
+        self._bitmaps: OrderedDict[str, tuple[frozenset[str], int]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def bitmap(self, store: str, paths: frozenset[str]) -> int:
+        with self._lock:
+            cached = self._bitmaps.get(store)
+            if cached is not None and cached[0] is paths:
+                self._bitmaps.move_to_end(store)
+                return cached[1]
+
+        bitmap = self.interner.bitmap(paths)
+        with self._lock:
+            self._bitmaps[store] = (paths, bitmap)
+            self._bitmaps.move_to_end(store)
+            while len(self._bitmaps) > self.max_stores:
+                self._bitmaps.popitem(last=False)
+        return bitmap
+
+    def forget(self, store: str):
+        with self._lock:
+            self._bitmaps.pop(store, None)
+
+
+def group_by_membership(bitmaps: list[int]) -> list[tuple[tuple[int, ...], int]]:
+    """
+    Partition the paths of all `bitmaps` by the stores holding them. Returns
+    the indices of the holding stores and the bitmap of the paths for every
+    membership pattern that occurs. Each store costs one AND per pattern
+    found so far, independently of how many paths the stores hold.
+    """
+    union = 0
+    for bitmap in bitmaps:
+        union |= bitmap
+
+    groups: list[tuple[tuple[int, ...], int]] = [((), union)] if union else []
+    for index, bitmap in enumerate(bitmaps):
+        split = []
+        for stores, group in groups:
+            inside, outside = group & bitmap, group & ~bitmap
+            if inside:
+                split.append(((*stores, index), inside))
+            if outside:
+                split.append((stores, outside))
+        groups = split
+    return groups
+
+
+membership_index = MembershipIndex()
@@ -0,0 +1,109 @@
+import asyncio
+import os
+from collections import OrderedDict
+from collections.abc import Iterable
+from dataclasses import dataclass
+from pathlib import Path
+
+from src.logic import closure as closure_engine
+from src.logic import core as core_logic
+from src.logic.exceptions import UnknownStoreSchemaException
+from src.logic.singleflight import SingleFlight
+
+PATH_INDEX_STORES = int(os.getenv("PATH_INDEX_STORES", "64"))
+
+
+def store_stamp(store: Path) -> int | None:
+    """
+    Modification time of the store's `nix/store` directory, which changes
+    whenever a path is added to or removed from the store.
+    """
+    try:
+        return (store / "nix/store").stat().st_mtime_ns
+    except FileNotFoundError:
+        return None
+
+
+@dataclass(frozen=True)
+class IndexedPaths:
+    paths: frozenset[str]
+    # Modification time of `nix/store` when the paths were read.
+    stamp: int | None
+    # Highest ValidPaths id seen, None when read from the directory.
+    last_id: int | None = None
+
+
+class PathIndex:
+    """
+    In-memory index of the paths of the most recently used stores.
+
+    An entry is served as long as the `nix/store` directory keeps its
+    modification time. Otherwise only the paths registered since the last
+    read are fetched from the Nix database; the index is rebuilt from scratch
+    only when paths were removed behind its back.
+    """
+
+    def __init__(self, max_stores: int = PATH_INDEX_STORES):
+        self.max_stores = max_stores
+        self._entries: OrderedDict[str, IndexedPaths] = OrderedDict()
+        self._flight = SingleFlight()
+
+    async def get(self, store: Path) -> frozenset[str]:
+        key = str(store)
+        entry = self._entries.get(key)
+        if (
+            entry is not None
+            and entry.stamp is not None
+            and entry.stamp == store_stamp(store)
+        ):
+            self._entries.move_to_end(key)
+            return entry.paths
+
+        return await self._flight.do(key, self._refresh, store)
+
+    async def _refresh(self, store: Path) -> frozenset[str]:
+        key = str(store)
+        entry = await asyncio.to_thread(self._read, store, self._entries.get(key))
+        self._entries[key] = entry
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_stores:
+            self._entries.popitem(last=False)
+        return entry.paths
+
+    def _read(self, store: Path, previous: IndexedPaths | None) -> IndexedPaths:
+        # Stamp first: a change made while reading invalidates the entry.
+        stamp = store_stamp(store)
+
+        if closure_engine.get_database_path(store).exists():
+            try:
+                return self._read_database(store, stamp, previous)
+            except UnknownStoreSchemaException:
+                pass
+
+        return IndexedPaths(frozenset(core_logic.get_paths(store)), stamp)
+
+    def _read_database(
+        self, store: Path, stamp: int | None, previous: IndexedPaths | None
+    ) -> IndexedPaths:
+        if previous is not None and previous.last_id is not None:
+            added, count = closure_engine.get_valid_paths(store, previous.last_id)
+            paths = previous.paths.union(added.values())
+            if len(paths) == count:
+                return IndexedPaths(paths, stamp, max(added, default=previous.last_id))
+
+        rows, _ = closure_engine.get_valid_paths(store)
+        return IndexedPaths(frozenset(rows.values()), stamp, max(rows, default=0))
+
+    def discard(self, store: Path, paths: Iterable[str]):
+        key = str(store)
+        entry = self._entries.get(key)
+        if entry is not None:
+            self._entries[key] = IndexedPaths(
+                entry.paths.difference(paths), entry.stamp, entry.last_id
+            )
+
+    def forget(self, store: Path):
+        self._entries.pop(str(store), None)
+
+
+path_index = PathIndex()
@@ -0,0 +1,119 @@
+import json
+from dataclasses import dataclass, replace
+
+NIX_LOG_PREFIX = "@nix "
+
+# Activity and result types from Nix's `internal-json` log format.
+ACTIVITY_FILE_TRANSFER = 101
+ACTIVITY_COPY_PATHS = 103
+ACTIVITY_BUILDS = 104
+RESULT_PROGRESS = 105
+
+ERROR_LEVEL = 0
+MAX_ERROR_MESSAGES = 20
+
+
+@dataclass
+class BuildProgress:
+    bytes_done: int = 0
+    bytes_expected: int = 0
+    paths_done: int = 0
+    paths_expected: int = 0
+    builds_done: int = 0
+    builds_expected: int = 0
+    activity: str | None = None
+
+    @property
+    def paths_remaining(self) -> int:
+        return max(self.paths_expected - self.paths_done, 0)
+
+
+class ProgressTracker:
+    """
+    Incrementally folds `nix --log-format internal-json` stderr lines into a
+    `BuildProgress` snapshot, keeping only error messages instead of the log.
+    """
+
+    def __init__(self):
+        self.progress = BuildProgress()
+        self.errors: list[str] = []
+        self._activities: dict[int, int] = {}
+        self._transfers: dict[int, tuple[int, int]] = {}
+        self._finished_transfers = (0, 0)
+
+    def feed(self, line: str) -> bool:
+        if not line.startswith(NIX_LOG_PREFIX):
+            return False
+
+        try:
+            event = json.loads(line[len(NIX_LOG_PREFIX) :])
+        except json.JSONDecodeError:
+            return False
+
+        action = event.get("action")
+        if action == "start":
+            return self._start(event)
+        if action == "stop":
+            return self._stop(event)
+        if action == "result":
+            return self._result(event)
+        if action == "msg":
+            return self._message(event)
+        return False
+
+    def snapshot(self) -> BuildProgress:
+        return replace(self.progress)
+
+    def error_text(self) -> str:
+        return "\n".join(self.errors)
+
+    def _start(self, event: dict) -> bool:
+        self._activities[event["id"]] = event.get("type", 0)
+        if event.get("text"):
+            self.progress.activity = event["text"]
+            return True
+        return False
+
+    def _stop(self, event: dict) -> bool:
+        self._activities.pop(event["id"], None)
+        transfer = self._transfers.pop(event["id"], None)
+        if transfer is None:
+            return False
+
+        done, expected = self._finished_transfers
+        self._finished_transfers = (done + transfer[0], expected + transfer[1])
+        self._update_transfers()
+        return True
+
+    def _result(self, event: dict) -> bool:
+        if event.get("type") != RESULT_PROGRESS:
+            return False
+
+        done, expected = event["fields"][0], event["fields"][1]
+        activity_type = self._activities.get(event["id"])
+
+        if activity_type == ACTIVITY_FILE_TRANSFER:
+            self._transfers[event["id"]] = (done, expected)
+            self._update_transfers()
+        elif activity_type == ACTIVITY_COPY_PATHS:
+            self.progress.paths_done = done
+            self.progress.paths_expected = expected
+        elif activity_type == ACTIVITY_BUILDS:
+            self.progress.builds_done = done
+            self.progress.builds_expected = expected
+        else:
+            return False
+        return True
+
+    def _message(self, event: dict) -> bool:
+        if event.get("level", ERROR_LEVEL) <= ERROR_LEVEL:
+            self.errors = (self.errors + [event.get("msg", "")])[-MAX_ERROR_MESSAGES:]
+        return False
+
+    def _update_transfers(self):
+        done, expected = self._finished_transfers
+        for transfer_done, transfer_expected in self._transfers.values():
+            done += transfer_done
+            expected += transfer_expected
+        self.progress.bytes_done = done
+        self.progress.bytes_expected = expected
@@ -0,0 +1,146 @@
+import asyncio
+import os
+import time
+from collections.abc import AsyncIterator
+from contextlib import asynccontextmanager
+from dataclasses import asdict, dataclass
+from pathlib import Path
+
+STORE_CONCURRENCY = int(os.getenv("STORE_CONCURRENCY", "8"))
+
+
+class ReadWriteLock:
+    """
+    Asyncio reader-writer lock. Waiting writers block new readers, so a steady
+    stream of reads cannot starve an install or a delete.
+    """
+
+    def __init__(self):
+        self.readers = 0
+        self.writer = False
+        self.writers_waiting = 0
+        self._condition = asyncio.Condition()
+
+    async def acquire_read(self):
+        async with self._condition:
+            await self._condition.wait_for(
+                lambda: not self.writer and not self.writers_waiting
+            )
+            self.readers += 1
+
+    async def release_read(self):
+        async with self._condition:
+            self.readers -= 1
+            if not self.readers:
+                self._condition.notify_all()
+
+    async def acquire_write(self):
+        async with self._condition:
+            self.writers_waiting += 1
+            try:
+                await self._condition.wait_for(
+                    lambda: not self.writer and not self.readers
+                )
+            finally:
+                self.writers_waiting -= 1
+                # A cancelled writer must not keep readers blocked.
+                self._condition.notify_all()
+            self.writer = True
+
+    async def release_write(self):
+        async with self._condition:
+            self.writer = False
+            self._condition.notify_all()
+
+
+@dataclass
+class StoreSchedulerStats:
+    running: int = 0
+    queued: int = 0
+    scheduled: int = 0
+    wait_seconds_total: float = 0.0
+    wait_seconds_max: float = 0.0
+
+
+class StoreScheduler:
+    """
+    Schedules operations on store directories: reads of a store run
+    concurrently, installs and deletes hold it exclusively, and operations on
+    different stores run in parallel up to `max_concurrent` at a time.
+    """
+
+    def __init__(self, max_concurrent: int = STORE_CONCURRENCY):
+        self.max_concurrent = max_concurrent
+        self._slots = asyncio.Semaphore(max_concurrent)
+        self._locks: dict[str, ReadWriteLock] = {}
+        self._users: dict[str, int] = {}
+        self._stats = StoreSchedulerStats()
+
+    def read(self, *stores: Path):
+        return self.schedule(read=stores)
+
+    def write(self, *stores: Path):
+        return self.schedule(write=stores)
+
+    @asynccontextmanager
+    async def schedule(
+        self, read: tuple[Path, ...] = (), write: tuple[Path, ...] = ()
+    ) -> AsyncIterator[None]:
+        modes = {str(store): False for store in read}
+        modes.update({str(store): True for store in write})
+        # Locks are always taken in the same order, so operations spanning
+        # several stores cannot deadlock each other.
+        keys = sorted(modes)
+        for key in keys:
+            self._users[key] = self._users.get(key, 0) + 1
+
+        acquired: list[tuple[ReadWriteLock, bool]] = []
+        started = time.monotonic()
+        self._stats.queued += 1
+        try:
+            for key in keys:
+                lock = self._locks.setdefault(key, ReadWriteLock())
+                await (lock.acquire_write() if modes[key] else lock.acquire_read())
+                acquired.append((lock, modes[key]))
+            await self._slots.acquire()
+        except BaseException:
+            await self._release(acquired)
+            self._forget(keys)
+            raise
+        finally:
+            self._stats.queued -= 1
+
+        waited = time.monotonic() - started
+        self._stats.scheduled += 1
+        self._stats.wait_seconds_total += waited
+        self._stats.wait_seconds_max = max(self._stats.wait_seconds_max, waited)
+
+        self._stats.running += 1
+        try:
+            yield
+        finally:
+            self._stats.running -= 1
+            self._slots.release()
+            await self._release(acquired)
+            self._forget(keys)
+
+    async def _release(self, locks: list[tuple[ReadWriteLock, bool]]):
+        for lock, write in reversed(locks):
+            await (lock.release_write() if write else lock.release_read())
+
+    def _forget(self, keys: list[str]):
+        for key in keys:
+            self._users[key] -= 1
+            if not self._users[key]:
+                del self._users[key]
+                self._locks.pop(key, None)
+
+    def stats(self) -> dict[str, int | float]:
+        return {
+            **asdict(self._stats),
+            "max_concurrent": self.max_concurrent,
+            "stores": len(self._locks),
+        }
+
+
+store_scheduler = StoreScheduler()
@@ -0,0 +1,142 @@
+import asyncio
+import os
+from collections import OrderedDict
+from collections.abc import Awaitable, Callable, Iterable
+from pathlib import Path
+
+from src.logic.graph import ReferenceGraph
+from src.logic.singleflight import SingleFlight
+
+SIZE_ATTRIBUTION_STORES = int(os.getenv("SIZE_ATTRIBUTION_STORES", "16"))
+
+
+class SizeAttribution:
+    """
+    Splits the closures of the installed packages of a store into bytes held
+    by that package alone and bytes shared with other packages, by counting
+    the packages whose closure holds each path.
+    """
+
+    def __init__(self, graph: ReferenceGraph):
+        self.graph = graph
+        self.closures: dict[str, set[int]] = {}
+        self.closure_sizes: dict[str, int] = {}
+        self.exclusive_sizes: dict[str, int] = {}
+        self._holders: dict[int, int] = {}
+
+    def covers(self, roots: Iterable[str]) -> bool:
+        return all(root in self.graph.ids for root in roots)
+
+    def _sole_holder(self, node: int) -> str:
+        return next(name for name, closure in self.closures.items() if node in closure)
+
+    def add(self, name: str, roots: Iterable[str]):
+        if name in self.closures:
+            self.remove(name)
+
+        closure: set[int] = set()
+        for root in roots:
+            if root in self.graph.ids:
+                closure.update(self.graph.closure(self.graph.ids[root]))
+
+        exclusive_size = 0
+        for node in closure:
+            holders = self._holders.get(node, 0) + 1
+            self._holders[node] = holders
+            if holders == 1:
+                exclusive_size += self.graph.sizes[node]
+            elif holders == 2:
+                self.exclusive_sizes[self._sole_holder(node)] -= self.graph.sizes[node]
+
+        self.closures[name] = closure
+        self.closure_sizes[name] = sum(self.graph.sizes[node] for node in closure)
+        self.exclusive_sizes[name] = exclusive_size
+
+    def remove(self, name: str):
+        closure = self.closures.pop(name, None)
+        if closure is None:
+            return
+
+        del self.closure_sizes[name]
+        del self.exclusive_sizes[name]
+        for node in closure:
+            holders = self._holders[node] - 1
+            if holders == 0:
+                del self._holders[node]
+                continue
+            self._holders[node] = holders
+            if holders == 1:
+                self.exclusive_sizes[self._sole_holder(node)] += self.graph.sizes[node]
+
+
+class SizeAttributionCache:
+    """
+    Size attributions of the most recently used stores, kept up to date by
+    `add` and `remove` while the store is scheduled for writing. An
+    attribution is rebuilt when the store's reference graph was reloaded.
+    """
+
+    def __init__(self, max_stores: int = SIZE_ATTRIBUTION_STORES):
+        self.max_stores = max_stores
+        self._attributions: OrderedDict[str, SizeAttribution] = OrderedDict()
+        self._flight = SingleFlight()
+
+    async def get(
+        self,
+        store: Path,
+        graph: ReferenceGraph,
+        get_roots: Callable[[], Awaitable[dict[str, list[str]]]],
+    ) -> SizeAttribution:
+        key = str(store)
+        attribution = self._attributions.get(key)
+        if attribution is not None and attribution.graph is graph:
+            self._attributions.move_to_end(key)
+            return attribution
+
+        return await self._flight.do(
+            (key, id(graph)), self._build, store, graph, get_roots
+        )
+
+    async def _build(
+        self,
+        store: Path,
+        graph: ReferenceGraph,
+        get_roots: Callable[[], Awaitable[dict[str, list[str]]]],
+    ) -> SizeAttribution:
+        roots = await get_roots()
+
+        def build() -> SizeAttribution:
+            attribution = SizeAttribution(graph)
+            for name, package_roots in roots.items():
+                attribution.add(name, package_roots)
+            return attribution
+
+        attribution = await asyncio.to_thread(build)
+        key = str(store)
+        self._attributions[key] = attribution
+        self._attributions.move_to_end(key)
+        while len(self._attributions) > self.max_stores:
+            self._attributions.popitem(last=False)
+        return attribution
+
+    def add(self, store: Path, name: str, roots: list[str]):
+        attribution = self._attributions.get(str(store))
+        if attribution is None:
+            return
+
+        if attribution.covers(roots):
+            attribution.add(name, roots)
+        else:
+            # The reference graph was reloaded since the attribution was built.
+            self.forget(store)
+
+    def remove(self, store: Path, name: str):
+        attribution = self._attributions.get(str(store))
+        if attribution is not None:
+            attribution.remove(name)
+
+    def forget(self, store: Path):
+        self._attributions.pop(str(store), None)
+
+
+size_attributions = SizeAttributionCache()
@@ -0,0 +1,58 @@
+import asyncio
+from collections.abc import Awaitable, Callable, Hashable
+from dataclasses import asdict, dataclass
+from typing import Any
+
+
+@dataclass
+class SingleFlightStats:
+    calls: int = 0
+    executions: int = 0
+    coalesced: int = 0
+
+
+class SingleFlight:
+    """
+    Coalesces concurrent identical operations: while an operation for a key is
+    in flight, further calls with the same key wait for it and share its result
+    or exception instead of starting their own.
+
+    The operation runs in its own task, so cancelling one caller does not cancel
+    it for the others.
+    """
+
+    def __init__(self):
+        self._flights: dict[Hashable, asyncio.Future] = {}
+        self._stats = SingleFlightStats()
+
+    async def do(
+        self,
+        key: Hashable,
+        function: Callable[..., Awaitable[Any]],
+        *args: Any,
+    ) -> Any:
+        self._stats.calls += 1
+
+        flight = self._flights.get(key)
+        if flight is None:
+            self._stats.executions += 1
+            flight = asyncio.ensure_future(function(*args))
+            self._flights[key] = flight
+            flight.add_done_callback(lambda _: self._forget(key, flight))
+        else:
+            self._stats.coalesced += 1
+
+        return await asyncio.shield(flight)
+
+    def _forget(self, key: Hashable, flight: asyncio.Future):
+        if self._flights.get(key) is flight:
+            del self._flights[key]
+        # Every caller may have been cancelled; mark the result as retrieved.
+        if not flight.cancelled():
+            flight.exception()
+
+    def in_flight(self) -> int:
+        return len(self._flights)
+
+    def stats(self) -> dict[str, int]:
+        return {**asdict(self._stats), "in_flight": self.in_flight()}
@@ -0,0 +1,103 @@
+import asyncio
+import os
+import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import suppress
+from pathlib import Path
+
+from src.logic import core as core_logic
+
+TRASH_DIRECTORY = "stores/.trash"
+TRASH_REAPER_WORKERS = int(os.getenv("TRASH_REAPER_WORKERS", "2"))
+TRASH_REAPER_INTERVAL = float(os.getenv("TRASH_REAPER_INTERVAL", "60"))
+TRASH_REAPER_NICENESS = 19
+
+
+def _lower_priority():
+    # Linux applies niceness per thread, and the default I/O priority of a
+    # thread follows its niceness, so only the reaper's threads are demoted.
+    if sys.platform == "linux":
+        with suppress(OSError):
+            os.setpriority(
+                os.PRIO_PROCESS, threading.get_native_id(), TRASH_REAPER_NICENESS
+            )
+
+
+class TrashReaper:
+    """
+    Deletes the stores moved into the trash directory in the background, at
+    most `workers` at a time. Anything left over by a restart is picked up by
+    the first pass after `start`.
+    """
+
+    def __init__(self, trash: Path, workers: int = TRASH_REAPER_WORKERS):
+        self.trash = trash
+        self.workers = workers
+        self._reaping: set[Path] = set()
+        self._executor: ThreadPoolExecutor | None = None
+        self._task: asyncio.Task | None = None
+        self._wakeup: asyncio.Event | None = None
+        self._loop: asyncio.AbstractEventLoop | None = None
+
+    async def start(self):
+        self._loop = asyncio.get_running_loop()
+        self._wakeup = asyncio.Event()
+        self._executor = ThreadPoolExecutor(
+            self.workers,
+            thread_name_prefix="trash-reaper",
+            initializer=_lower_priority,
+        )
+        self._task = asyncio.create_task(self._work(self._wakeup))
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            with suppress(asyncio.CancelledError):
+                await self._task
+            self._task = None
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+    def notify(self):
+        if self._loop is not None and self._wakeup is not None:
+            self._loop.call_soon_threadsafe(self._wakeup.set)
+
+    def pending(self) -> int:
+        try:
+            return sum(1 for _ in self.trash.iterdir())
+        except FileNotFoundError:
+            return 0
+
+    async def reap(self) -> int:
+        try:
+            entries = list(self.trash.iterdir())
+        except FileNotFoundError:
+            return 0
+
+        entries = [entry for entry in entries if entry not in self._reaping]
+        self._reaping.update(entries)
+        try:
+            loop = asyncio.get_running_loop()
+            results = await asyncio.gather(
+                *(
+                    loop.run_in_executor(self._executor, core_logic.remove_store, entry)
+                    for entry in entries
+                ),
+                return_exceptions=True,
+            )
+        finally:
+            self._reaping.difference_update(entries)
+
+        return sum(1 for result in results if not isinstance(result, BaseException))
+
+    async def _work(self, wakeup: asyncio.Event):
+        while True:
+            wakeup.clear()
+            await self.reap()
+            with suppress(TimeoutError):
+                await asyncio.wait_for(wakeup.wait(), TRASH_REAPER_INTERVAL)
+
+
+trash_reaper = TrashReaper(Path(TRASH_DIRECTORY))
@@ -0,0 +1,6 @@
+from src.jobs.models.job import Job
+from src.utils.repository import SQLAlchemyRepository
+
+
+class JobRepository(SQLAlchemyRepository):
+    model = Job
@@ -1,6 +1,16 @@
+from collections.abc import Iterable
+from pathlib import PurePath
+
+from sqlalchemy import delete as sqlalchemy_delete
+from sqlalchemy import insert, literal, select
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+
 from src.store.models.package import Package
+from src.store.models.path import PackageClosure, Reference, StorePath
+from src.store.models.resolution import Resolution
 from src.store.models.store import Store
-from src.utils.repository import SQLAlchemyRepository
+from src.utils.repository import SQLAlchemyRepository, batches
 
 
 class StoreRepository(SQLAlchemyRepository):
@@ -9,3 +19,142 @@ class StoreRepository(SQLAlchemyRepository):
 
 class PackageRepository(SQLAlchemyRepository):
     model = Package
+
+
+class ResolutionRepository(SQLAlchemyRepository):
+    model = Resolution
+
+
+class ClosureRepository(SQLAlchemyRepository):
+    model = PackageClosure
+
+    @staticmethod
+    async def _get_path_ids(session: AsyncSession, paths: list[str]) -> dict[str, int]:
+        ids = {}
+        for batch in batches(paths):
+            stmt = select(StorePath.path, StorePath.id).where(StorePath.path.in_(batch))
+            ids.update((await session.execute(stmt)).tuples().all())
+        return ids
+
+    async def _intern(
+        self,
+        session: AsyncSession,
+        sizes: dict[str, int],
+        references: Iterable[tuple[str, str]],
+    ) -> dict[str, int]:
+        ids = await self._get_path_ids(session, list(sizes))
+        missing = [path for path in sizes if path not in ids]
+        if not missing:
+            return ids
+
+        rows = []
+        for path in missing:
+            hash, _, name = PurePath(path).name.partition("-")
+            rows.append(
+                {"path": path, "name": name, "hash": hash, "nar_size": sizes[path]}
+            )
+        await session.execute(insert(StorePath), rows)
+        ids.update(await self._get_path_ids(session, missing))
+
+        # References never change, so only newly interned paths lack them.
+        added = set(missing)
+        edges = [
+            {"referrer_id": ids[referrer], "reference_id": ids[reference]}
+            for referrer, reference in references
+            if referrer in added and reference in ids
+        ]
+        if edges:
+            await session.execute(insert(Reference), edges)
+        return ids
+
+    async def add_closure(
+        self,
+        package_id: int,
+        sizes: dict[str, int],
+        references: Iterable[tuple[str, str]] = (),
+    ):
+        references = list(references)
+        async with self._session() as session:
+            for attempt in range(2):
+                try:
+                    async with session.begin_nested():
+                        ids = await self._intern(session, sizes, references)
+                        if ids:
+                            await session.execute(
+                                insert(PackageClosure),
+                                [
+                                    {"package_id": package_id, "path_id": path_id}
+                                    for path_id in ids.values()
+                                ],
+                            )
+                    break
+                except IntegrityError:
+                    # Another closure interned some of the paths concurrently,
+                    # or a deleted closure pruned some that were looked up.
+                    if attempt:
+                        raise
+            await self._save(session)
+
+    async def get_closure(self, package_id: int) -> dict[str, int]:
+        async with self._session() as session:
+            stmt = (
+                select(StorePath.path, StorePath.nar_size)
+                .join(PackageClosure, PackageClosure.path_id == StorePath.id)
+                .where(PackageClosure.package_id == package_id)
+            )
+            result = await session.execute(stmt)
+            return dict(result.tuples().all())
+
+    async def copy_closure(self, package_id: int, new_package_id: int):
+        async with self._session() as session:
+            stmt = insert(PackageClosure).from_select(
+                ["package_id", "path_id"],
+                select(literal(new_package_id), PackageClosure.path_id).where(
+                    PackageClosure.package_id == package_id
+                ),
+            )
+            await session.execute(stmt)
+            await self._save(session)
+
+    async def delete_closure(self, package_id: int):
+        await self.delete_closures([package_id])
+
+    async def delete_closures(self, package_ids: Iterable[int]):
+        """
+        Deletes the closures of the packages, then the paths and references
+        they held that no other closure holds.
+        """
+        package_ids = list(package_ids)
+        async with self._session() as session:
+            held: set[int] = set()
+            for batch in batches(package_ids):
+                stmt = select(PackageClosure.path_id).where(
+                    PackageClosure.package_id.in_(batch)
+                )
+                held.update((await session.execute(stmt)).scalars())
+                await session.execute(
+                    sqlalchemy_delete(PackageClosure).where(
+                        PackageClosure.package_id.in_(batch)
+                    )
+                )
+
+            for batch in batches(list(held)):
+                still_held = select(PackageClosure.path_id).where(
+                    PackageClosure.path_id == StorePath.id
+                )
+                stmt = select(StorePath.id).where(
+                    StorePath.id.in_(batch), ~still_held.exists()
+                )
+                orphans = list((await session.execute(stmt)).scalars())
+                if not orphans:
+                    continue
+                await session.execute(
+                    sqlalchemy_delete(Reference).where(
+                        Reference.referrer_id.in_(orphans)
+                        | Reference.reference_id.in_(orphans)
+                    )
+                )
+                await session.execute(
+                    sqlalchemy_delete(StorePath).where(StorePath.id.in_(orphans))
+                )
+            await self._save(session)
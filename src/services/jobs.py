@@ -0,0 +1,169 @@
+import json
+import os
+from collections.abc import AsyncIterator, Callable, Sequence
+from dataclasses import asdict
+from datetime import UTC, datetime
+
+from fastapi import HTTPException
+from sqlalchemy import Row
+
+from src.auth.schemas import User
+from src.jobs.models.job import Job
+from src.jobs.progress import job_progress
+from src.jobs.schemas.job import InstallResult, JobState
+from src.jobs.schemas.job import Job as JobSchema
+from src.logic.progress import BuildProgress
+from src.services.stores import PackageService, StoreService
+from src.utils.repository import AbstractRepository
+from src.utils.unitofwork import UnitOfWork
+
+INSTALL_JOB = "install"
+JOB_EVENTS_INTERVAL = float(os.getenv("JOB_EVENTS_INTERVAL", "5"))
+
+
+def _now() -> datetime:
+    return datetime.now(UTC).replace(tzinfo=None)
+
+
+class JobService:
+    def __init__(self, repository: AbstractRepository):
+        self.repository = repository()  # type: ignore
+
+    async def add_install_job(
+        self, store_name: str, package_name: str, user: User
+    ) -> JobSchema:
+        job = {
+            "kind": INSTALL_JOB,
+            "owner_id": user.id,
+            "store_name": store_name,
+            "package_name": package_name,
+            "state": JobState.PENDING.value,
+            "created_at": _now(),
+        }
+        job_id = await self.repository.add_one(job)
+        return await self.get_job(job_id, user)
+
+    async def get_job(self, job_id: int, user: User) -> JobSchema:
+        filter_by = {"id": job_id, "owner_id": user.id}
+        job_row: Row[Job] | None = await self.repository.get_one(filter_by)
+
+        if job_row is None:
+            raise HTTPException(status_code=404, detail=f"Job {job_id} was not found!")
+
+        return job_row[0].to_read_model()
+
+    async def requeue_running_jobs(self) -> int:
+        return await self.repository.update(
+            {"state": JobState.RUNNING.value},
+            {"state": JobState.PENDING.value, "started_at": None},
+        )
+
+    async def claim_next_job(self) -> JobSchema | None:
+        while True:
+            # Paging orders by id, so the oldest pending job comes first.
+            job_rows: Sequence[Row[Job]] = await self.repository.get_all(
+                {"state": JobState.PENDING.value}, limit=1
+            )
+            if not job_rows:
+                return None
+
+            job: Job = job_rows[0][0]
+            running = {"state": JobState.RUNNING, "started_at": _now()}
+            claimed = await self.repository.update(
+                {"id": job.id, "state": JobState.PENDING.value},
+                {**running, "state": JobState.RUNNING.value},
+            )
+            if claimed:
+                return job.to_read_model().model_copy(update=running)
+
+    async def run_job(
+        self,
+        job: JobSchema,
+        store_service_factory: Callable[[UnitOfWork], StoreService],
+        package_service_factory: Callable[[UnitOfWork], PackageService],
+    ) -> JobSchema:
+        """
+        Installs the package of the job. Its rows are written in one
+        transaction, which is rolled back when the install fails.
+        """
+        result = None
+        error = None
+
+        def on_progress(progress: BuildProgress):
+            job_progress.publish(
+                job.id,
+                {**asdict(progress), "paths_remaining": progress.paths_remaining},
+            )
+
+        try:
+            async with UnitOfWork() as unit_of_work:
+                package = await store_service_factory(unit_of_work).add_package(
+                    job.store_name,
+                    job.package_name,
+                    User(id=job.owner_id),
+                    package_service_factory(unit_of_work),
+                    on_progress,
+                )
+            result = InstallResult(
+                package_id=package.id,
+                path=package.path,
+                closure_size=package.closure_size,
+            ).model_dump()
+        except HTTPException as exception:
+            error = str(exception.detail)
+        except Exception:
+            error = "Unexpected error"
+
+        state = JobState.FAILED if error is not None else JobState.SUCCEEDED
+        try:
+            await self.repository.update(
+                {"id": job.id},
+                {
+                    "state": state.value,
+                    "finished_at": _now(),
+                    "result": result,
+                    "error": error,
+                },
+            )
+        finally:
+            job_progress.finish(job.id)
+        return await self.get_job(job.id, User(id=job.owner_id))
+
+    async def fail_job(self, job_id: int, error: str):
+        try:
+            await self.repository.update(
+                {"id": job_id},
+                {
+                    "state": JobState.FAILED.value,
+                    "finished_at": _now(),
+                    "error": error,
+                },
+            )
+        finally:
+            job_progress.finish(job_id)
+
+    async def stream_job_events(self, job_id: int, user: User) -> AsyncIterator[str]:
+        job = await self.get_job(job_id, user)
+
+        async def events():
+            current = job
+            sent = None
+            while current.state in (JobState.PENDING, JobState.RUNNING):
+                progress = job_progress.latest(job_id)
+                if progress is not None and progress is not sent:
+                    yield f"event: progress\ndata: {json.dumps(progress)}\n\n"
+                    sent = progress
+                    continue
+
+                if progress is None:
+                    current = await self.get_job(job_id, user)
+                    if current.state not in (JobState.PENDING, JobState.RUNNING):
+                        break
+                    # Progress may have been published while the job was read.
+                    if job_progress.latest(job_id) is not None:
+                        continue
+                await job_progress.wait(job_id, JOB_EVENTS_INTERVAL)
+
+            yield f"event: {current.state.value}\ndata: {current.model_dump_json()}\n\n"
+
+        return events()
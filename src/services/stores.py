@@ -1,10 +1,27 @@
+import asyncio
+import heapq
+import json
+import logging
+import os
+from array import array
+from collections.abc import AsyncIterator, Callable, Iterable
+from contextlib import suppress
+from itertools import islice
 from pathlib import Path
 
 from fastapi import HTTPException
 from sqlalchemy import Row
+from sqlalchemy.exc import IntegrityError
 
 from src.auth.schemas import User
 from src.logic import core as core_logic
+from src.logic.changes import ClosureChange, diff_closures, parse_store_path
+from src.logic.diff import (
+    ABSENT_IN_STORE_1,
+    DifferenceEntry,
+    iter_store_paths,
+    merge_difference,
+)
 from src.logic.exceptions import (
     AttributeNotProvidedException,
     BrokenPackageException,
@@ -15,50 +32,196 @@ from src.logic.exceptions import (
     StillAliveException,
     StoreFolderDoesNotExistException,
     UnfreeLicenceException,
+    UnknownStoreSchemaException,
 )
+from src.logic.graph import reference_graphs
+from src.logic.interning import difference, path_interner
+from src.logic.membership import group_by_membership, membership_index
+from src.logic.paths import path_index
+from src.logic.progress import BuildProgress
+from src.logic.scheduler import store_scheduler
+from src.logic.sharing import size_attributions
+from src.logic.trash import trash_reaper
 from src.store.models.package import Package
+from src.store.models.resolution import Resolution
 from src.store.models.store import Store
-from src.store.schemas.package import Closure, ClosuresDifference, PackageMeta
+from src.store.schemas.package import (
+    Closure,
+    ClosureBreakdown,
+    ClosureEntry,
+    ClosuresDifference,
+    DependencyChains,
+    PackageChange,
+    PackageMeta,
+    PackageSizes,
+    VersionUpdate,
+)
 from src.store.schemas.package import Package as PackageSchema
+from src.store.schemas.path import (
+    DifferenceSummary,
+    MembershipGroup,
+    PathReferrers,
+    PathsDifference,
+    PathsDifferenceSummary,
+    StoresComparison,
+)
+from src.store.schemas.store import Store as StoreSchema
+from src.store.schemas.store import StoreField, StoreFields
 from src.utils.repository import AbstractRepository
 
+DIFFERENCE_BATCH_SIZE = int(os.getenv("DIFFERENCE_BATCH_SIZE", "1000"))
+# Names that collide with fixed routes under /store.
+RESERVED_STORE_NAMES = frozenset({"compare"})
+
+logger = logging.getLogger(__name__)
+
+
+def _format_versions(versions: tuple[str, ...]) -> str:
+    return ", ".join(version or "ε" for version in versions) or "∅"
+
+
+def _format_size_delta(size_delta: int) -> str:
+    return f"{size_delta / 1024:+.1f} KiB"
+
+
+def _package_change(change: ClosureChange) -> PackageChange:
+    return PackageChange(
+        package_name=change.name,
+        version_update=VersionUpdate(
+            old=_format_versions(change.old_versions),
+            new=_format_versions(change.new_versions),
+        ),
+        size_update=_format_size_delta(change.size_delta),
+        size_delta=change.size_delta,
+    )
+
+
+def _package_http_exception(package_name: str, exception: Exception) -> HTTPException:
+    if isinstance(exception, InsecurePackageException):
+        return HTTPException(
+            status_code=400, detail=f"Package {package_name} is marked as insecure!"
+        )
+    if isinstance(exception, BrokenPackageException):
+        return HTTPException(
+            status_code=400, detail=f"Package {package_name} is marked as broken!"
+        )
+    if isinstance(exception, NotAvailableOnHostPlatformException):
+        return HTTPException(
+            status_code=400,
+            detail=f"Package {package_name} is not available on your host platform!",
+        )
+    if isinstance(exception, AttributeNotProvidedException):
+        return HTTPException(
+            status_code=400, detail="Your flake does not provide this attribute!"
+        )
+    if isinstance(exception, UnfreeLicenceException):
+        return HTTPException(
+            status_code=400, detail=f"Package {package_name} has an unfree license!"
+        )
+    return HTTPException(status_code=500, detail="Unexpected error")
+
+
+async def _get_closure_references(
+    store_path: Path, paths: Iterable[str]
+) -> list[tuple[str, str]]:
+    try:
+        graph = await reference_graphs.get(store_path)
+    except (NotValidPathException, UnknownStoreSchemaException):
+        return []
+
+    return [
+        (path, graph.paths[reference])
+        for path in paths
+        if path in graph.ids
+        for reference in graph.references[graph.ids[path]]
+    ]
+
 
 class PackageService:
-    def __init__(self, repository: AbstractRepository):
+    def __init__(
+        self,
+        repository: AbstractRepository,
+        resolution_repository: AbstractRepository,
+        closure_repository: AbstractRepository,
+    ):
         self.repository = repository()  # type: ignore
+        self.resolution_repository = resolution_repository()  # type: ignore
+        self.closure_repository = closure_repository()  # type: ignore
 
     async def add_package(
-        self, store_path: Path, package_name: str, store_id: int
-    ) -> int:
+        self,
+        store_path: Path,
+        package_name: str,
+        store_id: int,
+        on_progress: Callable[[BuildProgress], None] | None = None,
+    ) -> PackageSchema:
         try:
-            core_logic.install_package(store_path, package_name)
-        except InsecurePackageException:
-            raise HTTPException(
-                status_code=400, detail=f"Package {package_name} is marked as insecure!"
+            revision = await core_logic.get_nixpkgs_revision()
+            outputs: dict[str, str] = await core_logic.install_package(
+                store_path, package_name, revision, on_progress
             )
-        except BrokenPackageException:
-            raise HTTPException(
-                status_code=400, detail=f"Package {package_name} is marked as broken!"
-            )
-        except NotAvailableOnHostPlatformException:
-            raise HTTPException(
-                status_code=400,
-                detail=f"Package {package_name} is not available on your host platform!",
-            )
-        except AttributeNotProvidedException:
-            raise HTTPException(
-                status_code=400, detail="Your flake does not provide this attribute!"
-            )
-        except UnfreeLicenceException:
-            raise HTTPException(
-                status_code=400, detail=f"Package {package_name} has an unfree license!"
+            path = outputs.get("out", next(iter(outputs.values())))
+            sizes: dict[str, int] = await core_logic.get_outputs_closure_sizes(
+                store_path, list(outputs.values())
             )
-        except Exception:
-            raise HTTPException(status_code=500, detail="Unexpected error")
+        except Exception as exception:
+            raise _package_http_exception(package_name, exception)
 
-        package = {"name": package_name, "store_id": store_id}
+        # Best effort: a failed copy only means other stores fetch it again.
+        await core_logic.copy_to_binary_cache(store_path, list(outputs.values()))
+
+        await reference_graphs.update(store_path)
+        references = await _get_closure_references(store_path, sizes)
+
+        await self._save_resolution(revision, package_name, path)
+
+        # Writes come last so the request's transaction is not held open
+        # while Nix runs.
+        closure_size = sum(sizes.values())
+        package = {
+            "name": package_name,
+            "store_id": store_id,
+            "path": path,
+            "outputs": outputs,
+            "closure_size": closure_size,
+        }
         package_id = await self.repository.add_one(package)
-        return package_id
+        await self.closure_repository.add_closure(package_id, sizes, references)
+
+        return PackageSchema(
+            id=package_id,
+            name=package_name,
+            store_id=store_id,
+            closure=Closure(packages=list(sizes), sizes=sizes),
+            path=path,
+            outputs=outputs,
+            closure_size=closure_size,
+        )
+
+    async def _save_resolution(self, revision: str, package_name: str, path: str):
+        resolution = {"revision": revision, "attribute": package_name}
+        if await self.resolution_repository.get_one(resolution) is not None:
+            return
+
+        with suppress(IntegrityError):
+            await self.resolution_repository.add_one({**resolution, "path": path})
+
+    async def resolve_package(self, package_name: str) -> str:
+        try:
+            revision = await core_logic.get_nixpkgs_revision()
+            filter_by = {"revision": revision, "attribute": package_name}
+            resolution_row: (
+                Row[Resolution] | None
+            ) = await self.resolution_repository.get_one(filter_by)
+            if resolution_row is not None:
+                return resolution_row[0].path
+
+            path: str = await core_logic.resolve_package(package_name, revision)
+        except Exception as exception:
+            raise _package_http_exception(package_name, exception)
+
+        await self._save_resolution(revision, package_name, path)
+        return path
 
     async def get_package(
         self, package_name: str, store_id: int
@@ -69,10 +232,76 @@ class PackageService:
             return None
 
         package: Package = package_row[0]
-        package_schema: PackageSchema = package.to_read_model()
+        sizes = await self.closure_repository.get_closure(package.id)
+        package_schema: PackageSchema = package.to_read_model(
+            Closure(packages=list(sizes), sizes=sizes)
+        )
 
         return package_schema
 
+    async def has_package(self, package_name: str, store_id: int) -> bool:
+        filter_by = {"name": package_name, "store_id": store_id}
+        return await self.repository.get_one(filter_by) is not None
+
+    async def get_package_closure(
+        self, package_name: str, store_id: int
+    ) -> dict[str, int] | None:
+        """
+        Sizes of the paths in the closure of an installed package, or `None`
+        when its closure was not recorded.
+        """
+        filter_by = {"name": package_name, "store_id": store_id}
+        package_row: Row[Package] = await self.repository.get_one(filter_by)
+        if package_row is None:
+            return None
+
+        sizes = await self.closure_repository.get_closure(package_row[0].id)
+        return sizes or None
+
+    async def get_package_path(self, package_name: str, store_id: int) -> str | None:
+        filter_by = {"name": package_name, "store_id": store_id}
+        package_row: Row[Package] = await self.repository.get_one(filter_by)
+        if package_row is None:
+            return None
+
+        return package_row[0].path
+
+    async def get_package_roots(self, store_id: int) -> dict[str, list[str]]:
+        """
+        Store paths that each installed package keeps alive.
+        """
+        package_rows: list[Row[Package]] = await self.repository.get_all(
+            {"store_id": store_id}
+        )
+        roots = {}
+        for package_row in package_rows:
+            package: Package = package_row[0]
+            if package.outputs:
+                roots[package.name] = list(package.outputs.values())
+            elif package.path is not None:
+                roots[package.name] = [package.path]
+        return roots
+
+    async def copy_packages(self, store_id: int, new_store_id: int):
+        package_rows: list[Row[Package]] = await self.repository.get_all(
+            {"store_id": store_id}
+        )
+        packages: list[Package] = [package_row[0] for package_row in package_rows]
+        package_ids = await self.repository.add_many(
+            [
+                {
+                    "name": package.name,
+                    "store_id": new_store_id,
+                    "path": package.path,
+                    "outputs": package.outputs,
+                    "closure_size": package.closure_size,
+                }
+                for package in packages
+            ]
+        )
+        for package, package_id in zip(packages, package_ids):
+            await self.closure_repository.copy_closure(package.id, package_id)
+
     async def delete_package(
         self, package_name: str, store_id: int
     ) -> PackageSchema | None:
@@ -84,17 +313,34 @@ class PackageService:
 
         package: PackageSchema = package_row[0].to_read_model()
 
+        await self.closure_repository.delete_closure(package.id)
         await self.repository.delete(filter_by)
 
         return package
 
+    async def delete_packages(self, store_id: int):
+        package_rows = await self.repository.get_all(
+            {"store_id": store_id}, columns=["id"]
+        )
+        await self.closure_repository.delete_closures(
+            [package_row.id for package_row in package_rows]
+        )
+        await self.repository.delete_many("store_id", [store_id])
+
 
 class StoreService:
     def __init__(self, store_repository: AbstractRepository):
         self.stores_path = Path("stores")
+        self.trash_path = trash_reaper.trash
         self.store_repository = store_repository()  # type: ignore
 
+    @staticmethod
+    def _check_store_name(name: str):
+        if name in RESERVED_STORE_NAMES:
+            raise HTTPException(400, f"The store name {name} is reserved!")
+
     async def add_store(self, name: str, user: User):
+        self._check_store_name(name)
         store_path = self.stores_path / str(user.id) / name
 
         try:
@@ -107,9 +353,55 @@ class StoreService:
 
         return Store(id=store_id, name=name, owner_id=user.id)
 
-    async def get_stores(self, user: User):
+    async def clone_store(
+        self,
+        name: str,
+        new_name: str,
+        user: User,
+        package_service: PackageService,
+    ):
+        self._check_store_name(new_name)
+        store = await self.get_store(name, user)
+        store_path = self.stores_path / str(user.id) / name
+        new_store_path = self.stores_path / str(user.id) / new_name
+
+        try:
+            async with store_scheduler.schedule(
+                read=(store_path,), write=(new_store_path,)
+            ):
+                await asyncio.to_thread(
+                    core_logic.clone_store, store_path, new_store_path
+                )
+        except FileExistsError:
+            raise HTTPException(400, "This store already exists!")
+        except StoreFolderDoesNotExistException:
+            raise HTTPException(
+                status_code=404, detail=f"Store {name} was not found locally!"
+            )
+
+        store_dict = {"name": new_name, "owner_id": user.id}
+        new_store_id = await self.store_repository.add_one(data=store_dict)
+        await package_service.copy_packages(store.id, new_store_id)
+
+        return Store(id=new_store_id, name=new_name, owner_id=user.id)
+
+    async def get_stores(
+        self,
+        user: User,
+        after_id: int | None = None,
+        limit: int | None = None,
+        fields: list[StoreField] | None = None,
+    ) -> list[StoreSchema] | list[StoreFields]:
         filter_by = {"owner_id": user.id}
-        stores = await self.store_repository.get_all(filter_by)
+        if fields:
+            # The id is always selected as it is the cursor of the next page.
+            columns = list(dict.fromkeys(["id", *fields]))
+            rows = await self.store_repository.get_all(
+                filter_by, after_id, limit, columns
+            )
+            return [StoreFields(**row._mapping) for row in rows]
+
+        stores = await self.store_repository.get_all(filter_by, after_id, limit)
         result = [store[0].to_read_model() for store in stores]
         return result
 
@@ -127,22 +419,30 @@ class StoreService:
         result = store[0].to_read_model()
         return result
 
-    async def delete_store(self, name: str, user: User):
+    async def delete_store(
+        self, name: str, user: User, package_service: PackageService
+    ):
         filter_by = {
             "owner_id": user.id,
             "name": name,
         }
         store = await self.get_store(name, user)
-        await self.store_repository.delete(filter_by)
-
         store_path = self.stores_path / str(user.id) / name
 
-        try:
-            core_logic.remove_store(store_path)
-        except FileNotFoundError:
-            raise HTTPException(
-                status_code=404, detail=f"Store {name} was not found locally!"
-            )
+        async with store_scheduler.write(store_path):
+            try:
+                core_logic.trash_store(store_path, self.trash_path)
+            except FileNotFoundError:
+                # Left over from an earlier delete, only its rows remain.
+                logger.warning("Store %s was already deleted locally", store_path)
+            path_index.forget(store_path)
+            reference_graphs.forget(store_path)
+            size_attributions.forget(store_path)
+            membership_index.forget(str(store_path))
+        trash_reaper.notify()
+
+        await package_service.delete_packages(store.id)
+        await self.store_repository.delete(filter_by)
 
         return store
 
@@ -152,32 +452,36 @@ class StoreService:
         package_name: str,
         user: User,
         package_service: PackageService,
+        on_progress: Callable[[BuildProgress], None] | None = None,
     ) -> PackageSchema:
         store_path = self.stores_path / str(user.id) / store_name
 
+        async with store_scheduler.write(store_path):
+            store = await self.check_package_can_be_added(
+                store_name, package_name, user, package_service
+            )
+            package = await package_service.add_package(
+                store_path, package_name, store.id, on_progress
+            )
+            size_attributions.add(store_path, package.name, package.roots)
+        return package
+
+    async def check_package_can_be_added(
+        self,
+        store_name: str,
+        package_name: str,
+        user: User,
+        package_service: PackageService,
+    ) -> StoreSchema:
         store = await self.get_store(store_name, user)
-        package: PackageSchema | None = await package_service.get_package(
-            package_name, store.id
-        )
 
-        if package is not None:
+        if await package_service.has_package(package_name, store.id):
             raise HTTPException(
                 status_code=400,
                 detail=f"Package {package_name} is already added to the store {store_name}",
             )
 
-        package_id: int = await package_service.add_package(
-            store_path, package_name, store.id
-        )
-        raw_closure: list[str] = core_logic.get_closure(store_path, package_name)
-
-        package = PackageSchema(
-            id=package_id,
-            name=package_name,
-            store_id=store.id,
-            closure=Closure(packages=raw_closure),
-        )
-        return package
+        return store
 
     async def delete_package(
         self,
@@ -190,22 +494,43 @@ class StoreService:
 
         store = await self.get_store(store_name, user)
 
-        package: PackageSchema | None = await package_service.delete_package(
-            package_name, store.id
-        )
-
-        if package is None:
-            raise HTTPException(
-                status_code=400, detail=f"Package {package_name} was not found!"
+        async with store_scheduler.write(store_path):
+            package: PackageSchema | None = await package_service.get_package(
+                package_name, store.id
             )
+            if package is None:
+                raise HTTPException(
+                    status_code=400, detail=f"Package {package_name} was not found!"
+                )
 
-        try:
-            core_logic.remove_package(store_path, package_name)
-        except StillAliveException:
-            raise HTTPException(
-                status_code=400,
-                detail="Cannot delete this package since it is used by another one!",
+            roots = package.roots or [
+                await package_service.resolve_package(package_name)
+            ]
+            holders = await self._get_holders(
+                store_path, roots, store.id, package_service, package_name
             )
+            if holders:
+                raise HTTPException(
+                    status_code=400,
+                    detail="Cannot delete this package since it is used by "
+                    + ", ".join(holders)
+                    + "!",
+                )
+
+            # The rows are deleted once Nix is done, so the request's
+            # transaction is not held open while it runs.
+            try:
+                await core_logic.remove_package(store_path, roots)
+            except StillAliveException:
+                raise HTTPException(
+                    status_code=400,
+                    detail="Cannot delete this package since it is used by another one!",
+                )
+            await package_service.delete_package(package_name, store.id)
+
+            path_index.discard(store_path, roots)
+            reference_graphs.discard(store_path, roots)
+            size_attributions.remove(store_path, package_name)
 
         return package
 
@@ -218,25 +543,191 @@ class StoreService:
         store_1_path: Path = self.stores_path / str(user.id) / store_1_name
         store_2_path: Path = self.stores_path / str(user.id) / store_2_name
 
-        try:
-            store_1_paths: set[str] = core_logic.get_paths(store_1_path)
-        except StoreFolderDoesNotExistException:
-            raise HTTPException(
-                status_code=400, detail=f"Store {store_1_name} does not exist!"
-            )
+        async with store_scheduler.read(store_1_path, store_2_path):
+            try:
+                store_1_paths: frozenset[str] = await path_index.get(store_1_path)
+            except StoreFolderDoesNotExistException:
+                raise HTTPException(
+                    status_code=400, detail=f"Store {store_1_name} does not exist!"
+                )
 
-        try:
-            store_2_paths: set[str] = core_logic.get_paths(store_2_path)
-        except StoreFolderDoesNotExistException:
-            raise HTTPException(
-                status_code=400, detail=f"Store {store_2_name} does not exist!"
-            )
+            try:
+                store_2_paths: frozenset[str] = await path_index.get(store_2_path)
+            except StoreFolderDoesNotExistException:
+                raise HTTPException(
+                    status_code=400, detail=f"Store {store_2_name} does not exist!"
+                )
 
-        difference_1: list[str] = list(store_1_paths - store_2_paths)
-        difference_2: list[str] = list(store_2_paths - store_1_paths)
+        bitmap_1 = membership_index.bitmap(str(store_1_path), store_1_paths)
+        bitmap_2 = membership_index.bitmap(str(store_2_path), store_2_paths)
+        difference_1 = membership_index.interner.paths(bitmap_1 & ~bitmap_2)
+        difference_2 = membership_index.interner.paths(bitmap_2 & ~bitmap_1)
 
         return difference_1, difference_2
 
+    def _get_difference_stores(
+        self, store_1_name: str, store_2_name: str, user: User
+    ) -> tuple[Path, Path]:
+        store_paths = []
+        for store_name in (store_1_name, store_2_name):
+            store_path: Path = self.stores_path / str(user.id) / store_name
+            if not store_path.exists():
+                raise HTTPException(
+                    status_code=400, detail=f"Store {store_name} does not exist!"
+                )
+            store_paths.append(store_path)
+        return store_paths[0], store_paths[1]
+
+    async def _iter_difference(
+        self, store_1_path: Path, store_2_path: Path, after: str | None
+    ) -> AsyncIterator[list[DifferenceEntry]]:
+        def open_difference():
+            return merge_difference(
+                iter_store_paths(store_1_path, after),
+                iter_store_paths(store_2_path, after),
+            )
+
+        entries = await asyncio.to_thread(open_difference)
+        while batch := await asyncio.to_thread(
+            list, islice(entries, DIFFERENCE_BATCH_SIZE)
+        ):
+            yield batch
+
+    async def get_paths_difference_page(
+        self,
+        store_1_name: str,
+        store_2_name: str,
+        user: User,
+        after: str | None,
+        limit: int,
+    ) -> PathsDifference:
+        store_1_path, store_2_path = self._get_difference_stores(
+            store_1_name, store_2_name, user
+        )
+
+        page: list[DifferenceEntry] = []
+        async with store_scheduler.read(store_1_path, store_2_path):
+            async for batch in self._iter_difference(store_1_path, store_2_path, after):
+                page.extend(batch)
+                if len(page) > limit:
+                    break
+
+        has_more = len(page) > limit
+        page = page[:limit]
+        return PathsDifference(
+            absent_in_store_1=[
+                entry.path for entry in page if entry.side == ABSENT_IN_STORE_1
+            ],
+            absent_in_store_2=[
+                entry.path for entry in page if entry.side != ABSENT_IN_STORE_1
+            ],
+            next_cursor=page[-1].path if has_more else None,
+        )
+
+    async def get_paths_difference_summary(
+        self, store_1_name: str, store_2_name: str, user: User
+    ) -> PathsDifferenceSummary:
+        store_1_path, store_2_path = self._get_difference_stores(
+            store_1_name, store_2_name, user
+        )
+
+        summary = PathsDifferenceSummary(
+            absent_in_store_1=DifferenceSummary(),
+            absent_in_store_2=DifferenceSummary(),
+        )
+        async with store_scheduler.read(store_1_path, store_2_path):
+            async for batch in self._iter_difference(store_1_path, store_2_path, None):
+                for entry in batch:
+                    side: DifferenceSummary = getattr(summary, entry.side)
+                    side.count += 1
+                    side.bytes += entry.nar_size
+
+        return summary
+
+    async def stream_paths_difference(
+        self,
+        store_1_name: str,
+        store_2_name: str,
+        user: User,
+        after: str | None,
+    ) -> AsyncIterator[str]:
+        store_1_path, store_2_path = self._get_difference_stores(
+            store_1_name, store_2_name, user
+        )
+
+        # The stream is not scheduled as a store read: a slow client would
+        # hold back installs. Each store is read from a single SQLite
+        # statement, which already sees a consistent snapshot.
+        async def lines():
+            async for batch in self._iter_difference(store_1_path, store_2_path, after):
+                yield "".join(
+                    json.dumps({"side": entry.side, "path": entry.path}) + "\n"
+                    for entry in batch
+                )
+
+        return lines()
+
+    async def compare_stores(
+        self, store_names: list[str], user: User, summary: bool = False
+    ) -> StoresComparison:
+        store_names = list(dict.fromkeys(store_names))
+        store_paths: list[Path] = []
+        for store_name in store_names:
+            await self.get_store(store_name, user)
+            store_paths.append(self.stores_path / str(user.id) / store_name)
+
+        async with store_scheduler.read(*store_paths):
+            paths = []
+            for store_name, store_path in zip(store_names, store_paths):
+                try:
+                    paths.append(await path_index.get(store_path))
+                except StoreFolderDoesNotExistException:
+                    raise HTTPException(
+                        status_code=400, detail=f"Store {store_name} does not exist!"
+                    )
+
+        def compare() -> list[MembershipGroup]:
+            bitmaps = [
+                membership_index.bitmap(str(store_path), store_paths_set)
+                for store_path, store_paths_set in zip(store_paths, paths)
+            ]
+            interner = membership_index.interner
+            return [
+                MembershipGroup(
+                    stores=[store_names[index] for index in stores],
+                    count=group.bit_count(),
+                    paths=None if summary else interner.paths(group),
+                )
+                for stores, group in group_by_membership(bitmaps)
+            ]
+
+        groups = await asyncio.to_thread(compare)
+        groups.sort(key=lambda group: (-len(group.stores), group.stores))
+        return StoresComparison(stores=store_names, groups=groups)
+
+    async def _get_package_path(
+        self,
+        store_name: str,
+        package_name: str,
+        user: User,
+        package_service: PackageService,
+    ) -> str:
+        store = await self.get_store(store_name, user)
+        path = await package_service.get_package_path(package_name, store.id)
+        if path is None:
+            path = await package_service.resolve_package(package_name)
+        return path
+
+    async def _get_stored_closure(
+        self,
+        store_name: str,
+        package_name: str,
+        user: User,
+        package_service: PackageService,
+    ) -> dict[str, int] | None:
+        store = await self.get_store(store_name, user)
+        return await package_service.get_package_closure(package_name, store.id)
+
     async def get_closures_difference(
         self,
         store_name: str,
@@ -244,47 +735,320 @@ class StoreService:
         other_store_name: str,
         other_package_name: str,
         user: User,
+        package_service: PackageService,
     ):
         store_1_path: Path = self.stores_path / str(user.id) / store_name
         store_2_path: Path = self.stores_path / str(user.id) / other_store_name
 
-        try:
-            closure_1: set[str] = set(
-                core_logic.get_closure(store_1_path, package_name)
-            )
-        except NotValidPathException:
-            raise HTTPException(
-                status_code=400, detail=f"Package {package_name} has an invalid path!"
-            )
+        package_1_path = await self._get_package_path(
+            store_name, package_name, user, package_service
+        )
+        package_2_path = await self._get_package_path(
+            other_store_name, other_package_name, user, package_service
+        )
 
-        try:
-            closure_2: set[str] = set(
-                core_logic.get_closure(store_2_path, other_package_name)
-            )
-        except NotValidPathException:
-            raise HTTPException(
-                status_code=400,
-                detail=f"Package {other_package_name} has an invalid path!",
-            )
+        stored_1 = await self._get_stored_closure(
+            store_name, package_name, user, package_service
+        )
+        stored_2 = await self._get_stored_closure(
+            other_store_name, other_package_name, user, package_service
+        )
+
+        async with store_scheduler.read(store_1_path, store_2_path):
+            try:
+                closure_1: array = (
+                    path_interner.sorted_ids(stored_1)
+                    if stored_1 is not None
+                    else await core_logic.get_closure_ids(store_1_path, package_1_path)
+                )
+            except NotValidPathException:
+                raise HTTPException(
+                    status_code=400,
+                    detail=f"Package {package_name} has an invalid path!",
+                )
+
+            try:
+                closure_2: array = (
+                    path_interner.sorted_ids(stored_2)
+                    if stored_2 is not None
+                    else await core_logic.get_closure_ids(store_2_path, package_2_path)
+                )
+            except NotValidPathException:
+                raise HTTPException(
+                    status_code=400,
+                    detail=f"Package {other_package_name} has an invalid path!",
+                )
 
-        difference_1: list[str] = list(closure_1 - closure_2)
-        difference_2: list[str] = list(closure_2 - closure_1)
+        difference_1 = path_interner.lookup(difference(closure_1, closure_2))
+        difference_2 = path_interner.lookup(difference(closure_2, closure_1))
 
         return ClosuresDifference(
             absent_in_package_1=difference_2,
             absent_in_package_2=difference_1,
         )
 
+    async def get_closure_changes(
+        self,
+        store_name: str,
+        package_name: str,
+        other_store_name: str,
+        other_package_name: str,
+        user: User,
+        package_service: PackageService,
+    ) -> list[PackageChange]:
+        store_1_path: Path = self.stores_path / str(user.id) / store_name
+        store_2_path: Path = self.stores_path / str(user.id) / other_store_name
+
+        package_1_path = await self._get_package_path(
+            store_name, package_name, user, package_service
+        )
+        package_2_path = await self._get_package_path(
+            other_store_name, other_package_name, user, package_service
+        )
+
+        sizes_1 = await self._get_stored_closure(
+            store_name, package_name, user, package_service
+        )
+        sizes_2 = await self._get_stored_closure(
+            other_store_name, other_package_name, user, package_service
+        )
+
+        async with store_scheduler.read(store_1_path, store_2_path):
+            try:
+                if sizes_1 is None:
+                    sizes_1 = await core_logic.get_closure_sizes(
+                        store_1_path, package_1_path
+                    )
+            except NotValidPathException:
+                raise HTTPException(
+                    status_code=400,
+                    detail=f"Package {package_name} has an invalid path!",
+                )
+
+            try:
+                if sizes_2 is None:
+                    sizes_2 = await core_logic.get_closure_sizes(
+                        store_2_path, package_2_path
+                    )
+            except NotValidPathException:
+                raise HTTPException(
+                    status_code=400,
+                    detail=f"Package {other_package_name} has an invalid path!",
+                )
+
+        changes = await asyncio.to_thread(diff_closures, sizes_1, sizes_2)
+        return [_package_change(change) for change in changes]
+
+    async def get_dependency_chains(
+        self,
+        store_name: str,
+        package_name: str,
+        target: str,
+        user: User,
+        package_service: PackageService,
+        limit: int = 1,
+    ) -> DependencyChains:
+        store_path: Path = self.stores_path / str(user.id) / store_name
+        package_path = await self._get_package_path(
+            store_name, package_name, user, package_service
+        )
+
+        async with store_scheduler.read(store_path):
+            try:
+                graph = await reference_graphs.get(store_path)
+                root = graph.id(package_path)
+            except NotValidPathException:
+                raise HTTPException(
+                    status_code=400,
+                    detail=f"Package {package_name} has an invalid path!",
+                )
+
+            def find_chains() -> list[list[str]]:
+                if target.startswith("/"):
+                    targets = [graph.ids[target]] if target in graph.ids else []
+                else:
+                    targets = [
+                        node
+                        for node in graph.closure(root)
+                        if parse_store_path(graph.paths[node])[0] == target
+                    ]
+                chains = graph.chains(root, targets, limit)
+                return [[graph.paths[node] for node in chain] for chain in chains]
+
+            chains = await asyncio.to_thread(find_chains)
+        if not chains:
+            raise HTTPException(
+                status_code=404,
+                detail=f"Package {package_name} does not depend on {target}!",
+            )
+
+        return DependencyChains(package=package_path, target=target, chains=chains)
+
+    async def get_closure_breakdown(
+        self,
+        store_name: str,
+        package_name: str,
+        user: User,
+        package_service: PackageService,
+        top: int,
+        tree: bool = False,
+    ) -> ClosureBreakdown:
+        store_path: Path = self.stores_path / str(user.id) / store_name
+        package_path = await self._get_package_path(
+            store_name, package_name, user, package_service
+        )
+
+        async with store_scheduler.read(store_path):
+            try:
+                graph = await reference_graphs.get(store_path)
+                root = graph.id(package_path)
+            except NotValidPathException:
+                raise HTTPException(
+                    status_code=400,
+                    detail=f"Package {package_name} has an invalid path!",
+                )
+
+            def break_down() -> ClosureBreakdown:
+                order, parents = graph.spanning_tree(root)
+                subtree_sizes = graph.subtree_sizes(order, parents)
+
+                def entry(node: int) -> ClosureEntry:
+                    parent = parents[node]
+                    return ClosureEntry(
+                        path=graph.paths[node],
+                        nar_size=graph.sizes[node],
+                        subtree_size=subtree_sizes[node],
+                        parent=None if parent is None else graph.paths[parent],
+                    )
+
+                largest = heapq.nlargest(top, order, key=graph.sizes.__getitem__)
+                return ClosureBreakdown(
+                    package=package_path,
+                    closure_size=subtree_sizes[root],
+                    top=[entry(node) for node in largest],
+                    tree=[entry(node) for node in order] if tree else None,
+                )
+
+            return await asyncio.to_thread(break_down)
+
+    async def get_package_sizes(
+        self,
+        store_name: str,
+        user: User,
+        package_service: PackageService,
+    ) -> list[PackageSizes]:
+        store_path: Path = self.stores_path / str(user.id) / store_name
+        store = await self.get_store(store_name, user)
+
+        async with store_scheduler.read(store_path):
+            try:
+                graph = await reference_graphs.get(store_path)
+            except NotValidPathException:
+                # Nothing was installed into the store yet.
+                return []
+
+            attribution = await size_attributions.get(
+                store_path,
+                graph,
+                lambda: package_service.get_package_roots(store.id),
+            )
+            sizes = [
+                PackageSizes(
+                    package_name=name,
+                    closure_size=attribution.closure_sizes[name],
+                    exclusive_size=attribution.exclusive_sizes[name],
+                    shared_size=attribution.closure_sizes[name]
+                    - attribution.exclusive_sizes[name],
+                )
+                for name in attribution.closures
+            ]
+
+        sizes.sort(key=lambda size: (-size.exclusive_size, size.package_name))
+        return sizes
+
+    async def _get_holders(
+        self,
+        store_path: Path,
+        paths: list[str],
+        store_id: int,
+        package_service: PackageService,
+        excluded: str | None = None,
+    ) -> list[str]:
+        """
+        Installed packages other than `excluded` keeping any of `paths`
+        alive, or nothing when the reference graph of the store cannot be
+        read.
+        """
+        try:
+            graph = await reference_graphs.get(store_path)
+        except (NotValidPathException, UnknownStoreSchemaException):
+            return []
+        nodes = [graph.ids[path] for path in paths if path in graph.ids]
+        if not nodes:
+            return []
+
+        def get_ancestors() -> set[int]:
+            return set().union(*(graph.ancestors(node) for node in nodes))
+
+        roots = await package_service.get_package_roots(store_id)
+        ancestors = await asyncio.to_thread(get_ancestors)
+        return sorted(
+            name
+            for name, package_roots in roots.items()
+            if name != excluded
+            and any(graph.ids.get(root) in ancestors for root in package_roots)
+        )
+
+    async def get_path_referrers(
+        self,
+        store_name: str,
+        path: str,
+        user: User,
+        package_service: PackageService,
+    ) -> PathReferrers:
+        store_path: Path = self.stores_path / str(user.id) / store_name
+        store = await self.get_store(store_name, user)
+
+        async with store_scheduler.read(store_path):
+            try:
+                graph = await reference_graphs.get(store_path)
+                node = graph.id(path)
+            except NotValidPathException:
+                raise HTTPException(
+                    status_code=404,
+                    detail=f"Path {path} is not valid in the store {store_name}!",
+                )
+
+            referrers = sorted(
+                graph.paths[referrer] for referrer in graph.referrers[node]
+            )
+            packages = await self._get_holders(
+                store_path, [path], store.id, package_service
+            )
+
+        return PathReferrers(path=path, referrers=referrers, packages=packages)
+
     async def get_package_meta(
         self,
         store_name: str,
         package_name: str,
         user: User,
+        package_service: PackageService,
     ):
         store_path: Path = self.stores_path / str(user.id) / store_name
 
+        store = await self.get_store(store_name, user)
+        package = await package_service.get_package(package_name, store.id)
+        if package is not None and package.closure_size is not None:
+            return PackageMeta(present=True, closure_size=package.closure_size)
+
+        path = await self._get_package_path(
+            store_name, package_name, user, package_service
+        )
+
         try:
-            closure_size = core_logic.get_closure_size(store_path, package_name)
+            async with store_scheduler.read(store_path):
+                closure_size = await core_logic.get_closure_size(store_path, path)
         except PackageNotInstalledException:
             return PackageMeta(present=False, closure_size=0)
 
@@ -0,0 +1,25 @@
+from fastapi import APIRouter, Depends
+
+from src.auth.auth import fastapi_users
+from src.auth.schemas import User
+from src.logic.core import closure_flight, nix_flight
+from src.logic.scheduler import store_scheduler
+from src.logic.trash import trash_reaper
+
+router = APIRouter(prefix="/stats")
+current_user = fastapi_users.current_user()
+
+
+@router.get("")
+async def get_stats(user: User = Depends(current_user)):
+    """
+    Counters of the single-flight layers in front of Nix invocations and
+    closure queries, queue metrics of the store scheduler and the number of
+    deleted stores still waiting in the trash
+    """
+    return {
+        "nix": nix_flight.stats(),
+        "closures": closure_flight.stats(),
+        "stores": store_scheduler.stats(),
+        "trash": {"pending": trash_reaper.pending()},
+    }
@@ -1,4 +1,4 @@
-from sqlalchemy import String
+from sqlalchemy import JSON, String, UniqueConstraint
 from sqlalchemy.orm import Mapped, mapped_column
 
 from src.db.db import Base
@@ -8,15 +8,22 @@ from src.store.schemas.package import Package as PackageSchema
 
 class Package(Base):
     __tablename__ = "package"
+    __table_args__ = (UniqueConstraint("store_id", "name"),)
 
     id: Mapped[int] = mapped_column(primary_key=True)
     name: Mapped[str] = mapped_column(String(length=320), nullable=False)
     store_id: Mapped[int]
+    path: Mapped[str | None] = mapped_column(String, nullable=True)
+    outputs: Mapped[dict[str, str] | None] = mapped_column(JSON, nullable=True)
+    closure_size: Mapped[int | None] = mapped_column(nullable=True)
 
-    def to_read_model(self):
+    def to_read_model(self, closure: Closure | None = None):
         return PackageSchema(
             id=self.id,
             name=self.name,
             store_id=self.store_id,
-            closure=Closure(packages=[]),
+            closure=closure or Closure(packages=[]),
+            path=self.path,
+            outputs=self.outputs or {},
+            closure_size=self.closure_size,
         )
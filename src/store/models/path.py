@@ -0,0 +1,39 @@
+from sqlalchemy import ForeignKey, Index, String
+from sqlalchemy.orm import Mapped, mapped_column
+
+from src.db.db import Base
+
+
+class StorePath(Base):
+    """
+    A store path with its metadata, shared by every store and package
+    holding it, since a store path never changes its contents.
+    """
+
+    __tablename__ = "store_path"
+
+    id: Mapped[int] = mapped_column(primary_key=True)
+    path: Mapped[str] = mapped_column(String, nullable=False, unique=True)
+    name: Mapped[str] = mapped_column(String, nullable=False)
+    hash: Mapped[str] = mapped_column(String(length=32), nullable=False)
+    nar_size: Mapped[int] = mapped_column(nullable=False)
+
+
+class Reference(Base):
+    __tablename__ = "reference"
+    __table_args__ = (Index("reference_reference_id", "reference_id"),)
+
+    referrer_id: Mapped[int] = mapped_column(
+        ForeignKey("store_path.id"), primary_key=True
+    )
+    reference_id: Mapped[int] = mapped_column(
+        ForeignKey("store_path.id"), primary_key=True
+    )
+
+
+class PackageClosure(Base):
+    __tablename__ = "package_closure"
+    __table_args__ = (Index("package_closure_path_id", "path_id"),)
+
+    package_id: Mapped[int] = mapped_column(primary_key=True)
+    path_id: Mapped[int] = mapped_column(ForeignKey("store_path.id"), primary_key=True)
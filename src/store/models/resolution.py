@@ -0,0 +1,14 @@
+from sqlalchemy import String, UniqueConstraint
+from sqlalchemy.orm import Mapped, mapped_column
+
+from src.db.db import Base
+
+
+class Resolution(Base):
+    __tablename__ = "resolution"
+    __table_args__ = (UniqueConstraint("revision", "attribute"),)
+
+    id: Mapped[int] = mapped_column(primary_key=True)
+    revision: Mapped[str] = mapped_column(String(length=64), nullable=False)
+    attribute: Mapped[str] = mapped_column(String(length=320), nullable=False)
+    path: Mapped[str] = mapped_column(String, nullable=False)
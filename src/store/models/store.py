@@ -10,7 +10,7 @@ class Store(Base):
 
     id: Mapped[int] = mapped_column(Integer, primary_key=True)
     name: Mapped[str] = mapped_column(String(length=320), nullable=False, unique=True)
-    owner_id: Mapped[int] = mapped_column(Integer)
+    owner_id: Mapped[int] = mapped_column(Integer, index=True)
 
     def to_read_model(self):
-        return StoreSchema(id=self.id, name=self.name, owner_id=self.owner_id)
+        return StoreSchema(id=self.id, name=self.name, owner_id=self.owner_id, paths=[])
@@ -1,23 +1,64 @@
 from typing import Annotated
 
-from fastapi import APIRouter, Depends
+from fastapi import APIRouter, Depends, Query
+from fastapi.responses import StreamingResponse
 
 from src.auth.auth import fastapi_users
 from src.auth.schemas import User
+from src.dependencies.jobs import job_service_dependency
 from src.dependencies.store import package_service_dependency, store_service_dependency
+from src.jobs.schemas.job import Job
+from src.jobs.workers import job_workers
+from src.services.jobs import JobService
 from src.services.stores import PackageService, StoreService
 from src.store.schemas.package import (
+    ClosureBreakdown,
     ClosuresDifference,
+    DependencyChains,
     Package,
+    PackageChange,
     PackageMeta,
+    PackageSizes,
 )
-from src.store.schemas.path import PathsDifference
-from src.store.schemas.store import Store
+from src.store.schemas.path import (
+    PathReferrers,
+    PathsDifference,
+    PathsDifferenceSummary,
+    StoresComparison,
+    StoresComparisonRequest,
+)
+from src.store.schemas.store import Store, StoreField, StoreFields
+
+DIFFERENCE_PAGE_SIZE = 1000
+MAX_DIFFERENCE_PAGE_SIZE = 10000
+MAX_DEPENDENCY_CHAINS = 100
+STORES_PAGE_SIZE = 1000
+MAX_STORES_PAGE_SIZE = 10000
+CLOSURE_TOP_SIZE = 10
+MAX_CLOSURE_TOP_SIZE = 1000
 
 router = APIRouter(prefix="/store")
 current_user = fastapi_users.current_user()
 
 
+@router.post(
+    "/compare", response_model=StoresComparison, response_model_exclude_none=True
+)
+async def compare_stores(
+    comparison: StoresComparisonRequest,
+    store_service: Annotated[StoreService, Depends(store_service_dependency)],
+    user: User = Depends(current_user),
+):
+    """
+    Groups the paths of the given stores by the set of stores holding them.
+    With `summary` only the number of paths in each group is returned
+    """
+    result = await store_service.compare_stores(
+        comparison.stores, user, comparison.summary
+    )
+    return result
+
+
 @router.post("/{name}", response_model=Store)
 async def create_store(
     name: str,
@@ -28,12 +69,31 @@ async def create_store(
     return store
 
 
-@router.get("", response_model=list[Store])
+@router.post("/{name}/clone/{new_name}", response_model=Store)
+async def clone_store(
+    name: str,
+    new_name: str,
+    store_service: Annotated[StoreService, Depends(store_service_dependency)],
+    package_service: Annotated[PackageService, Depends(package_service_dependency)],
+    user: User = Depends(current_user),
+):
+    store = await store_service.clone_store(name, new_name, user, package_service)
+    return store
+
+
+@router.get("", response_model=list[StoreFields], response_model_exclude_unset=True)
 async def get_all_stores(
     store_service: Annotated[StoreService, Depends(store_service_dependency)],
     user: User = Depends(current_user),
+    after_id: int | None = None,
+    limit: Annotated[int, Query(ge=1, le=MAX_STORES_PAGE_SIZE)] = STORES_PAGE_SIZE,
+    fields: Annotated[list[StoreField] | None, Query()] = None,
 ):
-    stores = await store_service.get_stores(user)
+    """
+    Stores by ascending id, starting after `after_id`. With `fields` only
+    those and the id are returned
+    """
+    stores = await store_service.get_stores(user, after_id, limit, fields)
     return stores
 
 
@@ -51,24 +111,33 @@ async def get_store(
 async def delete_store(
     name: str,
     store_service: Annotated[StoreService, Depends(store_service_dependency)],
+    package_service: Annotated[PackageService, Depends(package_service_dependency)],
     user: User = Depends(current_user),
 ):
-    store = await store_service.delete_store(name, user)
+    store = await store_service.delete_store(name, user, package_service)
     return store
 
 
-@router.post("/{store_name}/package/{package_name}", response_model=Package)
+@router.post(
+    "/{store_name}/package/{package_name}", response_model=Job, status_code=202
+)
 async def add_package(
     store_name: str,
     package_name: str,
     store_service: Annotated[StoreService, Depends(store_service_dependency)],
     package_service: Annotated[PackageService, Depends(package_service_dependency)],
+    job_service: Annotated[JobService, Depends(job_service_dependency)],
     user: User = Depends(current_user),
 ):
-    package: Package = await store_service.add_package(
+    """
+    Queue the installation of a package, poll `/jobs/{id}` for the result
+    """
+    await store_service.check_package_can_be_added(
         store_name, package_name, user, package_service
     )
-    return package
+    job: Job = await job_service.add_install_job(store_name, package_name, user)
+    job_workers.notify()
+    return job
 
 
 @router.delete("/{store_name}/package/{package_name}", response_model=Package)
@@ -86,14 +155,31 @@ async def delete_package(
 
 
 @router.get(
-    "/{store_name}/difference/{other_store_name}", response_model=PathsDifference
+    "/{store_name}/difference/{other_store_name}",
+    response_model=PathsDifference,
+    response_model_exclude_none=True,
 )
 async def get_paths_difference(
     store_name: str,
     other_store_name: str,
     store_service: Annotated[StoreService, Depends(store_service_dependency)],
     user: User = Depends(current_user),
+    after: str | None = None,
+    limit: Annotated[int | None, Query(ge=1, le=MAX_DIFFERENCE_PAGE_SIZE)] = None,
 ):
+    """
+    Paths absent in either store. With `after` or `limit` the difference is
+    paginated in path order; pass `next_cursor` as `after` to get the next page
+    """
+    if after is not None or limit is not None:
+        return await store_service.get_paths_difference_page(
+            store_name,
+            other_store_name,
+            user,
+            after,
+            limit or DIFFERENCE_PAGE_SIZE,
+        )
+
     difference_1, difference_2 = await store_service.get_paths_difference(
         store_name, other_store_name, user
     )
@@ -105,6 +191,40 @@ async def get_paths_difference(
     return paths_difference
 
 
+@router.get(
+    "/{store_name}/difference/{other_store_name}/summary",
+    response_model=PathsDifferenceSummary,
+)
+async def get_paths_difference_summary(
+    store_name: str,
+    other_store_name: str,
+    store_service: Annotated[StoreService, Depends(store_service_dependency)],
+    user: User = Depends(current_user),
+):
+    summary = await store_service.get_paths_difference_summary(
+        store_name, other_store_name, user
+    )
+    return summary
+
+
+@router.get("/{store_name}/difference/{other_store_name}/stream")
+async def stream_paths_difference(
+    store_name: str,
+    other_store_name: str,
+    store_service: Annotated[StoreService, Depends(store_service_dependency)],
+    user: User = Depends(current_user),
+    after: str | None = None,
+):
+    """
+    The paths difference as NDJSON, one `{"side", "path"}` object per line in
+    path order
+    """
+    lines = await store_service.stream_paths_difference(
+        store_name, other_store_name, user, after
+    )
+    return StreamingResponse(lines, media_type="application/x-ndjson")
+
+
 @router.get(
     "/{store_name}/package/{package_name}/closure-difference/{other_store_name}/{other_package_name}",
     response_model=ClosuresDifference,
@@ -115,25 +235,142 @@ async def get_closures_difference(
     other_store_name: str,
     other_package_name: str,
     store_service: Annotated[StoreService, Depends(store_service_dependency)],
+    package_service: Annotated[PackageService, Depends(package_service_dependency)],
     user: User = Depends(current_user),
 ):
     """
     Closure difference for packages from the different stores
     """
     closures_difference = await store_service.get_closures_difference(
-        store_name, package_name, other_store_name, other_package_name, user
+        store_name,
+        package_name,
+        other_store_name,
+        other_package_name,
+        user,
+        package_service,
     )
     return closures_difference
 
 
+@router.get(
+    "/{store_name}/package/{package_name}/closure-changes/{other_store_name}/{other_package_name}",
+    response_model=list[PackageChange],
+)
+async def get_closure_changes(
+    store_name: str,
+    package_name: str,
+    other_store_name: str,
+    other_package_name: str,
+    store_service: Annotated[StoreService, Depends(store_service_dependency)],
+    package_service: Annotated[PackageService, Depends(package_service_dependency)],
+    user: User = Depends(current_user),
+):
+    """
+    Version and size changes of the packages in the closures, like
+    `nix store diff-closures`, largest size changes first
+    """
+    changes = await store_service.get_closure_changes(
+        store_name,
+        package_name,
+        other_store_name,
+        other_package_name,
+        user,
+        package_service,
+    )
+    return changes
+
+
+@router.get(
+    "/{store_name}/package/{package_name}/why-depends",
+    response_model=DependencyChains,
+)
+async def get_dependency_chains(
+    store_name: str,
+    package_name: str,
+    target: str,
+    store_service: Annotated[StoreService, Depends(store_service_dependency)],
+    package_service: Annotated[PackageService, Depends(package_service_dependency)],
+    user: User = Depends(current_user),
+    limit: Annotated[int, Query(ge=1, le=MAX_DEPENDENCY_CHAINS)] = 1,
+):
+    """
+    Shortest chains of references from the package to `target`, a store path
+    or a package name, like `nix why-depends`
+    """
+    chains = await store_service.get_dependency_chains(
+        store_name, package_name, target, user, package_service, limit
+    )
+    return chains
+
+
+@router.get("/{store_name}/sizes", response_model=list[PackageSizes])
+async def get_package_sizes(
+    store_name: str,
+    store_service: Annotated[StoreService, Depends(store_service_dependency)],
+    package_service: Annotated[PackageService, Depends(package_service_dependency)],
+    user: User = Depends(current_user),
+):
+    """
+    Closure size of each installed package split into the bytes only it
+    holds, which deleting it would free, and the bytes shared with other
+    packages. Packages freeing the most come first
+    """
+    sizes = await store_service.get_package_sizes(store_name, user, package_service)
+    return sizes
+
+
+@router.get("/{store_name}/referrers", response_model=PathReferrers)
+async def get_path_referrers(
+    store_name: str,
+    path: str,
+    store_service: Annotated[StoreService, Depends(store_service_dependency)],
+    package_service: Annotated[PackageService, Depends(package_service_dependency)],
+    user: User = Depends(current_user),
+):
+    """
+    Paths referencing `path` directly, and the installed packages keeping it
+    alive, which have to be deleted before it can be
+    """
+    referrers = await store_service.get_path_referrers(
+        store_name, path, user, package_service
+    )
+    return referrers
+
+
+@router.get(
+    "/{store_name}/package/{package_name}/breakdown",
+    response_model=ClosureBreakdown,
+    response_model_exclude_none=True,
+)
+async def get_closure_breakdown(
+    store_name: str,
+    package_name: str,
+    store_service: Annotated[StoreService, Depends(store_service_dependency)],
+    package_service: Annotated[PackageService, Depends(package_service_dependency)],
+    user: User = Depends(current_user),
+    top: Annotated[int, Query(ge=0, le=MAX_CLOSURE_TOP_SIZE)] = CLOSURE_TOP_SIZE,
+    tree: bool = False,
+):
+    """
+    The `top` largest paths of the package closure. With `tree` every path
+    of the closure is listed with the path it is reached from first and the
+    size of its subtree, for treemaps
+    """
+    breakdown = await store_service.get_closure_breakdown(
+        store_name, package_name, user, package_service, top, tree
+    )
+    return breakdown
+
+
 @router.get("/{store_name}/package/{package_name}", response_model=PackageMeta)
 async def get_package_meta(
     store_name: str,
     package_name: str,
     store_service: Annotated[StoreService, Depends(store_service_dependency)],
+    package_service: Annotated[PackageService, Depends(package_service_dependency)],
     user: User = Depends(current_user),
 ):
     package_meta: PackageMeta = await store_service.get_package_meta(
-        store_name, package_name, user
+        store_name, package_name, user, package_service
     )
     return package_meta
@@ -11,6 +11,18 @@ class Package(BaseModel):
     name: str
     store_id: int
     closure: "Closure"
+    path: str | None = None
+    outputs: dict[str, str] = {}
+    closure_size: int | None = None
+
+    @property
+    def roots(self) -> list[str]:
+        """
+        Store paths the package keeps alive.
+        """
+        if self.outputs:
+            return list(self.outputs.values())
+        return [self.path] if self.path is not None else []
 
 
 class VersionUpdate(BaseModel):
@@ -22,10 +34,12 @@ class PackageChange(BaseModel):
     package_name: str
     version_update: VersionUpdate
     size_update: str
+    size_delta: int = 0
 
 
 class Closure(BaseModel):
     packages: list[str] = []
+    sizes: dict[str, int] = {}
 
 
 class ClosuresDifference(BaseModel):
@@ -33,5 +47,32 @@ class ClosuresDifference(BaseModel):
     absent_in_package_2: list[str]
 
 
+class PackageSizes(BaseModel):
+    package_name: str
+    closure_size: int
+    exclusive_size: int
+    shared_size: int
+
+
 class ClosureSize(BaseModel):
     size: int
+
+
+class DependencyChains(BaseModel):
+    package: str
+    target: str
+    chains: list[list[str]]
+
+
+class ClosureEntry(BaseModel):
+    path: str
+    nar_size: int
+    subtree_size: int
+    parent: str | None = None
+
+
+class ClosureBreakdown(BaseModel):
+    package: str
+    closure_size: int
+    top: list[ClosureEntry]
+    tree: list[ClosureEntry] | None = None
@@ -1,6 +1,41 @@
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
+
+MAX_COMPARED_STORES = 256
 
 
 class PathsDifference(BaseModel):
     absent_in_store_1: list[str]
     absent_in_store_2: list[str]
+    next_cursor: str | None = None
+
+
+class PathReferrers(BaseModel):
+    path: str
+    referrers: list[str]
+    packages: list[str]
+
+
+class DifferenceSummary(BaseModel):
+    count: int = 0
+    bytes: int = 0
+
+
+class PathsDifferenceSummary(BaseModel):
+    absent_in_store_1: DifferenceSummary
+    absent_in_store_2: DifferenceSummary
+
+
+class StoresComparisonRequest(BaseModel):
+    stores: list[str] = Field(min_length=1, max_length=MAX_COMPARED_STORES)
+    summary: bool = False
+
+
+class MembershipGroup(BaseModel):
+    stores: list[str]
+    count: int
+    paths: list[str] | None = None
+
+
+class StoresComparison(BaseModel):
+    stores: list[str]
+    groups: list[MembershipGroup]
@@ -1,8 +1,23 @@
+from typing import Literal
+
 from pydantic import BaseModel
 
+StoreField = Literal["id", "name", "owner_id"]
+
 
 class Store(BaseModel):
     id: int
     name: str
     owner_id: int
     paths: list[str] = []
+
+
+class StoreFields(BaseModel):
+    """
+    A store with only some of its fields, see `StoreField`.
+    """
+
+    id: int | None = None
+    name: str | None = None
+    owner_id: int | None = None
+    paths: list[str] | None = None
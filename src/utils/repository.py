@@ -1,10 +1,25 @@
 from abc import ABC, abstractmethod
-from typing import Sequence
+from collections.abc import AsyncIterator, Iterable, Iterator
+from contextlib import asynccontextmanager
+from typing import Any, Sequence
 
-from sqlalchemy import Row, select
+from sqlalchemy import Row, insert, select
 from sqlalchemy import delete as sqlalchemy_delete
+from sqlalchemy import update as sqlalchemy_update
+from sqlalchemy.dialects.postgresql import insert as postgresql_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.ext.asyncio import AsyncSession
 
 from src.db.db import async_session_maker
+from src.utils.unitofwork import UnitOfWork
+
+# Stays below SQLite's limit on the number of bound parameters.
+BULK_BATCH_SIZE = 500
+
+
+def batches(items: list, size: int = BULK_BATCH_SIZE) -> Iterator[list]:
+    for start in range(0, len(items), size):
+        yield items[start : start + size]
 
 
 class AbstractRepository(ABC):
@@ -13,44 +28,203 @@ class AbstractRepository(ABC):
         raise NotImplementedError
 
     @abstractmethod
-    async def get_all(self, filter_by: dict) -> Sequence[Row]:
+    async def get_all(
+        self,
+        filter_by: dict,
+        after_id: int | None = None,
+        limit: int | None = None,
+        columns: list[str] | None = None,
+    ) -> Sequence[Row]:
         raise NotImplementedError
 
     @abstractmethod
     async def get_one(self, filter_by: dict) -> Row | None:
         raise NotImplementedError
 
+    @abstractmethod
+    async def update(self, filter_by: dict, data: dict) -> int:
+        raise NotImplementedError
+
     @abstractmethod
     async def delete(self, filter_by: dict):
         raise NotImplementedError
 
+    @abstractmethod
+    async def add_many(self, data: list[dict]) -> list[int]:
+        raise NotImplementedError
+
+    @abstractmethod
+    async def get_many(self, column: str, values: Iterable[Any]) -> Sequence[Row]:
+        raise NotImplementedError
+
+    @abstractmethod
+    async def delete_many(self, column: str, values: Iterable[Any]) -> int:
+        raise NotImplementedError
+
+    @abstractmethod
+    async def upsert(
+        self, data: list[dict], keys: list[str], update: list[str] | None = None
+    ):
+        raise NotImplementedError
+
 
 class SQLAlchemyRepository(AbstractRepository):
     model = None
 
-    async def add_one(self, data: dict) -> int:
+    def __init__(self, unit_of_work: UnitOfWork | None = None):
+        self.unit_of_work = unit_of_work
+
+    def _shared_session(self) -> AsyncSession | None:
+        if self.unit_of_work is None:
+            return None
+        return self.unit_of_work.session
+
+    @asynccontextmanager
+    async def _session(self) -> AsyncIterator[AsyncSession]:
+        session = self._shared_session()
+        if session is not None:
+            yield session
+            return
+
         async with async_session_maker() as session:
+            yield session
+
+    async def _save(self, session: AsyncSession):
+        # Changes in the unit of work's session are committed along with it.
+        if session is self._shared_session():
+            await session.flush()
+        else:
+            await session.commit()
+
+    async def add_one(self, data: dict) -> int:
+        async with self._session() as session:
             new_entry = self.model(**data)  # type: ignore
             session.add(new_entry)
-            await session.commit()
-            await session.refresh(new_entry)
+            await self._save(session)
             return new_entry.id
 
-    async def get_all(self, filter_by: dict) -> Sequence[Row]:
-        async with async_session_maker() as session:
-            stmt = select(self.model).filter_by(**filter_by)  # type: ignore
+    async def get_all(
+        self,
+        filter_by: dict,
+        after_id: int | None = None,
+        limit: int | None = None,
+        columns: list[str] | None = None,
+    ) -> Sequence[Row]:
+        """
+        Rows matching `filter_by`. With `after_id` or `limit` they are paged
+        by ascending id; with `columns` only those are selected and the rows
+        hold their values instead of the model.
+        """
+        async with self._session() as session:
+            if columns:
+                stmt = select(*(getattr(self.model, column) for column in columns))
+            else:
+                stmt = select(self.model)  # type: ignore
+            stmt = stmt.filter_by(**filter_by)
+
+            if after_id is not None or limit is not None:
+                stmt = stmt.order_by(self.model.id)  # type: ignore
+            if after_id is not None:
+                stmt = stmt.where(self.model.id > after_id)  # type: ignore
+            if limit is not None:
+                stmt = stmt.limit(limit)
+
             result = await session.execute(stmt)
             return result.fetchall()
 
     async def get_one(self, filter_by: dict) -> Row | None:
-        async with async_session_maker() as session:
+        async with self._session() as session:
             stmt = select(self.model).filter_by(**filter_by)  # type: ignore
             result = await session.execute(stmt)
             result = result.fetchone()
             return result
 
+    async def update(self, filter_by: dict, data: dict) -> int:
+        async with self._session() as session:
+            stmt = (
+                sqlalchemy_update(self.model)  # type: ignore
+                .filter_by(**filter_by)
+                .values(**data)
+            )
+            result = await session.execute(stmt)
+            await self._save(session)
+            return result.rowcount  # type: ignore
+
     async def delete(self, filter_by: dict):
-        async with async_session_maker() as session:
+        async with self._session() as session:
             stmt = sqlalchemy_delete(self.model).filter_by(**filter_by)  # type: ignore
             await session.execute(stmt)
-            await session.commit()
+            await self._save(session)
+
+    async def add_many(self, data: list[dict]) -> list[int]:
+        """
+        Inserts all rows with multi-row statements, returning their ids in
+        the order of `data`.
+        """
+        if not data:
+            return []
+
+        async with self._session() as session:
+            stmt = insert(self.model).returning(  # type: ignore
+                self.model.id,  # type: ignore
+                sort_by_parameter_order=True,
+            )
+            result = await session.execute(stmt, data)
+            ids = list(result.scalars())
+            await self._save(session)
+            return ids
+
+    async def get_many(self, column: str, values: Iterable[Any]) -> Sequence[Row]:
+        rows = []
+        async with self._session() as session:
+            for batch in batches(list(values)):
+                stmt = select(self.model).where(  # type: ignore
+                    getattr(self.model, column).in_(batch)
+                )
+                result = await session.execute(stmt)
+                rows.extend(result.fetchall())
+        return rows
+
+    async def delete_many(self, column: str, values: Iterable[Any]) -> int:
+        deleted = 0
+        async with self._session() as session:
+            for batch in batches(list(values)):
+                stmt = sqlalchemy_delete(self.model).where(  # type: ignore
+                    getattr(self.model, column).in_(batch)
+                )
+                result = await session.execute(stmt)
+                deleted += result.rowcount  # type: ignore
+            await self._save(session)
+        return deleted
+
+    async def upsert(
+        self, data: list[dict], keys: list[str], update: list[str] | None = None
+    ):
+        """
+        Inserts the rows, updating the `update` columns of rows whose unique
+        `keys` already exist, or leaving those rows as they are without
+        `update`.
+        """
+        if not data:
+            return
+
+        async with self._session() as session:
+            dialect = session.get_bind().dialect.name
+            if dialect == "sqlite":
+                stmt = sqlite_insert(self.model)  # type: ignore
+            elif dialect == "postgresql":
+                stmt = postgresql_insert(self.model)  # type: ignore
+            else:
+                raise NotImplementedError(f"Upserts are not supported on {dialect}")
+
+            if update:
+                stmt = stmt.on_conflict_do_update(
+                    index_elements=keys,
+                    set_={column: stmt.excluded[column] for column in update},
+                )
+            else:
+                stmt = stmt.on_conflict_do_nothing(index_elements=keys)
+
+            for batch in batches(data):
+                await session.execute(stmt, batch)
+            await self._save(session)
@@ -0,0 +1,35 @@
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from src.db.db import async_session_maker
+
+
+class UnitOfWork:
+    """
+    One session and transaction shared by every repository bound to it,
+    committed when the unit of work ends without an exception and rolled
+    back otherwise. Once it has ended, bound repositories open a session
+    per call again.
+
+    A given `session` is left open for its owner to close.
+    """
+
+    def __init__(self, session: AsyncSession | None = None):
+        self._given_session = session
+        self.session: AsyncSession | None = None
+
+    async def __aenter__(self) -> "UnitOfWork":
+        self.session = self._given_session or async_session_maker()
+        return self
+
+    async def __aexit__(self, exc_type, exc_value, traceback):
+        session, self.session = self.session, None
+        if session is None:
+            raise RuntimeError("The unit of work was not entered")
+        try:
+            if exc_type is None:
+                await session.commit()
+            else:
+                await session.rollback()
+        finally:
+            if session is not self._given_session:
+                await session.close()
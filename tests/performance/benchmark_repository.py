@@ -0,0 +1,69 @@
+"""
+Compares single-row repository calls with the bulk ones on 10k rows:
+
+    python -m tests.performance.benchmark_repository
+"""
+
+import asyncio
+import os
+import tempfile
+import time
+from pathlib import Path
+
+ROWS = 10_000
+
+directory = tempfile.mkdtemp()
+os.environ["DATABASE_URL"] = f"sqlite+aiosqlite:///{Path(directory) / 'bench.db'}"
+
+from src.db.db import create_db_and_tables, engine  # noqa: E402
+from src.repositories.stores import PackageRepository  # noqa: E402
+
+
+def rows(store_id: int) -> list[dict]:
+    return [
+        {
+            "name": f"package{index}",
+            "store_id": store_id,
+            "path": f"/nix/store/{index:032d}-package{index}",
+            "outputs": {"out": f"/nix/store/{index:032d}-package{index}"},
+            "closure_size": index,
+        }
+        for index in range(ROWS)
+    ]
+
+
+async def timed(label: str, operation) -> float:
+    start = time.perf_counter()
+    await operation
+    elapsed = time.perf_counter() - start
+    print(f"{label:<24}{elapsed:>8.3f} s")
+    return elapsed
+
+
+async def one_by_one(repository: PackageRepository):
+    ids = [await repository.add_one(row) for row in rows(1)]
+    for package_id in ids:
+        await repository.get_one({"id": package_id})
+    for package_id in ids:
+        await repository.delete({"id": package_id})
+
+
+async def in_bulk(repository: PackageRepository):
+    ids = await repository.add_many(rows(2))
+    await repository.get_many("id", ids)
+    await repository.delete_many("id", ids)
+
+
+async def main():
+    await create_db_and_tables()
+    repository = PackageRepository()
+
+    single = await timed(f"one by one ({ROWS} rows)", one_by_one(repository))
+    bulk = await timed(f"in bulk ({ROWS} rows)", in_bulk(repository))
+    print(f"speedup{single / bulk:>24.1f}x")
+
+    await engine.dispose()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
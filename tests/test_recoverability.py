@@ -69,7 +69,11 @@ async def test_recoverability(client_server):
     client, server = client_server
 
     client.post("/store/store")
-    client.post("/store/store/package/hello")
+    job = client.post("/store/store/package/hello").json()
+
+    while job["state"] in ("pending", "running"):
+        await asyncio.sleep(1)
+        job = client.get(f"/jobs/{job['id']}").json()
 
     server.should_exit = True
 
@@ -0,0 +1,98 @@
+import sqlite3
+import tempfile
+from pathlib import Path
+from unittest.mock import patch
+
+import pytest
+
+from src.logic.cache import ClosureCache
+from src.logic.closure import get_database_path
+from src.logic.paths import PathIndex
+
+HELLO = "/nix/store/aaaa-hello-2.12.1"
+LIBIDN = "/nix/store/bbbb-libidn2-2.3.7"
+GLIBC = "/nix/store/cccc-glibc-2.39-52"
+CURL = "/nix/store/dddd-curl-8.7.1"
+
+SYNTHETIC_PATHS = {
+    HELLO: (100, [LIBIDN, GLIBC]),
+    LIBIDN: (20, [GLIBC]),
+    GLIBC: (1000, [GLIBC]),
+    CURL: (300, [GLIBC]),
+}
+
+
+def create_store_database(store: Path, paths: dict[str, tuple[int, list[str]]]) -> Path:
+    database = get_database_path(store)
+    database.parent.mkdir(parents=True, exist_ok=True)
+
+    with sqlite3.connect(database) as connection:
+        connection.executescript(
+            """
+            CREATE TABLE ValidPaths (
+                id integer primary key autoincrement not null,
+                path text unique not null,
+                hash text not null,
+                registrationTime integer not null,
+                deriver text,
+                narSize integer,
+                ultimate integer,
+                sigs text,
+                ca text
+            );
+            CREATE TABLE Refs (
+                referrer integer not null,
+                reference integer not null,
+                primary key (referrer, reference)
+            );
+            """
+        )
+        ids = {}
+        for path, (nar_size, _) in paths.items():
+            cursor = connection.execute(
+                "INSERT INTO ValidPaths (path, hash, registrationTime, narSize) "
+                "VALUES (?, 'sha256:0', 0, ?)",
+                (path, nar_size),
+            )
+            ids[path] = cursor.lastrowid
+        for path, (_, references) in paths.items():
+            connection.executemany(
+                "INSERT INTO Refs (referrer, reference) VALUES (?, ?)",
+                [(ids[path], ids[reference]) for reference in references],
+            )
+    connection.close()
+
+    for path in paths:
+        (store / path.lstrip("/")).mkdir(parents=True, exist_ok=True)
+
+    return database
+
+
+@pytest.fixture
+def synthetic_store():
+    with tempfile.TemporaryDirectory() as tempdir:
+        store = Path(tempdir) / "store"
+        create_store_database(store, SYNTHETIC_PATHS)
+        yield store
+
+
+@pytest.fixture(autouse=True)
+def closure_cache(tmp_path):
+    cache = ClosureCache(tmp_path / "closures.sqlite")
+    with patch("src.logic.core.closure_cache", cache):
+        yield cache
+
+
+@pytest.fixture(autouse=True)
+def binary_cache():
+    # Unit tests never run Nix, so the shared binary cache is off unless a
+    # test enables it.
+    with patch("src.logic.core.NIX_BINARY_CACHE", ""):
+        yield
+
+
+@pytest.fixture(autouse=True)
+def path_index():
+    index = PathIndex()
+    with patch("src.services.stores.path_index", index):
+        yield index
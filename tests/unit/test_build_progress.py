@@ -0,0 +1,56 @@
+import json
+
+from src.logic.progress import BuildProgress, ProgressTracker
+
+
+def nix_event(**event) -> str:
+    return "@nix " + json.dumps(event)
+
+
+def test_progress_tracker():
+    tracker = ProgressTracker()
+
+    assert tracker.feed(nix_event(action="start", id=1, type=103, text="copying"))
+    assert tracker.feed(nix_event(action="result", id=1, type=105, fields=[2, 5, 0, 0]))
+    assert tracker.feed(nix_event(action="start", id=2, type=104, text="building"))
+    assert tracker.feed(nix_event(action="result", id=2, type=105, fields=[0, 1, 1, 0]))
+
+    assert tracker.snapshot() == BuildProgress(
+        paths_done=2,
+        paths_expected=5,
+        builds_done=0,
+        builds_expected=1,
+        activity="building",
+    )
+    assert tracker.snapshot().paths_remaining == 3
+
+
+def test_progress_tracker_transfers():
+    tracker = ProgressTracker()
+
+    for id in (1, 2):
+        tracker.feed(nix_event(action="start", id=id, type=101, text="downloading"))
+        tracker.feed(nix_event(action="result", id=id, type=105, fields=[5, 10, 0, 0]))
+    tracker.feed(nix_event(action="result", id=1, type=105, fields=[10, 10, 0, 0]))
+    tracker.feed(nix_event(action="stop", id=1))
+
+    assert tracker.progress.bytes_done == 15
+    assert tracker.progress.bytes_expected == 20
+
+
+def test_progress_tracker_ignores_other_lines():
+    tracker = ProgressTracker()
+
+    assert not tracker.feed("building '/nix/store/x.drv'...")
+    assert not tracker.feed("@nix {not json")
+    assert not tracker.feed(nix_event(action="result", id=3, type=105, fields=[1, 2]))
+    assert tracker.snapshot() == BuildProgress()
+
+
+def test_progress_tracker_errors():
+    tracker = ProgressTracker()
+
+    tracker.feed(nix_event(action="msg", level=3, msg="evaluating"))
+    tracker.feed(nix_event(action="msg", level=0, msg="error: Package is broken"))
+
+    assert tracker.error_text() == "error: Package is broken"
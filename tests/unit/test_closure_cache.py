@@ -0,0 +1,76 @@
+from unittest.mock import patch
+
+import pytest
+from conftest import GLIBC, HELLO, LIBIDN
+
+import src.logic.core as logic
+from src.logic.cache import ClosureCache
+from src.logic.exceptions import PackageNotInstalledException
+from src.logic.interning import path_interner
+
+
+def test_get_missing(tmp_path):
+    cache = ClosureCache(tmp_path / "closures.sqlite")
+    assert cache.get(HELLO) is None
+
+
+def test_put_and_get(tmp_path):
+    cache = ClosureCache(tmp_path / "closures.sqlite")
+    cache.put(HELLO, {HELLO: 100, GLIBC: 1000})
+
+    closure = cache.get(HELLO)
+
+    assert closure is not None
+    assert closure.sizes == {HELLO: 100, GLIBC: 1000}
+    assert closure.closure_size == 1100
+    assert list(closure.ids) == sorted(closure.ids)
+    assert path_interner.lookup(closure.ids) == list(closure.sizes)
+
+
+def test_persistent(tmp_path):
+    ClosureCache(tmp_path / "closures.sqlite").put(HELLO, {HELLO: 100})
+
+    closure = ClosureCache(tmp_path / "closures.sqlite").get(HELLO)
+
+    assert closure is not None
+    assert closure.sizes == {HELLO: 100}
+
+
+def test_lru_eviction(tmp_path):
+    cache = ClosureCache(tmp_path / "closures.sqlite", max_entries=2)
+    cache.put(HELLO, {HELLO: 100})
+    cache.put(LIBIDN, {LIBIDN: 20})
+    cache.get(HELLO)
+    cache.put(GLIBC, {GLIBC: 1000})
+
+    reopened = ClosureCache(tmp_path / "closures.sqlite")
+    assert reopened.get(HELLO) is not None
+    assert reopened.get(LIBIDN) is None
+    assert reopened.get(GLIBC) is not None
+
+
+@pytest.mark.asyncio
+async def test_core_uses_cache(synthetic_store, closure_cache):
+    await logic.get_closure_size(synthetic_store, HELLO)
+
+    with patch("src.logic.core.closure_engine.get_closure") as mock_engine:
+        size = await logic.get_closure_size(synthetic_store, HELLO)
+
+        mock_engine.assert_not_called()
+        assert size == 1120
+        assert closure_cache.get(HELLO).closure_size == 1120
+
+
+@pytest.mark.asyncio
+async def test_core_cache_hit_checks_store(tmp_path, closure_cache):
+    closure_cache.put(HELLO, {HELLO: 100})
+
+    with pytest.raises(PackageNotInstalledException):
+        await logic.get_closure_size(tmp_path, HELLO)
+
+
+@pytest.mark.asyncio
+async def test_core_closure_ids(synthetic_store):
+    ids = await logic.get_closure_ids(synthetic_store, HELLO)
+
+    assert sorted(path_interner.lookup(ids)) == sorted([HELLO, LIBIDN, GLIBC])
@@ -0,0 +1,89 @@
+from unittest.mock import AsyncMock, patch
+
+import pytest
+
+from src.auth.schemas import User
+from src.logic.changes import ClosureChange, diff_closures, parse_store_path
+from src.services.stores import StoreService
+from src.store.schemas.package import PackageChange, VersionUpdate
+from src.store.schemas.store import Store as StoreSchema
+
+HASH = "a" * 32
+
+
+def store_path(name: str) -> str:
+    return f"/nix/store/{HASH}-{name}"
+
+
+@pytest.mark.parametrize(
+    "name, expected",
+    [
+        ("hello-2.12.1", ("hello", "2.12.1")),
+        ("glibc-2.39-52", ("glibc", "2.39-52")),
+        ("glibc-2.39-52-bin", ("glibc", "2.39-52")),
+        ("util-linux-minimal-2.39.3-lib", ("util-linux-minimal", "2.39.3")),
+        ("python3.11-numpy-1.26.4", ("python3.11-numpy", "1.26.4")),
+        ("bash-5.2p26", ("bash", "5.2p26")),
+        ("source", ("source", "")),
+        ("hook-setup", ("hook-setup", "")),
+    ],
+)
+def test_parse_store_path(name, expected):
+    assert parse_store_path(store_path(name)) == expected
+
+
+def test_diff_closures():
+    sizes_1 = {
+        store_path("hello-2.12.1"): 100_000,
+        store_path("glibc-2.39-52"): 1_000_000,
+        store_path("glibc-2.39-52-bin"): 50_000,
+        store_path("zlib-1.3"): 20_000,
+        store_path("tzdata-2024a"): 10_000,
+    }
+    sizes_2 = {
+        store_path("hello-2.12.1"): 100_000,
+        store_path("glibc-2.40-36"): 1_200_000,
+        store_path("zlib-1.3"): 21_000,
+        store_path("curl-8.7.1"): 300_000,
+        store_path("tzdata-2024a"): 30_000,
+    }
+
+    assert diff_closures(sizes_1, sizes_2) == [
+        ClosureChange("curl", (), ("8.7.1",), 300_000),
+        ClosureChange("glibc", ("2.39-52",), ("2.40-36",), 150_000),
+        ClosureChange("tzdata", (), (), 20_000),
+    ]
+
+
+def test_diff_closures_identical():
+    sizes = {store_path("hello-2.12.1"): 100}
+
+    assert diff_closures(sizes, dict(sizes)) == []
+
+
+@pytest.mark.asyncio
+async def test_get_closure_changes():
+    service = StoreService(lambda: None)  # type: ignore
+    service.get_store = AsyncMock(return_value=StoreSchema(id=1, name="", owner_id=1))
+    package_service = AsyncMock()
+    package_service.get_package_path.side_effect = ["/nix/store/1", "/nix/store/2"]
+    package_service.get_package_closure.return_value = None
+
+    with patch("src.services.stores.core_logic.get_closure_sizes") as mock_sizes:
+        mock_sizes.side_effect = [
+            {store_path("glibc-2.39-52"): 10_240},
+            {store_path("glibc-2.40-36"): 20_480},
+        ]
+
+        changes = await service.get_closure_changes(
+            "store1", "hello", "store2", "hello", User(id=1), package_service
+        )
+
+    assert changes == [
+        PackageChange(
+            package_name="glibc",
+            version_update=VersionUpdate(old="2.39-52", new="2.40-36"),
+            size_update="+10.0 KiB",
+            size_delta=10_240,
+        )
+    ]
@@ -0,0 +1,48 @@
+import sqlite3
+from pathlib import Path
+
+import pytest
+from conftest import CURL, GLIBC, HELLO, LIBIDN
+
+from src.logic import closure
+from src.logic.exceptions import NotValidPathException, UnknownStoreSchemaException
+
+
+def test_get_closure(synthetic_store):
+    result = closure.get_closure(synthetic_store, [HELLO])
+    assert result == {HELLO: 100, LIBIDN: 20, GLIBC: 1000}
+
+
+def test_get_closure_leaf(synthetic_store):
+    result = closure.get_closure(synthetic_store, [GLIBC])
+    assert result == {GLIBC: 1000}
+
+
+def test_get_closure_several_roots(synthetic_store):
+    result = closure.get_closure(synthetic_store, [HELLO, CURL])
+    assert set(result) == {HELLO, LIBIDN, GLIBC, CURL}
+
+
+def test_get_closure_size(synthetic_store):
+    assert closure.get_closure_size(synthetic_store, [HELLO]) == 1120
+
+
+def test_get_closure_not_valid(synthetic_store):
+    with pytest.raises(NotValidPathException):
+        closure.get_closure(synthetic_store, ["/nix/store/eeee-missing"])
+
+
+def test_get_closure_no_database(tmp_path: Path):
+    with pytest.raises(NotValidPathException):
+        closure.get_closure(tmp_path, [HELLO])
+
+
+def test_get_closure_unknown_schema(tmp_path: Path):
+    database = closure.get_database_path(tmp_path)
+    database.parent.mkdir(parents=True)
+    with sqlite3.connect(database) as connection:
+        connection.execute("CREATE TABLE ValidPaths (id integer, path text)")
+    connection.close()
+
+    with pytest.raises(UnknownStoreSchemaException):
+        closure.get_closure(tmp_path, [HELLO])
@@ -0,0 +1,102 @@
+import asyncio
+import os
+
+import pytest
+from sqlalchemy import select
+from sqlalchemy.exc import IntegrityError
+
+os.environ["DATABASE_URL"] = "sqlite+aiosqlite:///:memory:"
+
+from src.db.db import async_session_maker, create_db_and_tables, engine  # noqa: E402
+from src.repositories.stores import ClosureRepository  # noqa: E402
+from src.store.models.path import PackageClosure, Reference, StorePath  # noqa: E402
+
+HELLO = "/nix/store/aaaa-hello-2.12.1"
+GLIBC = "/nix/store/cccc-glibc-2.39-52"
+CURL = "/nix/store/dddd-curl-8.7.1"
+
+
+@pytest.fixture
+def repository():
+    asyncio.run(create_db_and_tables())
+
+    yield ClosureRepository()
+
+    asyncio.run(engine.dispose())
+
+
+async def get_store_paths() -> list[tuple[str, str, str, int]]:
+    async with async_session_maker() as session:
+        stmt = select(
+            StorePath.path, StorePath.name, StorePath.hash, StorePath.nar_size
+        ).order_by(StorePath.path)
+        return list((await session.execute(stmt)).tuples())
+
+
+async def get_references() -> int:
+    async with async_session_maker() as session:
+        return len((await session.execute(select(Reference))).all())
+
+
+@pytest.mark.asyncio
+async def test_add_closure(repository):
+    await repository.add_closure(1, {HELLO: 100, GLIBC: 1000}, [(HELLO, GLIBC)])
+    await repository.add_closure(2, {CURL: 300, GLIBC: 1000}, [(CURL, GLIBC)])
+
+    assert await repository.get_closure(1) == {HELLO: 100, GLIBC: 1000}
+    assert await repository.get_closure(2) == {CURL: 300, GLIBC: 1000}
+    assert await get_store_paths() == [
+        (HELLO, "hello-2.12.1", "aaaa", 100),
+        (GLIBC, "glibc-2.39-52", "cccc", 1000),
+        (CURL, "curl-8.7.1", "dddd", 300),
+    ]
+    assert await get_references() == 2
+
+
+@pytest.mark.asyncio
+async def test_copy_closure(repository):
+    await repository.add_closure(1, {HELLO: 100, GLIBC: 1000}, [(HELLO, GLIBC)])
+
+    await repository.copy_closure(1, 2)
+
+    assert await repository.get_closure(2) == {HELLO: 100, GLIBC: 1000}
+
+
+@pytest.mark.asyncio
+async def test_delete_closure(repository):
+    await repository.add_closure(1, {HELLO: 100, GLIBC: 1000}, [(HELLO, GLIBC)])
+    await repository.add_closure(2, {CURL: 300, GLIBC: 1000}, [(CURL, GLIBC)])
+
+    await repository.delete_closure(1)
+
+    assert await repository.get_closure(1) == {}
+    assert [path for path, *_ in await get_store_paths()] == [GLIBC, CURL]
+    assert await get_references() == 1
+
+
+@pytest.mark.asyncio
+async def test_delete_closures(repository):
+    await repository.add_closure(1, {HELLO: 100, GLIBC: 1000}, [(HELLO, GLIBC)])
+    await repository.add_closure(2, {CURL: 300, GLIBC: 1000}, [(CURL, GLIBC)])
+    await repository.add_closure(3, {GLIBC: 1000})
+
+    await repository.delete_closures([1, 2])
+
+    assert await repository.get_closure(3) == {GLIBC: 1000}
+    assert [path for path, *_ in await get_store_paths()] == [GLIBC]
+    assert await get_references() == 0
+
+
+@pytest.mark.asyncio
+async def test_add_closure_to_pruned_path(repository):
+    await repository.add_closure(1, {GLIBC: 1000})
+    async with async_session_maker() as session:
+        glibc_id = (
+            await session.execute(select(StorePath.id).where(StorePath.path == GLIBC))
+        ).scalar_one()
+    await repository.delete_closure(1)
+
+    with pytest.raises(IntegrityError):
+        async with async_session_maker() as session:
+            session.add(PackageClosure(package_id=2, path_id=glibc_id))
+            await session.commit()
@@ -218,6 +218,66 @@ def test_main_page_create_store_failure():
         mock_error.assert_called_once_with("Failed to create store")
 
 
+def test_main_page_clone_store():
+    def button_side_effect(*args, **kwargs):
+        return args[0] == "Clone store"
+
+    def text_input_side_effect(*args, **kwargs):
+        return "store_name"
+
+    with ExitStack() as stack:
+        mock_button = stack.enter_context(patch("src.frontend.st.button"))
+        mock_success = stack.enter_context(patch("src.frontend.st.success"))
+        mock_post = stack.enter_context(patch("src.frontend.requests.post"))
+        mock_session_state = stack.enter_context(patch("src.frontend.st.session_state"))
+        mock_text_input = stack.enter_context(patch("src.frontend.st.text_input"))
+
+        mock_button.side_effect = button_side_effect
+        mock_post.return_value.status_code = 200
+        cookies = {"fastapiusersauth", "token"}
+        mock_session_state.__getitem__.return_value = cookies
+        mock_text_input.side_effect = text_input_side_effect
+
+        main_page()
+
+        mock_post.assert_called_once_with(
+            f"{base_url}/store/store_name/clone/store_name",
+            cookies=cookies,
+            timeout=TIMEOUT,
+        )
+        mock_success.assert_called_once_with("Store cloned successfully!")
+
+
+def test_main_page_clone_store_failure():
+    def button_side_effect(*args, **kwargs):
+        return args[0] == "Clone store"
+
+    def text_input_side_effect(*args, **kwargs):
+        return "store_name"
+
+    with ExitStack() as stack:
+        mock_button = stack.enter_context(patch("src.frontend.st.button"))
+        mock_error = stack.enter_context(patch("src.frontend.st.error"))
+        mock_post = stack.enter_context(patch("src.frontend.requests.post"))
+        mock_session_state = stack.enter_context(patch("src.frontend.st.session_state"))
+        mock_text_input = stack.enter_context(patch("src.frontend.st.text_input"))
+
+        mock_button.side_effect = button_side_effect
+        mock_post.return_value.status_code = 400
+        cookies = {"fastapiusersauth", "token"}
+        mock_session_state.__getitem__.return_value = cookies
+        mock_text_input.side_effect = text_input_side_effect
+
+        main_page()
+
+        mock_post.assert_called_once_with(
+            f"{base_url}/store/store_name/clone/store_name",
+            cookies=cookies,
+            timeout=TIMEOUT,
+        )
+        mock_error.assert_called_once_with("Failed to clone store")
+
+
 def test_main_page_get_store():
     def button_side_effect(*args, **kwargs):
         if args[0] == "Get store":
@@ -367,7 +427,8 @@ def test_main_page_add_package():
         mock_text_input = stack.enter_context(patch("src.frontend.st.text_input"))
 
         mock_button.side_effect = button_side_effect
-        mock_post.return_value.status_code = 200
+        mock_post.return_value.status_code = 202
+        mock_post.return_value.json.return_value = {"id": 1}
         cookies = {"fastapiusersauth", "token"}
         mock_session_state.__getitem__.return_value = cookies
         mock_text_input.side_effect = text_input_side_effect
@@ -377,9 +438,9 @@ def test_main_page_add_package():
         mock_post.assert_called_once_with(
             f"{base_url}/store/store_name/package/package_name",
             cookies=cookies,
-            timeout=None,
+            timeout=TIMEOUT,
         )
-        mock_success.assert_called_once_with("Package added successfully!")
+        mock_success.assert_called_once_with("Package installation queued as job 1!")
 
 
 def test_main_page_add_package_failure():
@@ -412,7 +473,7 @@ def test_main_page_add_package_failure():
         mock_post.assert_called_once_with(
             f"{base_url}/store/store_name/package/package_name",
             cookies=cookies,
-            timeout=None,
+            timeout=TIMEOUT,
         )
         mock_error.assert_called_once_with("Failed to add package")
 
@@ -441,6 +502,38 @@ def test_main_page_add_package_warning():
         )
 
 
+def test_main_page_get_job():
+    def button_side_effect(*args, **kwargs):
+        return args[0] == "Get job"
+
+    with ExitStack() as stack:
+        mock_button = stack.enter_context(patch("src.frontend.st.button"))
+        mock_write = stack.enter_context(patch("src.frontend.st.write"))
+        mock_get = stack.enter_context(patch("src.frontend.requests.get"))
+        mock_session_state = stack.enter_context(patch("src.frontend.st.session_state"))
+        mock_text_input = stack.enter_context(patch("src.frontend.st.text_input"))
+
+        mock_button.side_effect = button_side_effect
+        mock_get.return_value.status_code = 200
+        mock_get.return_value.json.return_value = {
+            "id": 1,
+            "state": "running",
+            "store_name": "store_name",
+            "package_name": "package_name",
+            "error": None,
+        }
+        cookies = {"fastapiusersauth", "token"}
+        mock_session_state.__getitem__.return_value = cookies
+        mock_text_input.return_value = "1"
+
+        main_page()
+
+        mock_get.assert_called_once_with(
+            f"{base_url}/jobs/1", cookies=cookies, timeout=TIMEOUT
+        )
+        mock_write.assert_any_call("Job 1: running")
+
+
 def test_main_page_delete_package():
     def button_side_effect(*args, **kwargs):
         if args[0] == "Delete package":
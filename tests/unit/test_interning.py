@@ -0,0 +1,20 @@
+from array import array
+
+from src.logic.interning import PathInterner, difference
+
+
+def test_sorted_ids():
+    interner = PathInterner()
+    interner.intern(["c", "a"])
+
+    ids = interner.sorted_ids(["a", "b", "c"])
+
+    assert ids == array("I", [0, 1, 2])
+    assert interner.lookup(ids) == ["c", "a", "b"]
+
+
+def test_difference():
+    assert difference(array("I", [1, 3, 5, 7]), array("I", [3, 4, 7])) == array(
+        "I", [1, 5]
+    )
+    assert difference(array("I"), array("I", [1])) == array("I")
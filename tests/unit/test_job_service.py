@@ -0,0 +1,251 @@
+import asyncio
+import os
+from unittest.mock import AsyncMock, patch
+
+import pytest
+from conftest import HELLO
+from fastapi import HTTPException
+
+os.environ["DATABASE_URL"] = "sqlite+aiosqlite:///:memory:"
+
+from src.auth.schemas import User  # noqa: E402
+from src.db.db import create_db_and_tables, engine  # noqa: E402
+from src.jobs.schemas.job import InstallResult, JobState  # noqa: E402
+from src.jobs.workers import JobWorkerPool  # noqa: E402
+from src.logic.progress import BuildProgress  # noqa: E402
+from src.repositories.jobs import JobRepository  # noqa: E402
+from src.repositories.stores import PackageRepository  # noqa: E402
+from src.services.jobs import JobService  # noqa: E402
+from src.store.schemas.package import Package  # noqa: E402
+from src.utils.unitofwork import UnitOfWork  # noqa: E402
+
+
+@pytest.fixture
+def job_service():
+    asyncio.run(create_db_and_tables())
+
+    yield JobService(JobRepository)  # type: ignore
+
+    asyncio.run(engine.dispose())
+
+
+def installed_package():
+    return Package(
+        id=1,
+        name="hello",
+        store_id=1,
+        closure={"packages": [HELLO], "sizes": {HELLO: 100}},
+        path=HELLO,
+        closure_size=100,
+    )
+
+
+@pytest.mark.asyncio
+async def test_add_install_job(job_service):
+    job = await job_service.add_install_job("store", "hello", User(id=1))
+
+    assert job.kind == "install"
+    assert job.state == JobState.PENDING
+    assert job.started_at is None
+    assert await job_service.get_job(job.id, User(id=1)) == job
+
+
+@pytest.mark.asyncio
+async def test_get_job_other_user(job_service):
+    job = await job_service.add_install_job("store", "hello", User(id=1))
+
+    with pytest.raises(HTTPException) as exc:
+        await job_service.get_job(job.id, User(id=2))
+
+    assert exc.value.status_code == 404
+
+
+@pytest.mark.asyncio
+async def test_claim_next_job(job_service):
+    job = await job_service.add_install_job("store", "hello", User(id=1))
+
+    claimed = await job_service.claim_next_job()
+
+    assert claimed.id == job.id
+    assert claimed.state == JobState.RUNNING
+    assert claimed.started_at is not None
+    assert await job_service.claim_next_job() is None
+
+
+@pytest.mark.asyncio
+async def test_claim_next_job_oldest_first(job_service):
+    jobs = [
+        await job_service.add_install_job("store", name, User(id=1))
+        for name in ("hello", "curl", "glibc")
+    ]
+
+    claimed = [await job_service.claim_next_job() for _ in jobs]
+
+    assert [job.id for job in claimed] == [job.id for job in jobs]
+
+
+@pytest.mark.asyncio
+async def test_requeue_running_jobs(job_service):
+    job = await job_service.add_install_job("store", "hello", User(id=1))
+    await job_service.claim_next_job()
+
+    assert await job_service.requeue_running_jobs() == 1
+
+    job = await job_service.get_job(job.id, User(id=1))
+    assert job.state == JobState.PENDING
+    assert job.started_at is None
+
+
+@pytest.mark.asyncio
+async def test_run_job(job_service):
+    await job_service.add_install_job("store", "hello", User(id=1))
+    job = await job_service.claim_next_job()
+
+    store_service = AsyncMock()
+    store_service.add_package.return_value = installed_package()
+
+    job = await job_service.run_job(job, lambda _: store_service, lambda _: AsyncMock())
+
+    assert job.state == JobState.SUCCEEDED
+    assert job.finished_at is not None
+    assert job.result == InstallResult(package_id=1, path=HELLO, closure_size=100)
+    assert job.error is None
+
+
+@pytest.mark.asyncio
+async def test_run_job_failed(job_service):
+    await job_service.add_install_job("store", "hello", User(id=1))
+    job = await job_service.claim_next_job()
+
+    store_service = AsyncMock()
+    store_service.add_package.side_effect = HTTPException(
+        status_code=400, detail="Package hello is marked as broken!"
+    )
+
+    job = await job_service.run_job(job, lambda _: store_service, lambda _: AsyncMock())
+
+    assert job.state == JobState.FAILED
+    assert job.result is None
+    assert job.error == "Package hello is marked as broken!"
+
+
+@pytest.mark.asyncio
+async def test_run_job_rolls_back_failed_install(job_service):
+    await job_service.add_install_job("store", "hello", User(id=1))
+    job = await job_service.claim_next_job()
+
+    def store_service_factory(unit_of_work: UnitOfWork):
+        async def add_package(*args):
+            await PackageRepository(unit_of_work).add_one(
+                {"name": "hello", "store_id": 1}
+            )
+            raise RuntimeError()
+
+        store_service = AsyncMock()
+        store_service.add_package.side_effect = add_package
+        return store_service
+
+    job = await job_service.run_job(job, store_service_factory, lambda _: AsyncMock())
+
+    assert job.state == JobState.FAILED
+    assert await PackageRepository().get_one({"name": "hello"}) is None
+
+
+@pytest.mark.asyncio
+async def test_stream_job_events(job_service):
+    await job_service.add_install_job("store", "hello", User(id=1))
+    job = await job_service.claim_next_job()
+
+    async def add_package(*args):
+        on_progress = args[-1]
+        on_progress(BuildProgress(paths_done=1, paths_expected=3))
+        await asyncio.sleep(0.05)
+        return installed_package()
+
+    store_service = AsyncMock()
+    store_service.add_package.side_effect = add_package
+
+    events = await job_service.stream_job_events(job.id, User(id=1))
+    running = asyncio.create_task(
+        job_service.run_job(job, lambda _: store_service, lambda _: AsyncMock())
+    )
+    frames = [frame async for frame in events]
+    await running
+
+    assert frames[0].startswith("event: progress\n")
+    assert '"paths_remaining": 2' in frames[0]
+    assert frames[-1].startswith("event: succeeded\n")
+
+
+@pytest.mark.asyncio
+async def test_stream_job_events_finished(job_service):
+    await job_service.add_install_job("store", "hello", User(id=1))
+    job = await job_service.claim_next_job()
+    store_service = AsyncMock()
+    store_service.add_package.return_value = installed_package()
+    await job_service.run_job(job, lambda _: store_service, lambda _: AsyncMock())
+
+    events = await job_service.stream_job_events(job.id, User(id=1))
+    frames = [frame async for frame in events]
+
+    assert len(frames) == 1
+    assert frames[0].startswith("event: succeeded\n")
+
+
+@pytest.mark.asyncio
+async def test_worker_pool_resumes_jobs(job_service):
+    interrupted = await job_service.add_install_job("store", "hello", User(id=1))
+    await job_service.claim_next_job()
+    pending = await job_service.add_install_job("store", "curl", User(id=1))
+
+    store_service = AsyncMock()
+    store_service.add_package.return_value = installed_package()
+
+    with (
+        patch("src.jobs.workers.store_service_dependency", lambda _: store_service),
+        patch("src.jobs.workers.package_service_dependency", AsyncMock),
+    ):
+        pool = JobWorkerPool(workers=2)
+        await pool.start()
+        try:
+            for _ in range(100):
+                jobs = [
+                    await job_service.get_job(job.id, User(id=1))
+                    for job in (interrupted, pending)
+                ]
+                if all(job.state == JobState.SUCCEEDED for job in jobs):
+                    break
+                await asyncio.sleep(0.01)
+        finally:
+            await pool.stop()
+
+    assert [job.state for job in jobs] == [JobState.SUCCEEDED] * 2
+    assert store_service.add_package.call_count == 2
+
+
+@pytest.mark.asyncio
+async def test_worker_pool_survives_failing_jobs(job_service):
+    first = await job_service.add_install_job("store", "hello", User(id=1))
+    second = await job_service.add_install_job("store", "curl", User(id=1))
+
+    with (
+        patch.object(JobService, "run_job", side_effect=RuntimeError),
+        patch("src.jobs.workers.store_service_dependency", AsyncMock),
+        patch("src.jobs.workers.package_service_dependency", AsyncMock),
+    ):
+        pool = JobWorkerPool(workers=1)
+        await pool.start()
+        try:
+            for _ in range(100):
+                jobs = [
+                    await job_service.get_job(job.id, User(id=1))
+                    for job in (first, second)
+                ]
+                if all(job.state == JobState.FAILED for job in jobs):
+                    break
+                await asyncio.sleep(0.01)
+        finally:
+            await pool.stop()
+
+    assert [job.state for job in jobs] == [JobState.FAILED] * 2
+    assert [job.error for job in jobs] == ["Unexpected error"] * 2
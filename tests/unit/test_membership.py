@@ -0,0 +1,130 @@
+from unittest.mock import AsyncMock, patch
+
+import pytest
+from conftest import CURL, GLIBC, HELLO, LIBIDN, SYNTHETIC_PATHS, create_store_database
+from fastapi import HTTPException
+
+from src.auth.schemas import User
+from src.logic.membership import MembershipIndex, PathInterner, group_by_membership
+from src.services.stores import StoreService
+from src.store.schemas.store import Store as StoreSchema
+
+ZLIB = "/nix/store/ffff-zlib-1.3"
+
+
+def test_interner_round_trip():
+    interner = PathInterner()
+    paths = [f"/nix/store/{index:04}-path" for index in range(100)]
+
+    bitmap = interner.bitmap(paths[::3])
+
+    assert interner.paths(bitmap) == paths[::3]
+    assert interner.intern([paths[3]]) == [1]
+    assert len(interner) == 34
+
+
+def test_interner_empty():
+    interner = PathInterner()
+
+    assert interner.bitmap([]) == 0
+    assert interner.paths(0) == []
+
+
+def test_membership_index_reuses_bitmaps():
+    index = MembershipIndex()
+    paths = frozenset({HELLO, GLIBC})
+
+    bitmap = index.bitmap("store", paths)
+
+    assert index.bitmap("store", paths) is bitmap
+    assert index.bitmap("store", frozenset({HELLO})) != bitmap
+
+
+def test_membership_index_evicts_least_recently_used():
+    index = MembershipIndex(PathInterner(), max_stores=2)
+    hello, curl, glibc = frozenset({HELLO}), frozenset({CURL}), frozenset({GLIBC})
+    index.bitmap("hello", hello)
+    index.bitmap("curl", curl)
+    index.bitmap("hello", hello)
+    index.bitmap("glibc", glibc)
+
+    with patch.object(index.interner, "bitmap", wraps=index.interner.bitmap) as spy:
+        index.bitmap("hello", hello)
+        spy.assert_not_called()
+
+        index.bitmap("curl", curl)
+        spy.assert_called_once_with(curl)
+
+
+def test_group_by_membership():
+    interner = PathInterner()
+    bitmaps = [
+        interner.bitmap([HELLO, GLIBC, CURL]),
+        interner.bitmap([GLIBC, CURL]),
+        interner.bitmap([GLIBC, ZLIB]),
+    ]
+
+    groups = {
+        stores: interner.paths(group) for stores, group in group_by_membership(bitmaps)
+    }
+
+    assert groups == {
+        (0,): [HELLO],
+        (0, 1): [CURL],
+        (0, 1, 2): [GLIBC],
+        (2,): [ZLIB],
+    }
+
+
+def test_group_by_membership_empty():
+    assert group_by_membership([0, 0]) == []
+
+
+@pytest.fixture
+def stores(tmp_path):
+    service = StoreService(lambda: None)  # type: ignore
+    service.stores_path = tmp_path
+    service.get_store = AsyncMock(return_value=StoreSchema(id=1, name="", owner_id=1))
+    create_store_database(tmp_path / "1" / "store1", SYNTHETIC_PATHS)
+    create_store_database(
+        tmp_path / "1" / "store2", {GLIBC: (1000, [GLIBC]), ZLIB: (50, [GLIBC])}
+    )
+    create_store_database(tmp_path / "1" / "store3", {GLIBC: (1000, [GLIBC])})
+    return service
+
+
+@pytest.mark.asyncio
+async def test_compare_stores(stores):
+    comparison = await stores.compare_stores(["store1", "store2", "store3"], User(id=1))
+
+    assert comparison.stores == ["store1", "store2", "store3"]
+    assert [group.model_dump() for group in comparison.groups] == [
+        {"stores": ["store1", "store2", "store3"], "count": 1, "paths": [GLIBC]},
+        {"stores": ["store1"], "count": 3, "paths": [HELLO, LIBIDN, CURL]},
+        {"stores": ["store2"], "count": 1, "paths": [ZLIB]},
+    ]
+
+
+@pytest.mark.asyncio
+async def test_compare_stores_summary(stores):
+    comparison = await stores.compare_stores(
+        ["store1", "store2", "store1"], User(id=1), summary=True
+    )
+
+    assert comparison.stores == ["store1", "store2"]
+    assert [
+        (group.stores, group.count, group.paths) for group in comparison.groups
+    ] == [
+        (["store1", "store2"], 1, None),
+        (["store1"], 3, None),
+        (["store2"], 1, None),
+    ]
+
+
+@pytest.mark.asyncio
+async def test_compare_stores_missing_locally(stores):
+    with pytest.raises(HTTPException) as exc:
+        await stores.compare_stores(["store1", "store4"], User(id=1))
+
+    assert exc.value.status_code == 400
+    assert exc.value.detail == "Store store4 does not exist!"
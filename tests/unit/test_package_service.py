@@ -13,6 +13,7 @@ from src.logic.exceptions import (
 )
 from src.services.stores import PackageService
 from src.store.models.package import Package
+from src.store.models.resolution import Resolution
 
 
 @pytest.fixture
@@ -20,7 +21,11 @@ def package_service():
     with patch(
         "src.services.stores.AbstractRepository", new_callable=MagicMock
     ) as mock_repo:
-        service = PackageService(mock_repo)
+        service = PackageService(mock_repo, MagicMock(), MagicMock())
+        service.resolution_repository.get_one = AsyncMock(return_value=None)
+        service.resolution_repository.add_one = AsyncMock(return_value=1)
+        service.closure_repository = AsyncMock()
+        service.closure_repository.get_closure.return_value = {}
         yield service
 
 
@@ -28,19 +33,149 @@ def package_service():
 async def test_add_package(package_service):
     service = package_service
 
-    with patch("src.services.stores.core_logic.install_package") as mock_install:
-        mock_install.return_value = None
+    with (
+        patch("src.services.stores.core_logic.install_package") as mock_install,
+        patch("src.services.stores.core_logic.get_nixpkgs_revision") as mock_revision,
+        patch("src.services.stores.core_logic.get_outputs_closure_sizes") as mock_sizes,
+        patch("src.services.stores.core_logic.copy_to_binary_cache") as mock_copy,
+    ):
+        outputs = {
+            "out": "/nix/store/hash-package",
+            "man": "/nix/store/hash-package-man",
+        }
+        mock_install.return_value = outputs
+        mock_revision.return_value = "rev"
+        mock_sizes.return_value = {
+            "/nix/store/hash-package": 10,
+            "/nix/store/hash-glibc": 100,
+        }
 
         service.repository.add_one = AsyncMock()
         service.repository.add_one.return_value = 1
 
-        package_id = await service.add_package(Path("store"), "package", 1)
+        package = await service.add_package(Path("store"), "package", 1)
 
-        assert package_id == 1
+        assert package.id == 1
+        assert package.path == "/nix/store/hash-package"
+        assert package.outputs == outputs
+        assert package.closure_size == 110
+        assert package.closure.sizes == mock_sizes.return_value
+        assert set(package.closure.packages) == set(mock_sizes.return_value)
+        mock_sizes.assert_called_once_with(Path("store"), list(outputs.values()))
+        mock_copy.assert_called_once_with(Path("store"), list(outputs.values()))
         service.repository.add_one.assert_called_once_with(
-            {"name": "package", "store_id": 1}
+            {
+                "name": "package",
+                "store_id": 1,
+                "path": "/nix/store/hash-package",
+                "outputs": outputs,
+                "closure_size": 110,
+            }
+        )
+        service.resolution_repository.add_one.assert_called_once_with(
+            {
+                "revision": "rev",
+                "attribute": "package",
+                "path": "/nix/store/hash-package",
+            }
+        )
+        mock_install.assert_called_once_with(Path("store"), "package", "rev", None)
+        service.closure_repository.add_closure.assert_called_once_with(
+            1, mock_sizes.return_value, []
+        )
+
+
+@pytest.mark.asyncio
+async def test_add_package_without_out_output(package_service):
+    service = package_service
+
+    with (
+        patch("src.services.stores.core_logic.install_package") as mock_install,
+        patch("src.services.stores.core_logic.get_nixpkgs_revision") as mock_revision,
+        patch("src.services.stores.core_logic.get_outputs_closure_sizes") as mock_sizes,
+        patch("src.services.stores.core_logic.copy_to_binary_cache"),
+    ):
+        outputs = {
+            "bin": "/nix/store/hash-package-bin",
+            "lib": "/nix/store/hash-package-lib",
+        }
+        mock_install.return_value = outputs
+        mock_revision.return_value = "rev"
+        mock_sizes.return_value = {
+            "/nix/store/hash-package-bin": 10,
+            "/nix/store/hash-package-lib": 20,
+        }
+        service.repository.add_one = AsyncMock()
+        service.repository.add_one.return_value = 1
+
+        package = await service.add_package(Path("store"), "package", 1)
+
+        assert package.path == "/nix/store/hash-package-bin"
+        assert package.closure_size == 30
+        mock_sizes.assert_called_once_with(Path("store"), list(outputs.values()))
+
+
+@pytest.mark.asyncio
+async def test_resolve_package_cached(package_service):
+    service = package_service
+    service.resolution_repository.get_one.return_value = [
+        Resolution(revision="rev", attribute="package", path="/nix/store/hash-package")
+    ]
+
+    with (
+        patch("src.services.stores.core_logic.resolve_package") as mock_resolve,
+        patch("src.services.stores.core_logic.get_nixpkgs_revision") as mock_revision,
+    ):
+        mock_revision.return_value = "rev"
+
+        path = await service.resolve_package("package")
+
+        assert path == "/nix/store/hash-package"
+        mock_resolve.assert_not_called()
+        service.resolution_repository.get_one.assert_called_once_with(
+            {"revision": "rev", "attribute": "package"}
         )
-        mock_install.assert_called_once_with(Path("store"), "package")
+
+
+@pytest.mark.asyncio
+async def test_resolve_package(package_service):
+    service = package_service
+
+    with (
+        patch("src.services.stores.core_logic.resolve_package") as mock_resolve,
+        patch("src.services.stores.core_logic.get_nixpkgs_revision") as mock_revision,
+    ):
+        mock_revision.return_value = "rev"
+        mock_resolve.return_value = "/nix/store/hash-package"
+
+        path = await service.resolve_package("package")
+
+        assert path == "/nix/store/hash-package"
+        mock_resolve.assert_called_once_with("package", "rev")
+        service.resolution_repository.add_one.assert_called_once_with(
+            {
+                "revision": "rev",
+                "attribute": "package",
+                "path": "/nix/store/hash-package",
+            }
+        )
+
+
+@pytest.mark.asyncio
+async def test_resolve_package_attribute_not_provided(package_service):
+    service = package_service
+
+    with (
+        patch("src.services.stores.core_logic.resolve_package") as mock_resolve,
+        patch("src.services.stores.core_logic.get_nixpkgs_revision") as mock_revision,
+    ):
+        mock_revision.return_value = "rev"
+        mock_resolve.side_effect = AttributeNotProvidedException
+
+        with pytest.raises(HTTPException) as exc:
+            await service.resolve_package("package")
+
+        assert exc.value.status_code == 400
 
 
 @pytest.mark.asyncio
@@ -147,18 +282,87 @@ async def test_get_package(package_service):
     service.repository.get_one.return_value = [
         Package(id=1, name="package", store_id=1)
     ]
+    service.closure_repository.get_closure.return_value = {"/nix/store/hash-a": 10}
 
     package = await service.get_package("package", 1)
 
     assert package.id == 1
     assert package.name == "package"
     assert package.store_id == 1
+    assert package.closure.packages == ["/nix/store/hash-a"]
+    assert package.closure.sizes == {"/nix/store/hash-a": 10}
+    service.closure_repository.get_closure.assert_called_once_with(1)
 
     service.repository.get_one.assert_called_once_with(
         {"name": "package", "store_id": 1}
     )
 
 
+@pytest.mark.asyncio
+async def test_get_package_path_none(package_service):
+    service = package_service
+
+    service.repository.get_one = AsyncMock()
+    service.repository.get_one.return_value = None
+
+    path = await service.get_package_path("package", 1)
+
+    assert path is None
+
+
+@pytest.mark.asyncio
+async def test_get_package_path(package_service):
+    service = package_service
+
+    service.repository.get_one = AsyncMock()
+    service.repository.get_one.return_value = [
+        Package(id=1, name="package", store_id=1, path="/nix/store/hash-package")
+    ]
+
+    path = await service.get_package_path("package", 1)
+
+    assert path == "/nix/store/hash-package"
+    service.repository.get_one.assert_called_once_with(
+        {"name": "package", "store_id": 1}
+    )
+
+
+@pytest.mark.asyncio
+async def test_copy_packages(package_service):
+    service = package_service
+
+    service.repository.get_all = AsyncMock()
+    service.repository.get_all.return_value = [
+        [
+            Package(
+                id=1,
+                name="package",
+                store_id=1,
+                path="/nix/store/hash-package",
+                outputs={"out": "/nix/store/hash-package"},
+                closure_size=10,
+            )
+        ]
+    ]
+    service.repository.add_many = AsyncMock(return_value=[3])
+
+    await service.copy_packages(1, 2)
+
+    service.repository.get_all.assert_called_once_with({"store_id": 1})
+    service.repository.add_many.assert_called_once_with(
+        [
+            {
+                "name": "package",
+                "store_id": 2,
+                "path": "/nix/store/hash-package",
+                "outputs": {"out": "/nix/store/hash-package"},
+                "closure_size": 10,
+            }
+        ]
+    )
+    service.closure_repository.copy_closure.assert_called_once_with(1, 3)
+
+
 @pytest.mark.asyncio
 async def test_delete_package_none(package_service):
     service = package_service
@@ -197,3 +401,33 @@ async def test_delete_package(package_service):
     service.repository.delete.assert_called_once_with(
         {"name": "package", "store_id": 1}
     )
+    service.closure_repository.delete_closure.assert_called_once_with(1)
+
+
+@pytest.mark.asyncio
+async def test_delete_packages(package_service):
+    service = package_service
+
+    service.repository.get_all = AsyncMock()
+    service.repository.get_all.return_value = [MagicMock(id=1), MagicMock(id=2)]
+    service.repository.delete_many = AsyncMock()
+
+    await service.delete_packages(1)
+
+    service.repository.get_all.assert_called_once_with({"store_id": 1}, columns=["id"])
+    service.closure_repository.delete_closures.assert_called_once_with([1, 2])
+    service.repository.delete_many.assert_called_once_with("store_id", [1])
+
+
+@pytest.mark.asyncio
+async def test_has_package(package_service):
+    service = package_service
+
+    service.repository.get_one = AsyncMock()
+    service.repository.get_one.return_value = None
+
+    assert not await service.has_package("package", 1)
+    service.repository.get_one.assert_called_once_with(
+        {"name": "package", "store_id": 1}
+    )
+    service.closure_repository.get_closure.assert_not_called()
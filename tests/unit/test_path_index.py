@@ -0,0 +1,128 @@
+import os
+import sqlite3
+from unittest.mock import patch
+
+import pytest
+from conftest import CURL, GLIBC, HELLO, LIBIDN, SYNTHETIC_PATHS
+
+from src.logic import closure as closure_engine
+from src.logic.closure import get_database_path
+from src.logic.paths import PathIndex
+
+EXTRA = "/nix/store/eeee-extra-1.0"
+
+
+def register(store, path):
+    with sqlite3.connect(get_database_path(store)) as connection:
+        connection.execute(
+            "INSERT INTO ValidPaths (path, hash, registrationTime, narSize) "
+            "VALUES (?, 'sha256:0', 0, 1)",
+            (path,),
+        )
+    connection.close()
+    (store / path.lstrip("/")).mkdir()
+
+
+def unregister(store, path):
+    with sqlite3.connect(get_database_path(store)) as connection:
+        connection.execute("DELETE FROM ValidPaths WHERE path = ?", (path,))
+    connection.close()
+    (store / path.lstrip("/")).rmdir()
+
+
+def bump_stamp(store):
+    directory = store / "nix/store"
+    stat = directory.stat()
+    os.utime(directory, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000))
+
+
+@pytest.mark.asyncio
+async def test_get_paths(synthetic_store):
+    index = PathIndex()
+
+    paths = await index.get(synthetic_store)
+
+    assert paths == set(SYNTHETIC_PATHS)
+
+
+@pytest.mark.asyncio
+async def test_get_paths_served_from_memory(synthetic_store):
+    index = PathIndex()
+    await index.get(synthetic_store)
+
+    with patch.object(closure_engine, "get_valid_paths") as mock_get_valid_paths:
+        paths = await index.get(synthetic_store)
+
+    assert paths == set(SYNTHETIC_PATHS)
+    mock_get_valid_paths.assert_not_called()
+
+
+@pytest.mark.asyncio
+async def test_get_paths_incremental(synthetic_store):
+    index = PathIndex()
+    await index.get(synthetic_store)
+
+    register(synthetic_store, EXTRA)
+    bump_stamp(synthetic_store)
+
+    with patch.object(
+        closure_engine, "get_valid_paths", wraps=closure_engine.get_valid_paths
+    ) as mock_get_valid_paths:
+        paths = await index.get(synthetic_store)
+
+    assert paths == {*SYNTHETIC_PATHS, EXTRA}
+    mock_get_valid_paths.assert_called_once_with(synthetic_store, len(SYNTHETIC_PATHS))
+
+
+@pytest.mark.asyncio
+async def test_get_paths_removed_outside_service(synthetic_store):
+    index = PathIndex()
+    await index.get(synthetic_store)
+
+    unregister(synthetic_store, CURL)
+    bump_stamp(synthetic_store)
+
+    assert await index.get(synthetic_store) == {HELLO, LIBIDN, GLIBC}
+
+
+@pytest.mark.asyncio
+async def test_discard(synthetic_store):
+    index = PathIndex()
+    await index.get(synthetic_store)
+
+    unregister(synthetic_store, CURL)
+    bump_stamp(synthetic_store)
+    index.discard(synthetic_store, [CURL])
+
+    with patch.object(
+        closure_engine, "get_valid_paths", wraps=closure_engine.get_valid_paths
+    ) as mock_get_valid_paths:
+        assert await index.get(synthetic_store) == {HELLO, LIBIDN, GLIBC}
+
+    mock_get_valid_paths.assert_called_once()
+
+
+@pytest.mark.asyncio
+async def test_get_paths_without_database(tmp_path):
+    store = tmp_path / "store"
+    (store / "nix/store/hash-package").mkdir(parents=True)
+    index = PathIndex()
+
+    assert await index.get(store) == {"/nix/store/hash-package"}
+
+
+@pytest.mark.asyncio
+async def test_evicts_least_recently_used(synthetic_store, tmp_path):
+    store = tmp_path / "store"
+    (store / "nix/store").mkdir(parents=True)
+    index = PathIndex(max_stores=1)
+
+    await index.get(synthetic_store)
+    await index.get(store)
+
+    with patch.object(
+        closure_engine, "get_valid_paths", wraps=closure_engine.get_valid_paths
+    ) as mock_get_valid_paths:
+        await index.get(synthetic_store)
+
+    mock_get_valid_paths.assert_called_once_with(synthetic_store)
@@ -0,0 +1,119 @@
+import json
+
+import pytest
+from conftest import CURL, GLIBC, HELLO, LIBIDN, SYNTHETIC_PATHS, create_store_database
+from fastapi import HTTPException
+
+from src.auth.schemas import User
+from src.logic.diff import (
+    ABSENT_IN_STORE_1,
+    ABSENT_IN_STORE_2,
+    DifferenceEntry,
+    iter_store_paths,
+    merge_difference,
+)
+from src.services.stores import StoreService
+
+OTHER_PATHS = {
+    GLIBC: (1000, [GLIBC]),
+    "/nix/store/ffff-zlib-1.3": (50, [GLIBC]),
+}
+
+
+@pytest.fixture
+def stores(tmp_path):
+    service = StoreService(lambda: None)  # type: ignore
+    service.stores_path = tmp_path
+    create_store_database(tmp_path / "1" / "store1", SYNTHETIC_PATHS)
+    create_store_database(tmp_path / "1" / "store2", OTHER_PATHS)
+    return service
+
+
+def test_merge_difference():
+    paths_1 = [("a", 1), ("b", 2), ("d", 4)]
+    paths_2 = [("b", 2), ("c", 3), ("e", 5)]
+
+    assert list(merge_difference(paths_1, paths_2)) == [
+        DifferenceEntry(ABSENT_IN_STORE_2, "a", 1),
+        DifferenceEntry(ABSENT_IN_STORE_1, "c", 3),
+        DifferenceEntry(ABSENT_IN_STORE_2, "d", 4),
+        DifferenceEntry(ABSENT_IN_STORE_1, "e", 5),
+    ]
+
+
+def test_merge_difference_empty():
+    assert list(merge_difference([], [("a", 1)])) == [
+        DifferenceEntry(ABSENT_IN_STORE_1, "a", 1)
+    ]
+    assert list(merge_difference([], [])) == []
+
+
+def test_iter_store_paths(synthetic_store):
+    assert list(iter_store_paths(synthetic_store, after=LIBIDN)) == [
+        (GLIBC, 1000),
+        (CURL, 300),
+    ]
+
+
+def test_iter_store_paths_without_database(tmp_path):
+    for name in ("b-two", "a-one"):
+        (tmp_path / "nix/store" / name).mkdir(parents=True)
+
+    assert list(iter_store_paths(tmp_path)) == [
+        ("/nix/store/a-one", 0),
+        ("/nix/store/b-two", 0),
+    ]
+
+
+@pytest.mark.asyncio
+async def test_get_paths_difference_page(stores):
+    first = await stores.get_paths_difference_page(
+        "store1", "store2", User(id=1), None, 2
+    )
+
+    assert first.absent_in_store_1 == []
+    assert first.absent_in_store_2 == [HELLO, LIBIDN]
+    assert first.next_cursor == LIBIDN
+
+    second = await stores.get_paths_difference_page(
+        "store1", "store2", User(id=1), first.next_cursor, 2
+    )
+
+    assert second.absent_in_store_1 == ["/nix/store/ffff-zlib-1.3"]
+    assert second.absent_in_store_2 == [CURL]
+    assert second.next_cursor is None
+
+
+@pytest.mark.asyncio
+async def test_get_paths_difference_summary(stores):
+    summary = await stores.get_paths_difference_summary("store1", "store2", User(id=1))
+
+    assert summary.absent_in_store_1.model_dump() == {"count": 1, "bytes": 50}
+    assert summary.absent_in_store_2.model_dump() == {"count": 3, "bytes": 420}
+
+
+@pytest.mark.asyncio
+async def test_stream_paths_difference(stores):
+    lines = await stores.stream_paths_difference("store1", "store2", User(id=1), None)
+
+    entries = [
+        json.loads(line)
+        for chunk in [c async for c in lines]
+        for line in chunk.splitlines()
+    ]
+
+    assert entries == [
+        {"side": ABSENT_IN_STORE_2, "path": HELLO},
+        {"side": ABSENT_IN_STORE_2, "path": LIBIDN},
+        {"side": ABSENT_IN_STORE_2, "path": CURL},
+        {"side": ABSENT_IN_STORE_1, "path": "/nix/store/ffff-zlib-1.3"},
+    ]
+
+
+@pytest.mark.asyncio
+async def test_stream_paths_difference_store_does_not_exist(stores):
+    with pytest.raises(HTTPException) as exc:
+        await stores.stream_paths_difference("store1", "store3", User(id=1), None)
+
+    assert exc.value.status_code == 400
+    assert exc.value.detail == "Store store3 does not exist!"
@@ -0,0 +1,253 @@
+import sqlite3
+from unittest.mock import AsyncMock, patch
+
+import pytest
+from conftest import CURL, GLIBC, HELLO, LIBIDN, SYNTHETIC_PATHS
+from fastapi import HTTPException
+
+from src.auth.schemas import User
+from src.logic import closure as closure_engine
+from src.logic import core as core_logic
+from src.logic.closure import get_database_path
+from src.logic.exceptions import NotValidPathException
+from src.logic.graph import ReferenceGraph, ReferenceGraphCache
+from src.services.stores import StoreService
+from src.store.schemas.package import Package
+from src.store.schemas.store import Store as StoreSchema
+
+
+def diamond() -> ReferenceGraph:
+    # root -> a -> target, root -> b -> c -> target, root -> c
+    return ReferenceGraph(
+        ["root", "a", "b", "c", "target"],
+        [1, 2, 3, 4, 5],
+        [[1, 2, 3], [4], [3], [4], []],
+    )
+
+
+def test_closure():
+    graph = diamond()
+
+    assert sorted(graph.closure(2)) == [2, 3, 4]
+
+
+def test_subtree_sizes():
+    graph = diamond()
+
+    order, parents = graph.spanning_tree(0)
+    sizes = graph.subtree_sizes(order, parents)
+
+    assert order == [0, 1, 2, 3, 4]
+    assert parents == {0: None, 1: 0, 2: 0, 3: 0, 4: 1}
+    assert sizes == {0: 15, 1: 7, 2: 3, 3: 4, 4: 5}
+
+
+def test_chains_shortest_first():
+    graph = diamond()
+
+    assert graph.chains(0, [4], 10) == [[0, 1, 4], [0, 3, 4], [0, 2, 3, 4]]
+    assert graph.chains(0, [4], 1) == [[0, 1, 4]]
+
+
+def test_chains_unreachable():
+    graph = diamond()
+
+    assert graph.chains(4, [0], 10) == []
+
+
+def test_distances_to():
+    graph = diamond()
+
+    assert graph.distances_to([4], range(5)) == {4: 0, 1: 1, 3: 1, 0: 2, 2: 2}
+
+
+def test_id_invalid_path():
+    with pytest.raises(NotValidPathException):
+        diamond().id("missing")
+
+
+def test_ancestors():
+    graph = diamond()
+
+    assert graph.ancestors(3) == {0, 2, 3}
+
+
+def test_remove():
+    graph = diamond()
+
+    graph.remove("c")
+
+    assert "c" not in graph.ids
+    assert len(graph) == 4
+    assert graph.references[0] == [1, 2]
+    assert graph.referrers[4] == [1]
+    assert graph.ancestors(4) == {0, 1, 4}
+
+
+@pytest.mark.asyncio
+async def test_reference_graph_cache(synthetic_store):
+    cache = ReferenceGraphCache()
+
+    graph = await cache.get(synthetic_store)
+
+    assert set(graph.paths) == set(SYNTHETIC_PATHS)
+    assert graph.sizes[graph.id(CURL)] == 300
+    with patch.object(closure_engine, "get_reference_graph") as mock_load:
+        assert await cache.get(synthetic_store) is graph
+    mock_load.assert_not_called()
+
+
+@pytest.mark.asyncio
+async def test_reference_graph_cache_update(synthetic_store):
+    cache = ReferenceGraphCache()
+    graph = await cache.get(synthetic_store)
+    wget = "/nix/store/eeee-wget-1.24.5"
+
+    with sqlite3.connect(get_database_path(synthetic_store)) as connection:
+        path_id = connection.execute(
+            "INSERT INTO ValidPaths (path, hash, registrationTime, narSize) "
+            "VALUES (?, 'sha256:0', 0, 50)",
+            (wget,),
+        ).lastrowid
+        connection.execute(
+            "INSERT INTO Refs (referrer, reference) "
+            "SELECT ?, id FROM ValidPaths WHERE path = ?",
+            (path_id, GLIBC),
+        )
+    connection.close()
+    (synthetic_store / "nix" / "store" / "eeee-wget-1.24.5").mkdir()
+
+    await cache.update(synthetic_store)
+
+    assert await cache.get(synthetic_store) is graph
+    assert graph.paths[graph.id(wget)] == wget
+    assert wget in [graph.paths[node] for node in graph.referrers[graph.id(GLIBC)]]
+
+
+@pytest.mark.asyncio
+async def test_reference_graph_cache_discard(synthetic_store):
+    cache = ReferenceGraphCache()
+    graph = await cache.get(synthetic_store)
+
+    (synthetic_store / "nix" / "store" / "dddd-curl-8.7.1").rmdir()
+    cache.discard(synthetic_store, [CURL])
+
+    assert await cache.get(synthetic_store) is graph
+    assert CURL not in graph.ids
+    assert graph.referrers[graph.id(GLIBC)] == [graph.id(HELLO), graph.id(LIBIDN)]
+
+
+@pytest.fixture
+def store_service(synthetic_store):
+    service = StoreService(lambda: None)  # type: ignore
+    service.stores_path = synthetic_store.parent
+    service.get_store = AsyncMock(return_value=StoreSchema(id=1, name="", owner_id=1))
+    (synthetic_store.parent / "1").mkdir()
+    synthetic_store.rename(synthetic_store.parent / "1" / "store")
+    return service
+
+
+@pytest.mark.asyncio
+async def test_get_dependency_chains(store_service):
+    package_service = AsyncMock()
+    package_service.get_package_path.return_value = HELLO
+
+    chains = await store_service.get_dependency_chains(
+        "store", "hello", "glibc", User(id=1), package_service, limit=5
+    )
+
+    assert chains.package == HELLO
+    assert chains.chains == [[HELLO, GLIBC], [HELLO, LIBIDN, GLIBC]]
+
+
+@pytest.mark.asyncio
+async def test_get_dependency_chains_by_path(store_service):
+    package_service = AsyncMock()
+    package_service.get_package_path.return_value = HELLO
+
+    chains = await store_service.get_dependency_chains(
+        "store", "hello", LIBIDN, User(id=1), package_service
+    )
+
+    assert chains.chains == [[HELLO, LIBIDN]]
+
+
+@pytest.mark.asyncio
+async def test_get_dependency_chains_not_dependent(store_service):
+    package_service = AsyncMock()
+    package_service.get_package_path.return_value = HELLO
+
+    with pytest.raises(HTTPException) as exc:
+        await store_service.get_dependency_chains(
+            "store", "hello", CURL, User(id=1), package_service
+        )
+
+    assert exc.value.status_code == 404
+
+
+@pytest.mark.asyncio
+async def test_get_path_referrers(store_service):
+    package_service = AsyncMock()
+    package_service.get_package_roots.return_value = {"hello": [HELLO], "curl": [CURL]}
+
+    referrers = await store_service.get_path_referrers(
+        "store", LIBIDN, User(id=1), package_service
+    )
+
+    assert referrers.referrers == [HELLO]
+    assert referrers.packages == ["hello"]
+
+
+@pytest.mark.asyncio
+async def test_get_path_referrers_invalid_path(store_service):
+    with pytest.raises(HTTPException) as exc:
+        await store_service.get_path_referrers(
+            "store", "/nix/store/zzzz-missing", User(id=1), AsyncMock()
+        )
+
+    assert exc.value.status_code == 404
+
+
+@pytest.mark.asyncio
+async def test_delete_package_still_referenced(store_service):
+    package_service = AsyncMock()
+    package_service.get_package.return_value = Package(
+        id=2, name="libidn2", store_id=1, closure={"packages": []}, path=LIBIDN
+    )
+    package_service.get_package_roots.return_value = {
+        "hello": [HELLO],
+        "libidn2": [LIBIDN],
+    }
+
+    with (
+        patch.object(core_logic, "remove_package") as mock_remove,
+        pytest.raises(HTTPException) as exc,
+    ):
+        await store_service.delete_package(
+            "store", "libidn2", User(id=1), package_service
+        )
+
+    assert exc.value.status_code == 400
+    assert exc.value.detail == "Cannot delete this package since it is used by hello!"
+    package_service.delete_package.assert_not_called()
+    mock_remove.assert_not_called()
+
+
+@pytest.mark.asyncio
+async def test_get_closure_breakdown(store_service):
+    package_service = AsyncMock()
+    package_service.get_package_path.return_value = HELLO
+
+    breakdown = await store_service.get_closure_breakdown(
+        "store", "hello", User(id=1), package_service, top=2, tree=True
+    )
+
+    assert breakdown.closure_size == 1120
+    assert [entry.path for entry in breakdown.top] == [GLIBC, HELLO]
+    assert [
+        (entry.path, entry.parent, entry.subtree_size) for entry in breakdown.tree
+    ] == [
+        (HELLO, None, 1120),
+        (LIBIDN, HELLO, 20),
+        (GLIBC, HELLO, 1000),
+    ]
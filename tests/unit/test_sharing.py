@@ -0,0 +1,85 @@
+from pathlib import Path
+from unittest.mock import AsyncMock
+
+import pytest
+from conftest import CURL, GLIBC, HELLO, LIBIDN
+
+from src.auth.schemas import User
+from src.logic.graph import ReferenceGraph
+from src.logic.sharing import SizeAttribution, SizeAttributionCache
+from src.services.stores import StoreService
+from src.store.schemas.store import Store as StoreSchema
+
+
+def graph() -> ReferenceGraph:
+    return ReferenceGraph(
+        [HELLO, LIBIDN, GLIBC, CURL],
+        [100, 20, 1000, 300],
+        [[1, 2], [2], [], [2]],
+    )
+
+
+def test_size_attribution():
+    attribution = SizeAttribution(graph())
+
+    attribution.add("hello", [HELLO])
+    assert attribution.exclusive_sizes == {"hello": 1120}
+
+    attribution.add("curl", [CURL])
+    assert attribution.exclusive_sizes == {"hello": 120, "curl": 300}
+    assert attribution.closure_sizes == {"hello": 1120, "curl": 1300}
+
+    attribution.add("libidn2", [LIBIDN])
+    assert attribution.exclusive_sizes == {"hello": 100, "curl": 300, "libidn2": 0}
+
+    attribution.remove("hello")
+    assert attribution.exclusive_sizes == {"curl": 300, "libidn2": 20}
+
+    attribution.remove("libidn2")
+    assert attribution.exclusive_sizes == {"curl": 1300}
+
+
+@pytest.mark.asyncio
+async def test_size_attribution_cache():
+    cache = SizeAttributionCache()
+    reference_graph = graph()
+    get_roots = AsyncMock(return_value={"hello": [HELLO]})
+
+    attribution = await cache.get(Path("store"), reference_graph, get_roots)
+    cache.add(Path("store"), "curl", [CURL])
+
+    assert await cache.get(Path("store"), reference_graph, get_roots) is attribution
+    assert attribution.exclusive_sizes == {"hello": 120, "curl": 300}
+    get_roots.assert_awaited_once()
+
+    cache.add(Path("store"), "wget", ["/nix/store/eeee-wget-1.24.5"])
+
+    assert await cache.get(Path("store"), reference_graph, get_roots) is not attribution
+
+
+@pytest.mark.asyncio
+async def test_get_package_sizes(synthetic_store):
+    service = StoreService(lambda: None)  # type: ignore
+    service.stores_path = synthetic_store.parent
+    service.get_store = AsyncMock(return_value=StoreSchema(id=1, name="", owner_id=1))
+    (synthetic_store.parent / "1").mkdir()
+    synthetic_store.rename(synthetic_store.parent / "1" / "store")
+    package_service = AsyncMock()
+    package_service.get_package_roots.return_value = {"hello": [HELLO], "curl": [CURL]}
+
+    sizes = await service.get_package_sizes("store", User(id=1), package_service)
+
+    assert [size.model_dump() for size in sizes] == [
+        {
+            "package_name": "curl",
+            "closure_size": 1300,
+            "exclusive_size": 300,
+            "shared_size": 1000,
+        },
+        {
+            "package_name": "hello",
+            "closure_size": 1120,
+            "exclusive_size": 120,
+            "shared_size": 1000,
+        },
+    ]
@@ -0,0 +1,73 @@
+import asyncio
+
+import pytest
+
+from src.logic.singleflight import SingleFlight
+
+
+@pytest.mark.asyncio
+async def test_single_flight_shares_result():
+    flight = SingleFlight()
+    calls = 0
+
+    async def operation(value):
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.01)
+        return value
+
+    results = await asyncio.gather(*(flight.do("key", operation, 1) for _ in range(3)))
+
+    assert results == [1, 1, 1]
+    assert calls == 1
+    assert flight.stats()["coalesced"] == 2
+
+
+@pytest.mark.asyncio
+async def test_single_flight_runs_again_after_completion():
+    flight = SingleFlight()
+
+    async def operation():
+        return object()
+
+    first = await flight.do("key", operation)
+    second = await flight.do("key", operation)
+
+    assert first is not second
+    assert flight.stats()["executions"] == 2
+
+
+@pytest.mark.asyncio
+async def test_single_flight_shares_exception():
+    flight = SingleFlight()
+
+    async def operation():
+        await asyncio.sleep(0.01)
+        raise ValueError("failed")
+
+    results = await asyncio.gather(
+        flight.do("key", operation),
+        flight.do("key", operation),
+        return_exceptions=True,
+    )
+
+    assert all(isinstance(result, ValueError) for result in results)
+    assert flight.in_flight() == 0
+
+
+@pytest.mark.asyncio
+async def test_single_flight_cancelled_caller():
+    flight = SingleFlight()
+
+    async def operation():
+        await asyncio.sleep(0.01)
+        return "done"
+
+    cancelled = asyncio.create_task(flight.do("key", operation))
+    waiting = asyncio.create_task(flight.do("key", operation))
+    await asyncio.sleep(0)
+    cancelled.cancel()
+
+    assert await waiting == "done"
+    with pytest.raises(asyncio.CancelledError):
+        await cancelled
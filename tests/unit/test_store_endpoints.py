@@ -7,9 +7,21 @@ import pytest
 from fastapi.testclient import TestClient
 
 from src.store.schemas.package import (
+    ClosureBreakdown,
+    ClosureEntry,
     ClosuresDifference,
+    DependencyChains,
     Package,
+    PackageChange,
     PackageMeta,
+    PackageSizes,
+    VersionUpdate,
+)
+from src.store.schemas.path import (
+    DifferenceSummary,
+    PathReferrers,
+    PathsDifference,
+    PathsDifferenceSummary,
 )
 
 os.environ["DATABASE_URL"] = "sqlite+aiosqlite:///:memory:"
@@ -72,6 +84,23 @@ def test_create_store_already_exists(client):
     assert response.json() == {"detail": "This store already exists!"}
 
 
+def test_clone_store(client):
+    client.post("/store/store", json={})
+
+    response = client.post("/store/store/clone/clone")
+
+    assert response.status_code == 200
+    assert response.json() == {"id": 2, "name": "clone", "owner_id": 1, "paths": []}
+    assert client.get("/store/clone").status_code == 200
+
+
+def test_clone_store_not_found(client):
+    response = client.post("/store/store/clone/clone")
+
+    assert response.status_code == 404
+    assert response.json() == {"detail": "Store store was not found!"}
+
+
 def test_get_all_stores(client):
     client.post("/store/store1", json={})
 
@@ -86,6 +115,22 @@ def test_get_all_stores(client):
     ]
 
 
+def test_get_all_stores_paginated(client):
+    for name in ("store1", "store2", "store3"):
+        client.post(f"/store/{name}", json={})
+
+    response = client.get("/store?after_id=1&limit=1&fields=name")
+
+    assert response.status_code == 200
+    assert response.json() == [{"id": 2, "name": "store2"}]
+
+
+def test_get_all_stores_unknown_field(client):
+    response = client.get("/store?fields=password")
+
+    assert response.status_code == 422
+
+
 def test_get_store(client):
     client.post("/store/store", json={})
 
@@ -124,23 +169,35 @@ def test_delete_store_not_found(client):
 
 
 def test_add_package(client):
-    with patch("src.store.router.StoreService.add_package") as mock_add_package:
-        mock_add_package.return_value = Package(
-            id=1,
-            name="package",
-            store_id=1,
-            closure={"packages": []},
-        )
+    client.post("/store/store")
 
-        response = client.post("/store/store/package/package", json={})
+    response = client.post("/store/store/package/package")
 
-        assert response.status_code == 200
-        assert response.json() == {
-            "id": 1,
-            "name": "package",
-            "store_id": 1,
-            "closure": {"packages": []},
-        }
+    assert response.status_code == 202
+    job = response.json()
+    assert job["kind"] == "install"
+    assert job["store_name"] == "store"
+    assert job["package_name"] == "package"
+    assert job["state"] == "pending"
+
+    response = client.get(f"/jobs/{job['id']}")
+
+    assert response.status_code == 200
+    assert response.json() == job
+
+
+def test_add_package_store_not_found(client):
+    response = client.post("/store/store/package/package")
+
+    assert response.status_code == 404
+    assert response.json() == {"detail": "Store store was not found!"}
+
+
+def test_get_job_not_found(client):
+    response = client.get("/jobs/1")
+
+    assert response.status_code == 404
+    assert response.json() == {"detail": "Job 1 was not found!"}
 
 
 def test_delete_package(client):
@@ -159,7 +216,10 @@ def test_delete_package(client):
             "id": 1,
             "name": "package",
             "store_id": 1,
-            "closure": {"packages": []},
+            "closure": {"packages": [], "sizes": {}},
+            "path": None,
+            "outputs": {},
+            "closure_size": None,
         }
 
 
@@ -181,6 +241,88 @@ def test_get_paths_difference(client):
         }
 
 
+def test_get_paths_difference_page(client):
+    with patch(
+        "src.store.router.StoreService.get_paths_difference_page"
+    ) as mock_get_paths_difference_page:
+        mock_get_paths_difference_page.return_value = PathsDifference(
+            absent_in_store_1=["path2"], absent_in_store_2=[], next_cursor="path2"
+        )
+
+        response = client.get("/store/store1/difference/store2?limit=1")
+
+        assert response.status_code == 200
+        assert response.json() == {
+            "absent_in_store_1": ["path2"],
+            "absent_in_store_2": [],
+            "next_cursor": "path2",
+        }
+        mock_get_paths_difference_page.assert_called_once()
+        assert mock_get_paths_difference_page.call_args.args[-2:] == (None, 1)
+
+
+def test_get_paths_difference_summary(client):
+    with patch(
+        "src.store.router.StoreService.get_paths_difference_summary"
+    ) as mock_get_paths_difference_summary:
+        mock_get_paths_difference_summary.return_value = PathsDifferenceSummary(
+            absent_in_store_1=DifferenceSummary(count=1, bytes=10),
+            absent_in_store_2=DifferenceSummary(),
+        )
+
+        response = client.get("/store/store1/difference/store2/summary")
+
+        assert response.status_code == 200
+        assert response.json() == {
+            "absent_in_store_1": {"count": 1, "bytes": 10},
+            "absent_in_store_2": {"count": 0, "bytes": 0},
+        }
+
+
+def test_stream_paths_difference(client):
+    client.post("/store/store1", json={})
+    client.post("/store/store2", json={})
+
+    response = client.get("/store/store1/difference/store2/stream")
+
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "application/x-ndjson"
+    assert response.text == ""
+
+
+def test_compare_stores(client):
+    client.post("/store/store1", json={})
+    client.post("/store/store2", json={})
+    os.makedirs("stores/1/store1/nix/store/hash-package")
+
+    response = client.post("/store/compare", json={"stores": ["store1", "store2"]})
+
+    assert response.status_code == 200
+    assert response.json() == {
+        "stores": ["store1", "store2"],
+        "groups": [
+            {"stores": ["store1"], "count": 1, "paths": ["/nix/store/hash-package"]}
+        ],
+    }
+
+
+def test_compare_stores_summary(client):
+    client.post("/store/store1", json={})
+
+    response = client.post(
+        "/store/compare", json={"stores": ["store1"], "summary": True}
+    )
+
+    assert response.status_code == 200
+    assert response.json() == {"stores": ["store1"], "groups": []}
+
+
+def test_compare_stores_not_found(client):
+    response = client.post("/store/compare", json={"stores": ["store1"]})
+
+    assert response.status_code == 404
+
+
 def test_get_closures_difference(client):
     with patch(
         "src.store.router.StoreService.get_closures_difference"
@@ -201,6 +343,118 @@ def test_get_closures_difference(client):
         }
 
 
+def test_get_closure_changes(client):
+    with patch(
+        "src.store.router.StoreService.get_closure_changes"
+    ) as mock_get_closure_changes:
+        mock_get_closure_changes.return_value = [
+            PackageChange(
+                package_name="glibc",
+                version_update=VersionUpdate(old="2.39-52", new="∅"),
+                size_update="-10.0 KiB",
+                size_delta=-10240,
+            )
+        ]
+
+        response = client.get(
+            "/store/store/package/package/closure-changes/store/package"
+        )
+
+        assert response.status_code == 200
+        assert response.json() == [
+            {
+                "package_name": "glibc",
+                "version_update": {"old": "2.39-52", "new": "∅"},
+                "size_update": "-10.0 KiB",
+                "size_delta": -10240,
+            }
+        ]
+
+
+def test_get_dependency_chains(client):
+    with patch(
+        "src.store.router.StoreService.get_dependency_chains"
+    ) as mock_get_dependency_chains:
+        mock_get_dependency_chains.return_value = DependencyChains(
+            package="/nix/store/hash-hello",
+            target="glibc",
+            chains=[["/nix/store/hash-hello", "/nix/store/hash-glibc"]],
+        )
+
+        response = client.get(
+            "/store/store/package/hello/why-depends?target=glibc&limit=3"
+        )
+
+        assert response.status_code == 200
+        assert response.json()["chains"] == [
+            ["/nix/store/hash-hello", "/nix/store/hash-glibc"]
+        ]
+        assert mock_get_dependency_chains.call_args.args[2] == "glibc"
+        assert mock_get_dependency_chains.call_args.args[-1] == 3
+
+
+def test_get_closure_breakdown(client):
+    with patch(
+        "src.store.router.StoreService.get_closure_breakdown"
+    ) as mock_get_closure_breakdown:
+        mock_get_closure_breakdown.return_value = ClosureBreakdown(
+            package="/nix/store/hash-hello",
+            closure_size=10,
+            top=[
+                ClosureEntry(path="/nix/store/hash-hello", nar_size=10, subtree_size=10)
+            ],
+        )
+
+        response = client.get("/store/store/package/hello/breakdown?top=1")
+
+        assert response.status_code == 200
+        assert "tree" not in response.json()
+        assert response.json()["top"] == [
+            {"path": "/nix/store/hash-hello", "nar_size": 10, "subtree_size": 10}
+        ]
+        assert mock_get_closure_breakdown.call_args.args[-2:] == (1, False)
+
+
+def test_get_package_sizes(client):
+    with patch(
+        "src.store.router.StoreService.get_package_sizes"
+    ) as mock_get_package_sizes:
+        mock_get_package_sizes.return_value = [
+            PackageSizes(
+                package_name="hello", closure_size=10, exclusive_size=4, shared_size=6
+            )
+        ]
+
+        response = client.get("/store/store/sizes")
+
+        assert response.status_code == 200
+        assert response.json() == [
+            {
+                "package_name": "hello",
+                "closure_size": 10,
+                "exclusive_size": 4,
+                "shared_size": 6,
+            }
+        ]
+
+
+def test_get_path_referrers(client):
+    with patch(
+        "src.store.router.StoreService.get_path_referrers"
+    ) as mock_get_path_referrers:
+        mock_get_path_referrers.return_value = PathReferrers(
+            path="/nix/store/hash-glibc",
+            referrers=["/nix/store/hash-hello"],
+            packages=["hello"],
+        )
+
+        response = client.get("/store/store/referrers?path=/nix/store/hash-glibc")
+
+        assert response.status_code == 200
+        assert response.json()["packages"] == ["hello"]
+        assert mock_get_path_referrers.call_args.args[1] == "/nix/store/hash-glibc"
+
+
 def test_get_package_meta(client):
     with patch(
         "src.store.router.StoreService.get_package_meta"
@@ -214,3 +468,16 @@ def test_get_package_meta(client):
 
         assert response.status_code == 200
         assert response.json() == {"present": True, "closure_size": 0}
+
+
+def test_get_stats(client):
+    response = client.get("/stats")
+
+    assert response.status_code == 200
+    assert set(response.json()) == {"nix", "closures", "stores", "trash"}
+    assert set(response.json()["nix"]) == {
+        "calls",
+        "executions",
+        "coalesced",
+        "in_flight",
+    }
@@ -1,11 +1,15 @@
+import asyncio
+import json
 import tempfile
 from pathlib import Path
-from subprocess import CalledProcessError
-from unittest.mock import patch
+from subprocess import CalledProcessError, CompletedProcess
+from unittest.mock import AsyncMock, MagicMock, patch
 
 import pytest
+from conftest import GLIBC, HELLO, LIBIDN
 
 import src.logic.core as logic
+from src.logic import closure as closure_engine
 from src.logic.exceptions import (
     AttributeNotProvidedException,
     BrokenPackageException,
@@ -13,8 +17,31 @@ from src.logic.exceptions import (
     NotAvailableOnHostPlatformException,
     PackageNotInstalledException,
     StillAliveException,
+    StoreFolderDoesNotExistException,
     UnfreeLicenceException,
+    UnknownStoreSchemaException,
 )
+from src.logic.progress import BuildProgress
+from src.logic.singleflight import SingleFlight
+
+
+def completed(stdout: str = "", stderr: str = "", returncode: int = 0):
+    return CompletedProcess(["nix"], returncode, stdout, stderr)
+
+
+def nix_event(**event) -> str:
+    return "@nix " + json.dumps(event)
+
+
+def streamed(stdout: str = "", errors=(), lines=(), returncode: int = 0):
+    async def stream_nix(*args, on_stderr_line):
+        for line in lines:
+            on_stderr_line(line)
+        for error in errors:
+            on_stderr_line(nix_event(action="msg", level=0, msg=f"error: {error}"))
+        return completed(stdout, returncode=returncode)
+
+    return stream_nix
 
 
 @pytest.fixture
@@ -60,158 +87,403 @@ def test_get_paths(store):
     assert paths == {"/nix/store/file1", "/nix/store/file2"}
 
 
-def test_install_package(store):
+@pytest.mark.asyncio
+async def test_run_nix():
+    process = MagicMock()
+    process.returncode = 0
+    process.communicate = AsyncMock(return_value=(b"out", b"err"))
+
+    with patch("src.logic.core.create_subprocess_exec") as mock_exec:
+        mock_exec.return_value = process
+        result = await logic._run_nix("path-info", "--json")
+
+        assert mock_exec.call_args.args == ("nix", "path-info", "--json")
+        assert result.args == ["nix", "path-info", "--json"]
+        assert result.returncode == 0
+        assert result.stdout == "out"
+        assert result.stderr == "err"
+
+
+@pytest.mark.asyncio
+async def test_stream_nix():
+    lines = []
+    process = MagicMock()
+    process.returncode = 0
+    process.stdout.read = AsyncMock(return_value=b"out")
+    process.stderr.__aiter__.return_value = [b"line 1\n", b"line 2\n"]
+    process.wait = AsyncMock(return_value=0)
+
+    with patch("src.logic.core.create_subprocess_exec") as mock_exec:
+        mock_exec.return_value = process
+        result = await logic._stream_nix("build", on_stderr_line=lines.append)
+
+    assert lines == ["line 1", "line 2"]
+    assert result.stdout == "out"
+    assert result.returncode == 0
+
+
+@pytest.mark.asyncio
+async def test_run_nix_concurrency_limit():
+    running = 0
+    max_running = 0
+
+    async def communicate():
+        nonlocal running, max_running
+        running += 1
+        max_running = max(max_running, running)
+        await asyncio.sleep(0.01)
+        running -= 1
+        return b"", b""
+
+    async def create_process(*args, **kwargs):
+        process = MagicMock()
+        process.returncode = 0
+        process.communicate = communicate
+        return process
+
+    with (
+        patch("src.logic.core.create_subprocess_exec", create_process),
+        patch("src.logic.core._nix_semaphore", asyncio.Semaphore(2)),
+    ):
+        await asyncio.gather(*(logic._run_nix("build", str(i)) for i in range(6)))
+
+    assert max_running == 2
+
+
+@pytest.mark.asyncio
+async def test_query_nix_coalesces_identical_commands():
+    calls = 0
+
+    async def communicate():
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.01)
+        return b"out", b""
+
+    async def create_process(*args, **kwargs):
+        process = MagicMock()
+        process.returncode = 0
+        process.communicate = communicate
+        return process
+
+    with (
+        patch("src.logic.core.create_subprocess_exec", create_process),
+        patch("src.logic.core.nix_flight", SingleFlight()) as flight,
+    ):
+        results = await asyncio.gather(
+            *(logic._query_nix("path-info", "hello") for _ in range(5)),
+            logic._query_nix("path-info", "curl"),
+        )
+
+    assert calls == 2
+    assert all(result.stdout == "out" for result in results)
+    assert flight.stats() == {
+        "calls": 6,
+        "executions": 2,
+        "coalesced": 4,
+        "in_flight": 0,
+    }
+
+
+@pytest.mark.asyncio
+async def test_run_nix_does_not_coalesce_commands():
+    calls = 0
+
+    async def communicate():
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.01)
+        return b"", b""
+
+    async def create_process(*args, **kwargs):
+        process = MagicMock()
+        process.returncode = 0
+        process.communicate = communicate
+        return process
+
+    with (
+        patch("src.logic.core.create_subprocess_exec", create_process),
+        patch("src.logic.core.nix_flight", SingleFlight()) as flight,
+    ):
+        await asyncio.gather(
+            *(logic._run_nix("store", "delete", "/nix/store/hash") for _ in range(3))
+        )
+
+    assert calls == 3
+    assert flight.stats()["calls"] == 0
+
+
+@pytest.mark.asyncio
+async def test_install_package(store):
     package_name = "package_name"
 
-    with patch("src.logic.core.run") as mock_run:
-        mock_run.return_value.stdout = '[{"outputs": {"out": "path"}}]'
-        path = logic.install_package(store, package_name)
-        assert path == "path"
-        mock_run.assert_called_with(
-            [
-                "nix",
-                "build",
-                "--json",
-                "--no-link",
-                "--store",
-                str(store),
-                f"nixpkgs#{package_name}",
+    with patch("src.logic.core._stream_nix") as mock_run:
+        mock_run.side_effect = streamed(
+            '[{"outputs": {"out": "path", "man": "path-man"}}]'
+        )
+        outputs = await logic.install_package(store, package_name)
+        assert outputs == {"out": "path", "man": "path-man"}
+        assert mock_run.call_args.args == (
+            "build",
+            "--json",
+            "--no-link",
+            "--log-format",
+            "internal-json",
+            "--store",
+            str(store),
+            f"nixpkgs#{package_name}",
+        )
+
+
+@pytest.mark.asyncio
+async def test_install_package_binary_cache(store, tmp_path):
+    with (
+        patch("src.logic.core.NIX_BINARY_CACHE", str(tmp_path / "cache")),
+        patch("src.logic.core._stream_nix") as mock_run,
+    ):
+        mock_run.side_effect = streamed('[{"outputs": {"out": "path"}}]')
+        await logic.install_package(store, "hello")
+
+    args = mock_run.call_args.args
+    substituter = args[args.index("extra-substituters") + 1]
+    assert substituter == f"file://{tmp_path / 'cache'}?trusted=true&priority=10"
+    assert args.index("extra-substituters") < args.index("--store")
+
+
+@pytest.mark.asyncio
+async def test_copy_to_binary_cache(store, tmp_path):
+    with (
+        patch("src.logic.core.NIX_BINARY_CACHE", str(tmp_path / "cache")),
+        patch("src.logic.core._run_nix") as mock_run,
+    ):
+        mock_run.return_value = completed()
+        assert await logic.copy_to_binary_cache(store, ["/nix/store/a", "/nix/store/b"])
+
+    mock_run.assert_called_once_with(
+        "copy",
+        "--to",
+        f"file://{tmp_path / 'cache'}?compression=zstd",
+        "--store",
+        str(store),
+        "/nix/store/a",
+        "/nix/store/b",
+    )
+
+
+@pytest.mark.asyncio
+async def test_copy_to_binary_cache_failure(store, tmp_path):
+    with (
+        patch("src.logic.core.NIX_BINARY_CACHE", str(tmp_path / "cache")),
+        patch("src.logic.core._run_nix") as mock_run,
+    ):
+        mock_run.return_value = completed(stderr="error: disk full", returncode=1)
+        assert not await logic.copy_to_binary_cache(store, ["/nix/store/a"])
+
+
+@pytest.mark.asyncio
+async def test_copy_to_binary_cache_disabled(store):
+    with patch("src.logic.core._run_nix") as mock_run:
+        assert not await logic.copy_to_binary_cache(store, ["/nix/store/a"])
+
+    mock_run.assert_not_called()
+
+
+@pytest.mark.asyncio
+async def test_install_package_progress(store):
+    progress = []
+
+    with patch("src.logic.core._stream_nix") as mock_run:
+        mock_run.side_effect = streamed(
+            '[{"outputs": {"out": "path"}}]',
+            lines=[
+                nix_event(action="start", id=1, type=103, text="copying paths"),
+                nix_event(action="start", id=2, type=101, text="downloading"),
+                nix_event(action="result", id=2, type=105, fields=[10, 40, 0, 0]),
+                nix_event(action="result", id=1, type=105, fields=[1, 3, 1, 0]),
+                "building '/nix/store/x.drv'...",
             ],
-            capture_output=True,
-            text=True,
         )
+        await logic.install_package(store, "hello", on_progress=progress.append)
+
+    assert progress[-1] == BuildProgress(
+        bytes_done=10,
+        bytes_expected=40,
+        paths_done=1,
+        paths_expected=3,
+        activity="downloading",
+    )
+
+
+@pytest.mark.asyncio
+async def test_install_package_pinned(store):
+    with patch("src.logic.core._stream_nix") as mock_run:
+        mock_run.side_effect = streamed('[{"outputs": {"out": "path"}}]')
+        await logic.install_package(store, "hello", "rev")
+        assert mock_run.call_args.args[-1] == "nixpkgs/rev#hello"
+
+
+@pytest.mark.asyncio
+async def test_resolve_package():
+    with patch("src.logic.core._run_nix") as mock_run:
+        mock_run.return_value = completed("/nix/store/hash-hello\n")
+        path = await logic.resolve_package("hello", "rev")
+        assert path == "/nix/store/hash-hello"
+        mock_run.assert_called_with("eval", "--raw", "nixpkgs/rev#hello.outPath")
+
+
+@pytest.mark.asyncio
+async def test_resolve_package_attribute_not_provided():
+    with patch("src.logic.core._run_nix") as mock_run:
+        mock_run.return_value = completed(
+            stderr="does not provide attribute", returncode=1
+        )
+        with pytest.raises(AttributeNotProvidedException):
+            await logic.resolve_package("hello", "rev")
+
+
+@pytest.mark.asyncio
+async def test_get_nixpkgs_revision():
+    with (
+        patch("src.logic.core._run_nix") as mock_run,
+        patch("src.logic.core._nixpkgs_revision", None),
+    ):
+        mock_run.return_value = completed('{"locked": {"rev": "abc"}}')
+
+        assert await logic.get_nixpkgs_revision() == "abc"
+        assert await logic.get_nixpkgs_revision() == "abc"
+        mock_run.assert_called_once_with("flake", "metadata", "--json", "nixpkgs")
+
 
+@pytest.mark.asyncio
+async def test_get_nixpkgs_revision_configured():
+    with (
+        patch("src.logic.core._run_nix") as mock_run,
+        patch("src.logic.core._nixpkgs_revision", "configured"),
+    ):
+        assert await logic.get_nixpkgs_revision() == "configured"
+        mock_run.assert_not_called()
 
-def test_install_package_called_process_error(store):
+
+@pytest.mark.asyncio
+async def test_remove_package_outputs(store):
+    with patch("src.logic.core._run_nix") as mock_run:
+        mock_run.return_value = completed()
+        await logic.remove_package(
+            store, ["/nix/store/hash-hello", "/nix/store/hash-hello-man"]
+        )
+        mock_run.assert_called_with(
+            "store",
+            "delete",
+            "--store",
+            str(store),
+            "/nix/store/hash-hello",
+            "/nix/store/hash-hello-man",
+        )
+
+
+@pytest.mark.asyncio
+async def test_install_package_called_process_error(store):
     package_name = "package_name"
 
-    with patch("src.logic.core.run") as mock_run:
-        mock_error = CalledProcessError(1, "cmd")
-        mock_run.return_value.check_returncode.side_effect = mock_error
+    with patch("src.logic.core._stream_nix") as mock_run:
+        mock_run.side_effect = streamed(returncode=1)
 
         with pytest.raises(CalledProcessError):
-            logic.install_package(store, package_name)
+            await logic.install_package(store, package_name)
 
 
-def test_install_package_unfree_licence(store):
+@pytest.mark.asyncio
+async def test_install_package_unfree_licence(store):
     package_name = "package_name"
 
-    with patch("src.logic.core.run") as mock_run:
-        mock_error = CalledProcessError(1, "cmd")
-        mock_run.return_value.check_returncode.side_effect = mock_error
-        mock_run.return_value.stderr = (
-            "has an unfree license (‘unfree’), refusing to evaluate."
+    with patch("src.logic.core._stream_nix") as mock_run:
+        mock_run.side_effect = streamed(
+            errors=["has an unfree license (‘unfree’), refusing to evaluate."],
+            returncode=1,
         )
 
         with pytest.raises(UnfreeLicenceException):
-            logic.install_package(store, package_name)
+            await logic.install_package(store, package_name)
 
 
-def test_install_package_not_available_on_host_platform(store):
+@pytest.mark.asyncio
+async def test_install_package_not_available_on_host_platform(store):
     package_name = "package_name"
 
-    with patch("src.logic.core.run") as mock_run:
-        mock_error = CalledProcessError(1, "cmd")
-        mock_run.return_value.check_returncode.side_effect = mock_error
-        mock_run.return_value.stderr = "is not available on the requested hostPlatform"
+    with patch("src.logic.core._stream_nix") as mock_run:
+        mock_run.side_effect = streamed(
+            errors=["is not available on the requested hostPlatform"], returncode=1
+        )
 
         with pytest.raises(NotAvailableOnHostPlatformException):
-            logic.install_package(store, package_name)
+            await logic.install_package(store, package_name)
 
 
-def test_install_package_attribute_not_provided(store):
+@pytest.mark.asyncio
+async def test_install_package_attribute_not_provided(store):
     package_name = "package_name"
 
-    with patch("src.logic.core.run") as mock_run:
-        mock_error = CalledProcessError(1, "cmd")
-        mock_run.return_value.check_returncode.side_effect = mock_error
-        mock_run.return_value.stderr = "does not provide attribute"
+    with patch("src.logic.core._stream_nix") as mock_run:
+        mock_run.side_effect = streamed(
+            errors=["does not provide attribute"], returncode=1
+        )
 
         with pytest.raises(AttributeNotProvidedException):
-            logic.install_package(store, package_name)
+            await logic.install_package(store, package_name)
 
 
-def test_install_package_broken_package(store):
+@pytest.mark.asyncio
+async def test_install_package_broken_package(store):
     package_name = "package_name"
 
-    with patch("src.logic.core.run") as mock_run:
-        mock_error = CalledProcessError(1, "cmd")
-        mock_run.return_value.check_returncode.side_effect = mock_error
-        mock_run.return_value.stderr = "is marked as broken, refusing to evaluate."
+    with patch("src.logic.core._stream_nix") as mock_run:
+        mock_run.side_effect = streamed(
+            errors=["is marked as broken, refusing to evaluate."], returncode=1
+        )
 
         with pytest.raises(BrokenPackageException):
-            logic.install_package(store, package_name)
-
-
-def test_install_package_insecure_package(store):
-    package_name = "package_name"
-
-    with patch("src.logic.core.run") as mock_run:
-        mock_error = CalledProcessError(1, "cmd")
-        mock_run.return_value.check_returncode.side_effect = mock_error
-        mock_run.return_value.stderr = "is marked as insecure, refusing to evaluate."
-
-        with pytest.raises(InsecurePackageException):
-            logic.install_package(store, package_name)
+            await logic.install_package(store, package_name)
 
 
-def test_remove_package(store):
+@pytest.mark.asyncio
+async def test_install_package_insecure_package(store):
     package_name = "package_name"
 
-    with patch("src.logic.core.run") as mock_run:
-        mock_run.return_value.stderr = False
-        logic.remove_package(store, package_name)
-        mock_run.assert_called_with(
-            [
-                "nix",
-                "store",
-                "delete",
-                "--store",
-                str(store),
-                f"nixpkgs#{package_name}",
-            ],
-            capture_output=True,
-            text=True,
+    with patch("src.logic.core._stream_nix") as mock_run:
+        mock_run.side_effect = streamed(
+            errors=["is marked as insecure, refusing to evaluate."], returncode=1
         )
 
+        with pytest.raises(InsecurePackageException):
+            await logic.install_package(store, package_name)
 
-def test_remove_package_still_alive(store):
-    package_name = "package_name"
 
+@pytest.mark.asyncio
+@pytest.mark.asyncio
+async def test_remove_package_still_alive(store):
     with patch("src.logic.core._run_nix") as mock_run:
-        mock_error = CalledProcessError(1, "cmd")
-        mock_run.return_value.check_returncode.side_effect = mock_error
-        mock_run.return_value.stderr = "since it is still alive."
+        mock_run.return_value = completed(
+            stderr="since it is still alive.", returncode=1
+        )
 
         with pytest.raises(StillAliveException):
-            logic.remove_package(store, package_name)
+            await logic.remove_package(store, ["/nix/store/hash-hello"])
 
         mock_run.assert_called_with(
-            "store",
-            "delete",
-            "--store",
-            str(store),
-            f"nixpkgs#{package_name}",
+            "store", "delete", "--store", str(store), "/nix/store/hash-hello"
         )
 
 
-def test_remove_package_exception(store):
-    package_name = "package_name"
-
+@pytest.mark.asyncio
+async def test_remove_package_exception(store):
     with patch("src.logic.core._run_nix") as mock_run:
-        mock_error = CalledProcessError(1, "cmd")
-        mock_run.return_value.check_returncode.side_effect = mock_error
-        mock_run.return_value.stderr = "error"
+        mock_run.return_value = completed(stderr="error", returncode=1)
 
         with pytest.raises(Exception):
-            logic.remove_package(store, package_name)
+            await logic.remove_package(store, ["/nix/store/hash-hello"])
 
         mock_run.assert_called_with(
-            "store",
-            "delete",
-            "--store",
-            str(store),
-            f"nixpkgs#{package_name}",
+            "store", "delete", "--store", str(store), "/nix/store/hash-hello"
         )
 
 
@@ -224,47 +496,92 @@ def test_check_paths_are_valid(store):
     logic._check_paths_are_valid([{"valid": True}])
 
 
-def test_get_closure_size(store):
-    with patch("src.logic.core.run") as mock_run:
-        mock_run.return_value.stdout = (
-            '[{"closureSize": 1, "valid": true}, {"closureSize": 1, "valid": true}]'
-        )
-        output = logic.get_closure_size(store, "package_name")
-        mock_run.assert_called_with(
-            [
-                "nix",
-                "path-info",
-                "--json",
-                "--store",
-                str(store),
-                "--closure-size",
-                "nixpkgs#package_name",
-            ],
-            capture_output=True,
-            text=True,
-        )
+@pytest.mark.asyncio
+async def test_get_closure_from_database(synthetic_store):
+    with patch("src.logic.core._run_nix") as mock_run:
+        output = await logic.get_closure(synthetic_store, HELLO)
+
+        mock_run.assert_not_called()
+        assert set(output) == {HELLO, LIBIDN, GLIBC}
+
+
+@pytest.mark.asyncio
+async def test_get_closure_size_from_database(synthetic_store):
+    with patch("src.logic.core._run_nix") as mock_run:
+        output = await logic.get_closure_size(synthetic_store, HELLO)
+
+        mock_run.assert_not_called()
+        assert output == 1120
 
-        assert output == 2
 
+@pytest.mark.asyncio
+async def test_get_outputs_closure_sizes(synthetic_store):
+    sizes = await logic.get_outputs_closure_sizes(synthetic_store, [LIBIDN, HELLO])
 
-def test_get_closure(store):
-    with patch("src.logic.core.run") as mock_run:
-        mock_run.return_value.stdout = (
-            '[{"path": "path1", "valid": true}, {"path": "path2", "valid": true}]'
+    assert set(sizes) == {HELLO, LIBIDN, GLIBC}
+    assert sum(sizes.values()) == 1120
+
+
+@pytest.mark.asyncio
+async def test_get_closure_size_from_database_not_installed(synthetic_store):
+    with pytest.raises(PackageNotInstalledException):
+        await logic.get_closure_size(synthetic_store, "/nix/store/eeee-x")
+
+
+@pytest.mark.asyncio
+async def test_get_closure_unknown_schema_falls_back(store):
+    with (
+        patch("src.logic.core.closure_engine.get_closure") as mock_engine,
+        patch("src.logic.core._run_nix") as mock_run,
+    ):
+        mock_engine.side_effect = UnknownStoreSchemaException
+        mock_run.return_value = completed(
+            '[{"path": "path1", "narSize": 1, "valid": true}]'
         )
-        output = logic.get_closure(store, "package_name")
+
+        output = await logic.get_closure(store, HELLO)
+
         mock_run.assert_called_with(
-            [
-                "nix",
-                "path-info",
-                "--json",
-                "--store",
-                str(store),
-                "--recursive",
-                "nixpkgs#package_name",
-            ],
-            capture_output=True,
-            text=True,
+            "path-info", "--json", "--store", str(store), "--recursive", HELLO
         )
+        assert output == ["path1"]
+
+
+def test_clone_store(synthetic_store, tmp_path):
+    (synthetic_store / HELLO.lstrip("/") / "bin").write_text("hello")
+    clone = tmp_path / "clone"
+
+    logic.clone_store(synthetic_store, clone)
+
+    source_file = synthetic_store / HELLO.lstrip("/") / "bin"
+    cloned_file = clone / HELLO.lstrip("/") / "bin"
+    assert cloned_file.read_text() == "hello"
+    assert cloned_file.stat().st_ino == source_file.stat().st_ino
+    assert logic.get_paths(clone) == logic.get_paths(synthetic_store)
+    assert closure_engine.get_closure(clone, [HELLO]) == closure_engine.get_closure(
+        synthetic_store, [HELLO]
+    )
+
+
+def test_clone_store_copies_across_filesystems(synthetic_store, tmp_path):
+    (synthetic_store / HELLO.lstrip("/") / "bin").write_text("hello")
+    clone = tmp_path / "clone"
+
+    with patch("src.logic.core.os.link", side_effect=OSError):
+        logic.clone_store(synthetic_store, clone)
+
+    assert (clone / HELLO.lstrip("/") / "bin").read_text() == "hello"
+
+
+def test_clone_store_already_exists(synthetic_store, tmp_path):
+    (tmp_path / "clone").mkdir()
+
+    with pytest.raises(FileExistsError):
+        logic.clone_store(synthetic_store, tmp_path / "clone")
+
+
+def test_clone_store_does_not_exist(tmp_path):
+    with pytest.raises(StoreFolderDoesNotExistException):
+        logic.clone_store(tmp_path / "store", tmp_path / "clone")
 
-        assert set(output) == {"path1", "path2"}
+    assert not (tmp_path / "clone").exists()
@@ -0,0 +1,123 @@
+import asyncio
+from pathlib import Path
+
+import pytest
+
+from src.logic.scheduler import StoreScheduler
+
+
+async def hold(context, events: list, name: str, delay: float = 0.01):
+    async with context:
+        events.append(f"{name} start")
+        await asyncio.sleep(delay)
+        events.append(f"{name} end")
+
+
+@pytest.mark.asyncio
+async def test_readers_run_concurrently():
+    scheduler = StoreScheduler()
+    events = []
+
+    await asyncio.gather(
+        hold(scheduler.read(Path("a")), events, "r1"),
+        hold(scheduler.read(Path("a")), events, "r2"),
+    )
+
+    assert events[:2] == ["r1 start", "r2 start"]
+
+
+@pytest.mark.asyncio
+async def test_writer_is_exclusive():
+    scheduler = StoreScheduler()
+    events = []
+
+    await asyncio.gather(
+        hold(scheduler.read(Path("a")), events, "r1"),
+        hold(scheduler.write(Path("a")), events, "w"),
+        hold(scheduler.read(Path("a")), events, "r2"),
+    )
+
+    assert events == ["r1 start", "r1 end", "w start", "w end", "r2 start", "r2 end"]
+
+
+@pytest.mark.asyncio
+async def test_stores_run_in_parallel():
+    scheduler = StoreScheduler()
+    events = []
+
+    await asyncio.gather(
+        hold(scheduler.write(Path("a")), events, "a"),
+        hold(scheduler.write(Path("b")), events, "b"),
+    )
+
+    assert events[:2] == ["a start", "b start"]
+
+
+@pytest.mark.asyncio
+async def test_global_cap():
+    scheduler = StoreScheduler(max_concurrent=1)
+    events = []
+
+    await asyncio.gather(
+        hold(scheduler.write(Path("a")), events, "a"),
+        hold(scheduler.write(Path("b")), events, "b"),
+    )
+
+    assert events == ["a start", "a end", "b start", "b end"]
+    assert scheduler.stats()["wait_seconds_max"] > 0
+
+
+@pytest.mark.asyncio
+async def test_multiple_stores_do_not_deadlock():
+    scheduler = StoreScheduler()
+    events = []
+
+    await asyncio.wait_for(
+        asyncio.gather(
+            hold(scheduler.read(Path("a"), Path("b")), events, "r1"),
+            hold(scheduler.write(Path("a")), events, "wa"),
+            hold(scheduler.write(Path("b")), events, "wb"),
+            hold(scheduler.read(Path("b"), Path("a")), events, "r2"),
+        ),
+        timeout=1,
+    )
+
+    assert len(events) == 8
+
+
+@pytest.mark.asyncio
+async def test_cancelled_writer_releases_readers():
+    scheduler = StoreScheduler()
+    events = []
+
+    reader = asyncio.create_task(hold(scheduler.read(Path("a")), events, "r1", 0.05))
+    await asyncio.sleep(0)
+    writer = asyncio.create_task(hold(scheduler.write(Path("a")), events, "w"))
+    await asyncio.sleep(0)
+    blocked = asyncio.create_task(hold(scheduler.read(Path("a")), events, "r2"))
+    await asyncio.sleep(0)
+    writer.cancel()
+
+    await asyncio.gather(reader, blocked)
+
+    assert "w start" not in events
+    assert events.index("r2 start") < events.index("r1 end")
+    assert scheduler.stats()["stores"] == 0
+
+
+@pytest.mark.asyncio
+async def test_schedule_reads_and_writes():
+    scheduler = StoreScheduler(max_concurrent=1)
+    events = []
+
+    await asyncio.wait_for(
+        asyncio.gather(
+            hold(
+                scheduler.schedule(read=(Path("a"),), write=(Path("b"),)), events, "c"
+            ),
+            hold(scheduler.read(Path("b")), events, "r"),
+        ),
+        timeout=1,
+    )
+
+    assert events == ["c start", "c end", "r start", "r end"]
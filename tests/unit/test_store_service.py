@@ -8,6 +8,7 @@ from fastapi import HTTPException
 
 from src.auth.schemas import User
 from src.logic.exceptions import PackageNotInstalledException, StillAliveException
+from src.logic.interning import path_interner
 from src.services.stores import StoreService
 from src.store.models.store import Store
 from src.store.schemas.package import ClosuresDifference, PackageMeta
@@ -39,6 +40,16 @@ async def test_add_store_already_exists(store_service):
         await service.add_store("store", User(id=1))
 
 
+@pytest.mark.asyncio
+async def test_add_store_reserved_name(store_service):
+    service = store_service
+    with pytest.raises(HTTPException) as exc:
+        await service.add_store("compare", User(id=1))
+
+    assert exc.value.status_code == 400
+    assert not os.path.exists("stores/1/compare")
+
+
 @pytest.mark.asyncio
 async def test_add_store(store_service):
     service = store_service
@@ -90,9 +101,83 @@ async def test_delete_store(store_service):
     service.get_store = AsyncMock()
     service.get_store.return_value = StoreSchema(id=1, name="store", owner_id=1)
     await service.add_store("store", User(id=1))
-    store = await service.delete_store("store", User(id=1))
+    package_service = AsyncMock()
+    store = await service.delete_store("store", User(id=1), package_service)
     assert store == StoreSchema(id=1, name="store", owner_id=1)
     assert not os.path.exists("stores/1/store")
+    package_service.delete_packages.assert_called_once_with(1)
+
+
+@pytest.mark.asyncio
+async def test_delete_store_missing_locally(store_service):
+    service = store_service
+    service.store_repository = AsyncMock()
+    service.get_store = AsyncMock()
+    service.get_store.return_value = StoreSchema(id=1, name="store", owner_id=1)
+    package_service = AsyncMock()
+
+    store = await service.delete_store("store", User(id=1), package_service)
+
+    assert store == StoreSchema(id=1, name="store", owner_id=1)
+    package_service.delete_packages.assert_called_once_with(1)
+    service.store_repository.delete.assert_called_once_with(
+        {"owner_id": 1, "name": "store"}
+    )
+
+
+@pytest.mark.asyncio
+async def test_clone_store(store_service):
+    service = store_service
+    service.store_repository = AsyncMock()
+    service.store_repository.add_one.return_value = 2
+    service.get_store = AsyncMock()
+    service.get_store.return_value = StoreSchema(id=1, name="store", owner_id=1)
+    package_service = AsyncMock()
+    os.makedirs("stores/1/store/nix/store/hash-package")
+
+    store = await service.clone_store("store", "clone", User(id=1), package_service)
+
+    assert (store.id, store.name, store.owner_id) == (2, "clone", 1)
+    assert os.path.exists("stores/1/clone/nix/store/hash-package")
+    package_service.copy_packages.assert_called_once_with(1, 2)
+
+
+@pytest.mark.asyncio
+async def test_clone_store_reserved_name(store_service):
+    service = store_service
+    service.get_store = AsyncMock()
+    service.get_store.return_value = StoreSchema(id=1, name="store", owner_id=1)
+
+    with pytest.raises(HTTPException) as exc:
+        await service.clone_store("store", "compare", User(id=1), AsyncMock())
+
+    assert exc.value.status_code == 400
+
+
+@pytest.mark.asyncio
+async def test_clone_store_already_exists(store_service):
+    service = store_service
+    service.get_store = AsyncMock()
+    service.get_store.return_value = StoreSchema(id=1, name="store", owner_id=1)
+    os.makedirs("stores/1/store")
+    os.makedirs("stores/1/clone")
+
+    with pytest.raises(HTTPException) as exc:
+        await service.clone_store("store", "clone", User(id=1), AsyncMock())
+
+    assert exc.value.status_code == 400
+
+
+@pytest.mark.asyncio
+async def test_clone_store_not_found_locally(store_service):
+    service = store_service
+    service.get_store = AsyncMock()
+    service.get_store.return_value = StoreSchema(id=1, name="store", owner_id=1)
+
+    with pytest.raises(HTTPException) as exc:
+        await service.clone_store("store", "clone", User(id=1), AsyncMock())
+
+    assert exc.value.status_code == 404
 
 
 @pytest.mark.asyncio
@@ -103,9 +188,7 @@ async def test_add_package_already_added(store_service):
     service.get_store.return_value = StoreSchema(id=1, name="store", owner_id=1)
 
     service.package_service = AsyncMock()
-    service.package_service.get_package.return_value = PackageSchema(
-        id=1, name="package", store_id=1, closure={"packages": []}
-    )
+    service.package_service.has_package.return_value = True
 
     with pytest.raises(HTTPException):
         await service.add_package(
@@ -121,45 +204,103 @@ async def test_add_package(store_service):
     service.get_store.return_value = StoreSchema(id=1, name="store", owner_id=1)
 
     service.package_service = AsyncMock()
-    service.package_service.get_package.return_value = None
+    service.package_service.has_package.return_value = False
 
     service.package_service.add_package = AsyncMock()
-    service.package_service.add_package.return_value = 1
+    service.package_service.add_package.return_value = PackageSchema(
+        id=1,
+        name="package",
+        store_id=1,
+        closure={"packages": ["package"]},
+        path="/nix/store/hash-package",
+        closure_size=10,
+    )
+
+    package = await service.add_package(
+        "store", "package", User(id=1), service.package_service
+    )
+    service.package_service.add_package.assert_called_once_with(
+        service.stores_path / "1" / "store", "package", 1, None
+    )
+    assert package.closure.packages == ["package"]
+    assert package.closure_size == 10
+
+
+@pytest.mark.asyncio
+async def test_delete_package(store_service):
+    service = store_service
+
+    service.get_store = AsyncMock()
+    service.get_store.return_value = StoreSchema(id=1, name="store", owner_id=1)
 
-    with patch("src.services.stores.core_logic.get_closure") as mock_closure:
-        mock_closure.return_value = ["package"]
+    service.package_service = AsyncMock()
+    service.package_service.get_package.return_value = PackageSchema(
+        id=1,
+        name="package",
+        store_id=1,
+        closure={"packages": []},
+        path="/nix/store/hash-package",
+    )
 
-        package = await service.add_package(
+    with patch("src.services.stores.core_logic.remove_package") as mock_remove_package:
+        mock_remove_package.return_value = {"packages": []}
+        package = await service.delete_package(
             "store", "package", User(id=1), service.package_service
         )
-        assert package == PackageSchema(
-            id=1, name="package", store_id=1, closure={"packages": ["package"]}
+        mock_remove_package.assert_called_once_with(
+            service.stores_path / "1" / "store", ["/nix/store/hash-package"]
         )
+        service.package_service.delete_package.assert_called_once_with("package", 1)
+        assert package == service.package_service.get_package.return_value
 
 
 @pytest.mark.asyncio
-async def test_delete_package(store_service):
+async def test_delete_package_outputs(store_service):
     service = store_service
 
     service.get_store = AsyncMock()
     service.get_store.return_value = StoreSchema(id=1, name="store", owner_id=1)
 
+    outputs = {"out": "/nix/store/hash-package", "man": "/nix/store/hash-package-man"}
     service.package_service = AsyncMock()
-    service.package_service.delete_package = AsyncMock()
-    service.package_service.delete_package.return_value = PackageSchema(
-        id=1, name="package", store_id=1, closure={"packages": []}
+    service.package_service.get_package.return_value = PackageSchema(
+        id=1,
+        name="package",
+        store_id=1,
+        closure={"packages": []},
+        path="/nix/store/hash-package",
+        outputs=outputs,
     )
 
     with patch("src.services.stores.core_logic.remove_package") as mock_remove_package:
-        mock_remove_package.return_value = {"packages": []}
-        package = await service.delete_package(
+        await service.delete_package(
             "store", "package", User(id=1), service.package_service
         )
-        assert package == PackageSchema(
-            id=1, name="package", store_id=1, closure={"packages": []}
+        mock_remove_package.assert_called_once_with(
+            service.stores_path / "1" / "store", list(outputs.values())
         )
 
 
+@pytest.mark.asyncio
+async def test_delete_package_not_found(store_service):
+    service = store_service
+
+    service.get_store = AsyncMock()
+    service.get_store.return_value = StoreSchema(id=1, name="store", owner_id=1)
+
+    service.package_service = AsyncMock()
+    service.package_service.get_package.return_value = None
+
+    with patch("src.services.stores.core_logic.remove_package") as mock_remove_package:
+        with pytest.raises(HTTPException) as exc:
+            await service.delete_package(
+                "store", "package", User(id=1), service.package_service
+            )
+
+        assert exc.value.status_code == 400
+        mock_remove_package.assert_not_called()
+
+
 @pytest.mark.asyncio
 async def test_delete_package_exception(store_service):
     service = store_service
@@ -168,9 +309,12 @@ async def test_delete_package_exception(store_service):
     service.get_store.return_value = StoreSchema(id=1, name="store", owner_id=1)
 
     service.package_service = AsyncMock()
-    service.package_service.delete_package = AsyncMock()
-    service.package_service.delete_package.return_value = PackageSchema(
-        id=1, name="package", store_id=1, closure={"packages": []}
+    service.package_service.get_package.return_value = PackageSchema(
+        id=1,
+        name="package",
+        store_id=1,
+        closure={"packages": []},
+        path="/nix/store/hash-package",
     )
 
     with patch("src.services.stores.core_logic.remove_package") as mock_remove_package:
@@ -181,6 +325,8 @@ async def test_delete_package_exception(store_service):
                 "store", "package", User(id=1), service.package_service
             )
 
+    service.package_service.delete_package.assert_not_called()
+
 
 @pytest.mark.asyncio
 async def test_get_paths_difference(store_service):
@@ -211,10 +357,18 @@ async def test_get_paths_difference(store_service):
 async def test_closures_difference(store_service):
     service = store_service
 
-    with patch("src.services.stores.core_logic.get_closure") as mock_get_closure:
+    service.get_store = AsyncMock()
+    service.get_store.return_value = StoreSchema(id=1, name="store", owner_id=1)
+
+    package_service = AsyncMock()
+    package_service.get_package_path.side_effect = ["/nix/store/hash-1", None]
+    package_service.resolve_package.return_value = "/nix/store/hash-2"
+    package_service.get_package_closure.return_value = None
+
+    with patch("src.services.stores.core_logic.get_closure_ids") as mock_get_closure:
         mock_get_closure.side_effect = [
-            ["package1", "package2"],
-            ["package2", "package3"],
+            path_interner.sorted_ids(["package1", "package2"]),
+            path_interner.sorted_ids(["package2", "package3"]),
         ]
 
         store_name = "store1"
@@ -224,12 +378,23 @@ async def test_closures_difference(store_service):
         user = User(id=1)
 
         diff = await service.get_closures_difference(
-            store_name, package_name, other_store_name, other_package_name, user
+            store_name,
+            package_name,
+            other_store_name,
+            other_package_name,
+            user,
+            package_service,
         )
 
         calls = [
-            call(service.stores_path / "1" / store_name, package_name),
-            call(service.stores_path / "1" / other_store_name, other_package_name),
+            call(
+                service.stores_path / "1" / store_name,
+                "/nix/store/hash-1",
+            ),
+            call(
+                service.stores_path / "1" / other_store_name,
+                "/nix/store/hash-2",
+            ),
         ]
 
         assert mock_get_closure.call_args_list == calls
@@ -243,6 +408,13 @@ async def test_closures_difference(store_service):
 async def test_get_packages_meta(store_service):
     service = store_service
 
+    service.get_store = AsyncMock()
+    service.get_store.return_value = StoreSchema(id=1, name="store", owner_id=1)
+
+    package_service = AsyncMock()
+    package_service.get_package.return_value = None
+    package_service.get_package_path.return_value = "/nix/store/hash-package"
+
     with patch(
         "src.services.stores.core_logic.get_closure_size"
     ) as mock_get_closure_size:
@@ -252,10 +424,13 @@ async def test_get_packages_meta(store_service):
         package_name = "package"
         user = User(id=1)
 
-        meta = await service.get_package_meta(store_name, package_name, user)
+        meta = await service.get_package_meta(
+            store_name, package_name, user, package_service
+        )
 
         mock_get_closure_size.assert_called_once_with(
-            service.stores_path / "1" / store_name, package_name
+            service.stores_path / "1" / store_name,
+            "/nix/store/hash-package",
         )
 
         assert meta == PackageMeta(present=True, closure_size=10)
@@ -265,6 +440,14 @@ async def test_get_packages_meta(store_service):
 async def test_get_packages_meta_not_exception(store_service):
     service = store_service
 
+    service.get_store = AsyncMock()
+    service.get_store.return_value = StoreSchema(id=1, name="store", owner_id=1)
+
+    package_service = AsyncMock()
+    package_service.get_package.return_value = None
+    package_service.get_package_path.return_value = None
+    package_service.resolve_package.return_value = "/nix/store/hash-package"
+
     with patch(
         "src.services.stores.core_logic.get_closure_size"
     ) as mock_get_closure_size:
@@ -274,10 +457,41 @@ async def test_get_packages_meta_not_exception(store_service):
         package_name = "package"
         user = User(id=1)
 
-        meta = await service.get_package_meta(store_name, package_name, user)
+        meta = await service.get_package_meta(
+            store_name, package_name, user, package_service
+        )
 
         mock_get_closure_size.assert_called_once_with(
-            service.stores_path / "1" / store_name, package_name
+            service.stores_path / "1" / store_name,
+            "/nix/store/hash-package",
         )
 
         assert meta == PackageMeta(present=False, closure_size=0)
+
+
+@pytest.mark.asyncio
+async def test_get_packages_meta_installed(store_service):
+    service = store_service
+
+    service.get_store = AsyncMock()
+    service.get_store.return_value = StoreSchema(id=1, name="store", owner_id=1)
+
+    package_service = AsyncMock()
+    package_service.get_package.return_value = PackageSchema(
+        id=1,
+        name="package",
+        store_id=1,
+        closure={"packages": []},
+        path="/nix/store/hash-package",
+        closure_size=42,
+    )
+
+    with patch(
+        "src.services.stores.core_logic.get_closure_size"
+    ) as mock_get_closure_size:
+        meta = await service.get_package_meta(
+            "store", "package", User(id=1), package_service
+        )
+
+        mock_get_closure_size.assert_not_called()
+        assert meta == PackageMeta(present=True, closure_size=42)
@@ -0,0 +1,77 @@
+import asyncio
+from pathlib import Path
+
+import pytest
+
+import src.logic.core as logic
+from src.logic.trash import TrashReaper
+
+
+def read_only_store(store: Path) -> Path:
+    package = store / "nix/store/hash-package"
+    package.mkdir(parents=True)
+    (package / "bin").write_text("package")
+    (package / "bin").chmod(0o444)
+    package.chmod(0o555)
+    return store
+
+
+def test_trash_store(tmp_path):
+    store = read_only_store(tmp_path / "stores/1/store")
+    trash = tmp_path / "stores/.trash"
+
+    trashed = logic.trash_store(store, trash)
+
+    assert not store.exists()
+    assert trashed.parent == trash
+    assert (trashed / "nix/store/hash-package/bin").exists()
+
+
+def test_trash_store_not_found(tmp_path):
+    with pytest.raises(FileNotFoundError):
+        logic.trash_store(tmp_path / "store", tmp_path / ".trash")
+
+
+@pytest.mark.asyncio
+async def test_reaper_resumes_on_start(tmp_path):
+    trash = tmp_path / ".trash"
+    for name in ("first", "second"):
+        read_only_store(trash / name)
+
+    reaper = TrashReaper(trash, workers=2)
+    await reaper.start()
+    try:
+        for _ in range(100):
+            if not reaper.pending():
+                break
+            await asyncio.sleep(0.01)
+    finally:
+        await reaper.stop()
+
+    assert reaper.pending() == 0
+
+
+@pytest.mark.asyncio
+async def test_reaper_notify(tmp_path):
+    trash = tmp_path / ".trash"
+    reaper = TrashReaper(trash, workers=1)
+    await reaper.start()
+    try:
+        await asyncio.sleep(0.01)
+        logic.trash_store(read_only_store(tmp_path / "store"), trash)
+        reaper.notify()
+        for _ in range(100):
+            if not reaper.pending():
+                break
+            await asyncio.sleep(0.01)
+    finally:
+        await reaper.stop()
+
+    assert reaper.pending() == 0
+
+
+@pytest.mark.asyncio
+async def test_reap_without_trash(tmp_path):
+    reaper = TrashReaper(tmp_path / ".trash")
+
+    assert await reaper.reap() == 0
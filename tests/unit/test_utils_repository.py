@@ -3,12 +3,15 @@ import os
 
 import pytest
 from sqlalchemy import select
+from sqlalchemy.exc import IntegrityError
 
 os.environ["DATABASE_URL"] = "sqlite+aiosqlite:///:memory:"
 
 from src.db.db import async_session_maker, create_db_and_tables, engine  # noqa: E402
+from src.repositories.stores import PackageRepository  # noqa: E402
 from src.store.models.store import Store  # noqa: E402
 from src.utils.repository import SQLAlchemyRepository  # noqa: E402
+from src.utils.unitofwork import UnitOfWork  # noqa: E402
 
 
 @pytest.fixture
@@ -77,3 +80,131 @@ async def test_delete(repository):
         stored_store = result.scalar_one_or_none()
 
     assert stored_store is None
+
+
+@pytest.mark.asyncio
+async def test_update(repository):
+    await repository.add_one({"id": 1, "name": "store1", "owner_id": 2})
+
+    updated = await repository.update({"id": 1, "owner_id": 2}, {"name": "store2"})
+    not_updated = await repository.update({"id": 1, "owner_id": 3}, {"name": "x"})
+
+    assert updated == 1
+    assert not_updated == 0
+
+    store = await repository.get_one({"id": 1})
+    assert store[0].name == "store2"
+
+
+@pytest.mark.asyncio
+async def test_get_all_paginated(repository):
+    await repository.add_many(
+        [{"name": f"store{index}", "owner_id": 2} for index in range(5)]
+    )
+
+    page = await repository.get_all({"owner_id": 2}, after_id=2, limit=2)
+
+    assert [row[0].id for row in page] == [3, 4]
+
+
+@pytest.mark.asyncio
+async def test_get_all_columns(repository):
+    await repository.add_one({"id": 1, "name": "store1", "owner_id": 2})
+
+    rows = await repository.get_all({"owner_id": 2}, columns=["id", "name"])
+
+    assert [tuple(row) for row in rows] == [(1, "store1")]
+
+
+@pytest.mark.asyncio
+async def test_add_many(repository):
+    ids = await repository.add_many(
+        [{"name": f"store{index}", "owner_id": 2} for index in range(3)]
+    )
+
+    assert ids == [1, 2, 3]
+    assert (await repository.get_one({"id": 3}))[0].name == "store2"
+    assert await repository.add_many([]) == []
+
+
+@pytest.mark.asyncio
+async def test_get_many(repository):
+    await repository.add_many(
+        [{"name": f"store{index}", "owner_id": 2} for index in range(3)]
+    )
+
+    rows = await repository.get_many("name", ["store0", "store2", "missing"])
+
+    assert sorted(row[0].id for row in rows) == [1, 3]
+
+
+@pytest.mark.asyncio
+async def test_delete_many(repository):
+    await repository.add_many(
+        [{"name": f"store{index}", "owner_id": 2} for index in range(3)]
+    )
+
+    deleted = await repository.delete_many("id", [1, 2, 4])
+
+    assert deleted == 2
+    assert [row[0].id for row in await repository.get_all({})] == [3]
+
+
+@pytest.mark.asyncio
+async def test_upsert(repository):
+    await repository.add_one({"id": 1, "name": "store1", "owner_id": 2})
+
+    await repository.upsert(
+        [
+            {"id": 1, "name": "store1", "owner_id": 3},
+            {"id": 2, "name": "store2", "owner_id": 3},
+        ],
+        ["name"],
+    )
+    assert (await repository.get_one({"id": 1}))[0].owner_id == 2
+    assert (await repository.get_one({"id": 2}))[0].owner_id == 3
+
+    await repository.upsert(
+        [{"id": 1, "name": "store1", "owner_id": 4}], ["name"], ["owner_id"]
+    )
+    assert (await repository.get_one({"id": 1}))[0].owner_id == 4
+
+
+def bound_repository(unit_of_work: UnitOfWork) -> SQLAlchemyRepository:
+    repository = SQLAlchemyRepository(unit_of_work)
+    repository.model = Store
+    return repository
+
+
+@pytest.mark.asyncio
+async def test_unit_of_work_commits(repository):
+    async with UnitOfWork() as unit_of_work:
+        store_id = await bound_repository(unit_of_work).add_one(
+            {"name": "store1", "owner_id": 2}
+        )
+        store = await bound_repository(unit_of_work).get_one({"id": store_id})
+        assert store[0].name == "store1"
+
+    assert (await repository.get_one({"id": store_id}))[0].name == "store1"
+
+
+@pytest.mark.asyncio
+async def test_unit_of_work_rolls_back(repository):
+    with pytest.raises(RuntimeError):
+        async with UnitOfWork() as unit_of_work:
+            await bound_repository(unit_of_work).add_one(
+                {"id": 1, "name": "store1", "owner_id": 2}
+            )
+            raise RuntimeError()
+
+    assert await repository.get_one({"id": 1}) is None
+
+
+@pytest.mark.asyncio
+async def test_package_name_unique_per_store(repository):
+    packages = PackageRepository()
+    await packages.add_one({"name": "hello", "store_id": 1})
+    await packages.add_one({"name": "hello", "store_id": 2})
+
+    with pytest.raises(IntegrityError):
+        await packages.add_one({"name": "hello", "store_id": 1})